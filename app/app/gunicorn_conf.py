@@ -0,0 +1,111 @@
+"""
+Gunicorn config for app project.
+
+Run the production server with:
+
+    gunicorn -c python:app.gunicorn_conf app.wsgi
+
+Workers and threads are sized from the CPU count and capped so that all
+the threads together never need more than DB_POOL_SIZE database
+connections. Every setting can be overridden with a GUNICORN_* env var.
+
+Several workers need a cache shared between processes (CACHE_BACKEND, e.g.
+memcached as in docker-compose.yml): the response cache versions, the
+replica pins and the login throttles live in it. The server refuses to
+start more than one worker on a per process cache.
+"""
+
+import multiprocessing
+import os
+
+from core.caches import PROCESS_LOCAL_CACHES
+
+
+def _env_int(name, default=None):
+    value = os.getenv(name)
+    return int(value) if value else default
+
+
+def compute_sizing(cpus, db_pool_size, workers=None, threads=None):
+    """
+    Return the (workers, threads) to run.
+
+    The defaults are the usual 2 * CPUs + 1 workers with 2 threads each,
+    requests mostly wait on the database. Every thread can hold a
+    database connection, so the workers (and then the threads) are
+    reduced until workers * threads fits in db_pool_size.
+    """
+    threads = threads or 2
+    workers = workers or 2 * cpus + 1
+    if db_pool_size:
+        threads = min(threads, db_pool_size)
+        workers = max(1, min(workers, db_pool_size // threads))
+
+    return workers, threads
+
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:8000')
+
+workers, threads = compute_sizing(
+    cpus=multiprocessing.cpu_count(),
+    db_pool_size=_env_int('DB_POOL_SIZE', 20),
+    workers=_env_int('GUNICORN_WORKERS'),
+    threads=_env_int('GUNICORN_THREADS'),
+)
+worker_class = 'gthread' if threads > 1 else 'sync'
+
+# Connections one worker may hold, its pool saturation is reported against
+# that share of DB_POOL_SIZE (the workers inherit the environment)
+os.environ.setdefault('DB_PROCESS_POOL_SIZE', str(threads))
+
+# Load the app before forking, the workers share its memory copy-on-write
+preload_app = bool(_env_int('GUNICORN_PRELOAD', 1))
+
+# Recycle the workers after a while to contain leaks, the jitter keeps them
+# from all restarting at once
+max_requests = _env_int('GUNICORN_MAX_REQUESTS', 1000)
+max_requests_jitter = _env_int('GUNICORN_MAX_REQUESTS_JITTER', 100)
+
+timeout = _env_int('GUNICORN_TIMEOUT', 30)
+graceful_timeout = _env_int('GUNICORN_GRACEFUL_TIMEOUT', 30)
+keepalive = _env_int('GUNICORN_KEEPALIVE', 5)
+
+# The heartbeat files are on a disk backed overlay in containers
+worker_tmp_dir = os.getenv('GUNICORN_WORKER_TMP_DIR', '/dev/shm')
+
+accesslog = os.getenv('GUNICORN_ACCESS_LOG', '-')
+errorlog = os.getenv('GUNICORN_ERROR_LOG', '-')
+loglevel = os.getenv('GUNICORN_LOG_LEVEL', 'info')
+
+
+def check_shared_cache(workers, caches):
+    """Raise RuntimeError when several workers would each get their cache"""
+    backend = caches['default']['BACKEND']
+    if workers > 1 and backend in PROCESS_LOCAL_CACHES:
+        raise RuntimeError(
+            f'{workers} workers can\'t share the {backend} cache, set '
+            f'CACHE_BACKEND and CACHE_LOCATION to a shared cache or run '
+            f'GUNICORN_WORKERS=1'
+        )
+
+
+def on_starting(server):
+    """Check the settings before any worker is started"""
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings')
+    from django.conf import settings
+    check_shared_cache(server.cfg.workers, settings.CACHES)
+
+
+def pre_fork(server, worker):
+    """Close the connections the preloaded app opened in the master"""
+    from django.db import connections
+    connections.close_all()
+
+
+def post_fork(server, worker):
+    """Drop any connection inherited from the master"""
+    from django.db import connections
+    for connection in connections.all():
+        # The socket is shared with the master, closing it properly would
+        # end the session for both, just forget it
+        connection.connection = None
@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/3.2/ref/settings/
 
 from pathlib import Path
 import os
+import tempfile
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -48,17 +49,52 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.PerformanceMiddleware',
+    'core.queries.QueryInspectorMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.routers.ReplicaRoutingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
 ROOT_URLCONF = 'app.urls'
 
+# Query inspector (core.queries): fraction of the requests to the views of
+# QUERY_INSPECTOR_APPS whose queries are checked for N+1 patterns (the same
+# query shape repeated QUERY_INSPECTOR_REPEAT_THRESHOLD times) and slow
+# queries, and appended to QUERY_INSPECTOR_LOG for the query_report command.
+# The log is moved to QUERY_INSPECTOR_LOG.1 when it reaches
+# QUERY_INSPECTOR_LOG_MAX_BYTES (0 for no limit).
+QUERY_INSPECTOR_ENABLED = bool(int(os.getenv('QUERY_INSPECTOR', 0)))
+QUERY_INSPECTOR_SAMPLE_RATE = float(
+    os.getenv('QUERY_INSPECTOR_SAMPLE_RATE', 1.0 if DEBUG else 0.01)
+)
+QUERY_INSPECTOR_APPS = ('recipe', 'users')
+QUERY_INSPECTOR_SLOW_MS = int(os.getenv('QUERY_INSPECTOR_SLOW_MS', 100))
+QUERY_INSPECTOR_REPEAT_THRESHOLD = int(
+    os.getenv('QUERY_INSPECTOR_REPEAT_THRESHOLD', 5)
+)
+QUERY_INSPECTOR_LOG = os.getenv(
+    'QUERY_INSPECTOR_LOG',
+    os.path.join(tempfile.gettempdir(), 'query_inspector.jsonl')
+)
+QUERY_INSPECTOR_LOG_MAX_BYTES = int(
+    os.getenv('QUERY_INSPECTOR_LOG_MAX_BYTES', 10 * 1024 ** 2)
+)
+
+# Addresses allowed to read the /metrics endpoint, comma separated
+METRICS_ALLOWED_IPS = os.getenv('METRICS_ALLOWED_IPS',
+                                '127.0.0.1,::1').split(',')
+
+# Serve the read paths (list/retrieve, media), the signups and the logins
+# with async views running on the thread pool, for the ASGI deployment
+# (uvicorn app.asgi:application)
+ASYNC_VIEWS = bool(int(os.getenv('ASYNC_VIEWS', 0)))
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
@@ -83,14 +119,90 @@ WSGI_APPLICATION = 'app.wsgi.application'
 
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
+        # PostgreSQL with connection health checks and metrics
+        'ENGINE': 'core.backends.postgresql',
         'HOST': os.getenv('DB_HOST'),
+        'PORT': os.getenv('DB_PORT', ''),
         'NAME': os.getenv('DB_NAME'),
         'USER': os.getenv('DB_USER'),
-        'PASSWORD': os.getenv('DB_PASS')
+        'PASSWORD': os.getenv('DB_PASS'),
+        # Seconds a connection is kept open between requests, 0 closes it
+        # at the end of every request
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', 60)),
+        # Test a persistent connection before a new request uses it
+        'CONN_HEALTH_CHECKS': bool(int(os.getenv('DB_CONN_HEALTH_CHECKS',
+                                                 1))),
+        # Required behind pgbouncer in transaction pooling mode
+        'DISABLE_SERVER_SIDE_CURSORS': bool(int(os.getenv(
+            'DB_DISABLE_SERVER_SIDE_CURSORS', 0
+        ))),
+    }
+}
+
+# Read replicas of the default database, comma separated hosts. The safe
+# reads of the views opting in (see core.routers) are spread over them.
+# Any aliases listed in REPLICA_DATABASES work, e.g. a copy of a SQLite file
+# to try the routing locally.
+REPLICA_DATABASES = []
+for index, host in enumerate(
+        filter(None, os.getenv('DB_REPLICA_HOSTS', '').split(',')), 1):
+    alias = f'replica{index}'
+    DATABASES[alias] = {
+        **DATABASES['default'],
+        'HOST': host.strip(),
+        # Tests run against the default database only
+        'TEST': {'MIRROR': 'default'},
+    }
+    REPLICA_DATABASES.append(alias)
+
+DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+
+# Seconds a replica may lag behind: the reads of a client that wrote within
+# that time go to the default database so it reads its own writes
+REPLICA_LAG_TOLERANCE = int(os.getenv('REPLICA_LAG_TOLERANCE', 5))
+
+# Database connections one instance (all the workers and threads) may hold,
+# used to size the gunicorn workers
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 20))
+# Share of it of one process, what the saturation of its connections is
+# reported against. gunicorn_conf sets it to the threads of a worker, a
+# single process server has the whole pool.
+DB_PROCESS_POOL_SIZE = int(os.getenv('DB_PROCESS_POOL_SIZE', 0)) or \
+    DB_POOL_SIZE
+
+
+# Cache
+# https://docs.djangoproject.com/en/3.2/topics/cache/
+
+# The default is per process, fine for runserver and the tests. Anything
+# running several processes (gunicorn, uvicorn --workers) needs a shared one,
+# e.g. CACHE_BACKEND=django.core.cache.backends.memcached.PyMemcacheCache
+# and CACHE_LOCATION=memcached:11211 as in docker-compose.yml
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND',
+            'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION', ''),
     }
 }
 
+# Cache alias and timeout (in seconds) of the cached recipe API responses
+RECIPE_CACHE_ALIAS = 'default'
+RECIPE_CACHE_TIMEOUT = int(os.getenv('RECIPE_CACHE_TIMEOUT', 300))
+
+# Time to live (in seconds) and size of the in process cache of the users
+# authenticated by token
+TOKEN_CACHE_TTL = int(os.getenv('TOKEN_CACHE_TTL', 60))
+TOKEN_CACHE_MAX_SIZE = int(os.getenv('TOKEN_CACHE_MAX_SIZE', 10000))
+
+# Seconds an API token (core.models.ExpiringToken) stays valid after its
+# last use. The expiry is pushed back at most every TOKEN_REFRESH_INTERVAL
+# seconds, one write per interval rather than per request.
+TOKEN_TTL = int(os.getenv('TOKEN_TTL', 7 * 24 * 3600))
+TOKEN_REFRESH_INTERVAL = int(os.getenv('TOKEN_REFRESH_INTERVAL', 3600))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
@@ -110,6 +222,27 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Hasher of the new passwords: pbkdf2, argon2 or bcrypt. The others stay
+# listed to verify existing passwords, which are rehashed with the
+# preferred hasher, or its new cost, on the next successful login
+PASSWORD_HASHER = os.getenv('PASSWORD_HASHER', 'pbkdf2')
+_PASSWORD_HASHERS = {
+    'pbkdf2': 'core.hashers.PBKDF2PasswordHasher',
+    'argon2': 'core.hashers.Argon2PasswordHasher',
+    'bcrypt': 'core.hashers.BCryptSHA256PasswordHasher',
+}
+PASSWORD_HASHERS = [_PASSWORD_HASHERS.pop(PASSWORD_HASHER)] + \
+    list(_PASSWORD_HASHERS.values())
+
+# Cost of the hashers, tune them with benchmarks/hashers.py
+PASSWORD_PBKDF2_ITERATIONS = int(os.getenv('PASSWORD_PBKDF2_ITERATIONS',
+                                           260000))
+PASSWORD_ARGON2_TIME_COST = int(os.getenv('PASSWORD_ARGON2_TIME_COST', 2))
+PASSWORD_ARGON2_MEMORY_COST = int(os.getenv('PASSWORD_ARGON2_MEMORY_COST',
+                                            102400))
+PASSWORD_ARGON2_PARALLELISM = int(os.getenv('PASSWORD_ARGON2_PARALLELISM', 8))
+PASSWORD_BCRYPT_ROUNDS = int(os.getenv('PASSWORD_BCRYPT_ROUNDS', 12))
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/3.2/topics/i18n/
@@ -134,9 +267,57 @@ MEDIA_URL = '/media/'
 MEDIA_ROOT = '/vol/web/media'
 STATIC_ROOT = '/vol/web/static'
 
+# Uploads are stored once per content, under the hash of their bytes, and
+# served with a far future Cache-Control
+DEFAULT_FILE_STORAGE = 'core.storage.ContentAddressedStorage'
+# Uploads being received, outside of MEDIA_ROOT but on the same volume so
+# they are renamed into place (the system temporary directory when unset)
+FILE_UPLOAD_TEMP_DIR = os.getenv('FILE_UPLOAD_TEMP_DIR') or None
+MEDIA_IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+
+# How media files are sent: 'django' (FileResponse, sendfile under a WSGI
+# server supporting it), 'x-accel' (nginx internal location at
+# MEDIA_ACCEL_PREFIX) or 'x-sendfile' (apache/lighttpd)
+MEDIA_SERVE_MODE = os.getenv('MEDIA_SERVE_MODE', 'django')
+MEDIA_ACCEL_PREFIX = os.getenv('MEDIA_ACCEL_PREFIX', '/protected-media/')
+
+# Recipe images: maximum upload size in bytes and the pool rendering the
+# resized variants ('process', 'thread' or 'sync' to render in the request)
+RECIPE_IMAGE_MAX_SIZE = int(os.getenv('RECIPE_IMAGE_MAX_SIZE', 10 * 1024 ** 2))
+RECIPE_IMAGE_EXECUTOR = os.getenv('RECIPE_IMAGE_EXECUTOR', 'process')
+RECIPE_IMAGE_WORKERS = int(os.getenv('RECIPE_IMAGE_WORKERS', 2))
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/3.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 AUTH_USER_MODEL = 'core.User'
+
+AUTHENTICATION_BACKENDS = ['users.backends.TokenModelBackend']
+
+# Django REST Framework
+# https://www.django-rest-framework.org/api-guide/settings/
+
+REST_FRAMEWORK = {
+    'DEFAULT_PAGINATION_CLASS': 'recipe.pagination.IdCursorPagination',
+    'PAGE_SIZE': int(os.getenv('API_PAGE_SIZE', 100)),
+    # Logins per client address and per email (users.throttling), counted
+    # in the default cache, an empty value disables the throttle
+    'DEFAULT_THROTTLE_RATES': {
+        'login_ip': os.getenv('LOGIN_IP_THROTTLE_RATE', '60/min') or None,
+        'login_email': os.getenv('LOGIN_EMAIL_THROTTLE_RATE',
+                                 '10/min') or None,
+    },
+}
+
+# Text search configuration used to build and query the recipe search vector.
+# The stored vectors are built with it (core migration 0011 backfilled them
+# with 'english'), changing it needs a new migration recomputing them.
+RECIPE_SEARCH_CONFIG = 'english'
+
+# Number of recipes read per query when streaming an export
+RECIPE_EXPORT_CHUNK_SIZE = int(os.getenv('RECIPE_EXPORT_CHUNK_SIZE', 500))
+
+# Maximum number of objects accepted by the bulk endpoints
+BULK_MAX_ITEMS = int(os.getenv('BULK_MAX_ITEMS', 1000))
@@ -1,12 +1,21 @@
 from django.contrib import admin
-from django.urls import path, include
-from django.conf.urls.static import static
+from django.urls import path, include, re_path
 from django.conf import settings
 
+from core.async_views import async_view
+from core.views import DatabaseMetricsView, metrics, serve_media
+
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     # API URL's
     path('api/user/', include('users.urls')),
     path('api/recipe/', include('recipe.urls')),
-] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+    path('api/metrics/db/', DatabaseMetricsView.as_view(),
+         name='db-metrics'),
+    path('metrics', metrics, name='metrics'),
+    # Uploaded files, see MEDIA_SERVE_MODE
+    re_path(r'^%s(?P<path>.+)$' % settings.MEDIA_URL.lstrip('/'),
+            async_view(serve_media) if settings.ASYNC_VIEWS else serve_media,
+            name='media'),
+]
@@ -0,0 +1,78 @@
+import functools
+
+from asgiref.sync import sync_to_async
+
+from django.db import close_old_connections
+from django.urls import URLPattern
+
+from rest_framework.permissions import SAFE_METHODS
+
+
+def _run(view, request, *args, **kwargs):
+    """Run the view and render its response in the current thread"""
+    # The request_started/finished signals clean up the connections of the
+    # thread the handler runs in, not the ones of the pool threads
+    close_old_connections()
+    try:
+        response = view(request, *args, **kwargs)
+        if callable(getattr(response, 'render', None)):
+            response.render()
+        return response
+    finally:
+        close_old_connections()
+
+
+def async_view(view, thread_sensitive=None):
+    """
+    Turn a sync view into a coroutine function for the ASGI handler.
+
+    A plain sync view is run by Django with thread_sensitive=True, so every
+    request of the process queues on the same thread. Reads are run on the
+    thread pool instead, with their own database connection, while the
+    event loop keeps handling the other requests and slow clients. Writes
+    keep the default thread, they may rely on per-thread state, unless
+    thread_sensitive is given to force either for every method.
+
+    This doesn't make the views faster than under WSGI, see the numbers in
+    benchmarks/loadtest.py.
+    """
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        sensitive = thread_sensitive
+        if sensitive is None:
+            sensitive = request.method not in SAFE_METHODS
+        run = sync_to_async(_run, thread_sensitive=sensitive)
+        return await run(view, request, *args, **kwargs)
+
+    return wrapper
+
+
+def async_patterns(patterns, names=None):
+    """
+    Return the url patterns with their views wrapped by async_view.
+
+    Only the patterns named in names are wrapped when it is given, or
+    whose name ends with one of its items starting with '-', e.g. '-list'
+    for the list route of every viewset of a router.
+    """
+    wrapped = []
+    for pattern in patterns:
+        if isinstance(pattern, URLPattern) and \
+                _matches(pattern.name, names):
+            pattern = URLPattern(pattern.pattern,
+                                 async_view(pattern.callback),
+                                 pattern.default_args,
+                                 pattern.name)
+        wrapped.append(pattern)
+
+    return wrapped
+
+
+def _matches(name, names):
+    if names is None:
+        return True
+    if not name:
+        return False
+
+    return any(name == item or (item.startswith('-') and name.endswith(item))
+               for item in names)
@@ -0,0 +1,122 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.utils.translation import gettext_lazy as _
+
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+
+from core.models import ExpiringToken
+
+
+class TokenCache:
+    """
+    In process LRU cache of token keys to (user, token) with a time to live.
+
+    Entries are invalidated by the signals in core.signals when a token is
+    deleted or its user is saved, but only in the process the change was
+    made in, the time to live bounds how long other workers can serve a
+    revoked token or an inactive user.
+    """
+
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._keys_by_user = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Return the cached (user, token) for the key or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, user, token = entry
+            if expires <= time.monotonic():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+
+        return user, token
+
+    def set(self, key, user, token):
+        """Cache the user and token of a key, evicting the oldest entries"""
+        with self._lock:
+            self._remove(key)
+            expires = time.monotonic() + settings.TOKEN_CACHE_TTL
+            self._entries[key] = (expires, user, token)
+            self._keys_by_user.setdefault(user.pk, set()).add(key)
+            while len(self._entries) > settings.TOKEN_CACHE_MAX_SIZE:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate(self, key):
+        """Forget a token"""
+        with self._lock:
+            self._remove(key)
+
+    def invalidate_user(self, user_id):
+        """Forget every token of a user"""
+        with self._lock:
+            for key in list(self._keys_by_user.get(user_id, ())):
+                self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_user.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        user_id = entry[1].pk
+        keys = self._keys_by_user.get(user_id)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._keys_by_user[user_id]
+
+
+token_cache = TokenCache()
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    Token authentication that skips the token/user query for tokens seen
+    in the last TOKEN_CACHE_TTL seconds
+    """
+
+    def authenticate_credentials(self, key):
+        cached = token_cache.get(key)
+        if cached is None:
+            user, token = super().authenticate_credentials(key)
+            token_cache.set(key, user, token)
+            cached = (user, token)
+
+        # Every request gets its own instance as views may change the user
+        user, token = cached
+        return copy.copy(user), token
+
+
+class ExpiringTokenAuthentication(CachedTokenAuthentication):
+    """
+    Cached authentication with core.models.ExpiringToken: one query on the
+    primary key of the token joined to its user, tokens past their expiry
+    are rejected and the others pushed back (see ExpiringToken.refresh)
+    """
+    model = ExpiringToken
+
+    def authenticate_credentials(self, key):
+        user, token = super().authenticate_credentials(key)
+        if token.is_expired:
+            token_cache.invalidate(key)
+            raise exceptions.AuthenticationFailed(_('Token has expired.'))
+        # The cached token too, the next requests see the new expiry
+        token.refresh()
+
+        return user, token
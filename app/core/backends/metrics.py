@@ -0,0 +1,145 @@
+import threading
+import time
+
+
+class ConnectionStats:
+    """Counters of the database connections of one alias in this process"""
+
+    COUNTERS = ('connects', 'connect_time', 'max_connect_time', 'checkouts',
+                'checkout_time', 'max_checkout_time', 'reused',
+                'health_check_failures', 'closes', 'open', 'max_open')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            for counter in self.COUNTERS:
+                setattr(self, counter, 0)
+
+    def connected(self, duration):
+        with self._lock:
+            self.connects += 1
+            self.connect_time += duration
+            self.max_connect_time = max(self.max_connect_time, duration)
+            self.open += 1
+            self.max_open = max(self.max_open, self.open)
+
+    def checked_out(self, duration, reused):
+        with self._lock:
+            self.checkouts += 1
+            self.reused += reused
+            self.checkout_time += duration
+            self.max_checkout_time = max(self.max_checkout_time, duration)
+
+    def health_check_failed(self):
+        with self._lock:
+            self.health_check_failures += 1
+
+    def closed(self):
+        with self._lock:
+            self.closes += 1
+            self.open = max(0, self.open - 1)
+
+    def snapshot(self, pool_size=None):
+        """Return the counters with the derived ratios"""
+        with self._lock:
+            data = {counter: getattr(self, counter)
+                    for counter in self.COUNTERS}
+        data['avg_connect_time'] = \
+            data['connect_time'] / data['connects'] if data['connects'] else 0
+        data['avg_checkout_time'] = data['checkout_time'] / \
+            data['checkouts'] if data['checkouts'] else 0
+        data['reuse_ratio'] = \
+            data['reused'] / data['checkouts'] if data['checkouts'] else 0
+        if pool_size:
+            data['pool_size'] = pool_size
+            data['saturation'] = data['open'] / pool_size
+
+        return data
+
+
+_stats = {}
+_stats_lock = threading.Lock()
+
+
+def connection_stats(alias):
+    """Return the ConnectionStats of a database alias"""
+    with _stats_lock:
+        if alias not in _stats:
+            _stats[alias] = ConnectionStats()
+        return _stats[alias]
+
+
+def all_connection_stats(pool_size=None):
+    """Return the snapshot of the stats of every alias used so far"""
+    with _stats_lock:
+        aliases = list(_stats)
+
+    return {alias: connection_stats(alias).snapshot(pool_size)
+            for alias in aliases}
+
+
+class ConnectionMetricsMixin:
+    """
+    Database wrapper mixin checking connections and recording metrics.
+
+    A persistent connection (CONN_MAX_AGE) checked out by a new request is
+    first tested with is_usable() when CONN_HEALTH_CHECKS is set, like
+    Django 4.1 does, so a connection dropped by the server or a pooler is
+    replaced instead of failing the request. Connects, checkouts, reuses
+    and open connections are counted per alias.
+
+    connect_time is the connection setup alone, checkout_time is what the
+    requests waited for a usable connection: the health check, and the
+    connect when there was none to reuse. Django keeps no pool to queue in,
+    the wait for a server connection behind pgbouncer is in its own stats
+    (SHOW POOLS maxwait, SHOW STATS avg_wait_time).
+    """
+
+    # Whether the connection was already used since the request started
+    checked_out = False
+
+    @property
+    def stats(self):
+        return connection_stats(self.alias)
+
+    def connect(self):
+        start = time.perf_counter()
+        super().connect()
+        self.stats.connected(time.perf_counter() - start)
+
+    def ensure_connection(self):
+        if self.checked_out:
+            super().ensure_connection()
+            return
+
+        # First use by the request
+        start = time.perf_counter()
+        self.checked_out = True
+        reused = self.connection is not None
+        if reused and self.settings_dict.get('CONN_HEALTH_CHECKS') and \
+                not self.in_atomic_block and not self.is_usable():
+            self.stats.health_check_failed()
+            self.close()
+            reused = False
+        super().ensure_connection()
+        self.stats.checked_out(time.perf_counter() - start, reused)
+
+    def close(self):
+        was_open = self.connection is not None
+        try:
+            super().close()
+        finally:
+            if was_open and self.connection is None:
+                self.stats.closed()
+
+    def close_if_unusable_or_obsolete(self):
+        """Called when a request starts and ends"""
+        # Its get_autocommit() call is not a checkout
+        self.checked_out = True
+        try:
+            super().close_if_unusable_or_obsolete()
+        finally:
+            self.checked_out = False
@@ -0,0 +1,7 @@
+from django.db.backends.postgresql import base
+
+from core.backends.metrics import ConnectionMetricsMixin
+
+
+class DatabaseWrapper(ConnectionMetricsMixin, base.DatabaseWrapper):
+    """PostgreSQL backend with connection health checks and metrics"""
@@ -0,0 +1,6 @@
+# Cache backends only visible to the process that wrote them. Kept free of
+# Django imports, the gunicorn config checks them before loading the app.
+PROCESS_LOCAL_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
@@ -0,0 +1,69 @@
+import glob
+import os
+import time
+from collections import Counter
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from core.models import Recipe, RECIPE_IMAGE_DIR
+from core.storage import BLOB_NAME_RE
+
+
+class Command(BaseCommand):
+    """
+    Django command to delete the recipe images no recipe references anymore
+    """
+    help = 'Delete unreferenced recipe image blobs and their variants'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--grace',
+            type=int,
+            default=3600,
+            help='Keep blobs modified in the last GRACE seconds, they may '
+                 'belong to an upload in progress'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only report the blobs that would be deleted'
+        )
+
+    def handle(self, *args, **options):
+        """Handle the command"""
+        references = Counter(
+            Recipe.objects.exclude(image='').exclude(image__isnull=True)
+            .values_list('image', flat=True).iterator()
+        )
+        cutoff = time.time() - options['grace']
+        root = default_storage.path(RECIPE_IMAGE_DIR)
+        deleted = kept = 0
+
+        for dirpath, dirnames, filenames in os.walk(root):
+            dirnames[:] = [name for name in dirnames if name != 'variants']
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                name = os.path.relpath(path, default_storage.location) \
+                    .replace(os.sep, '/')
+                match = BLOB_NAME_RE.search(name)
+                if not match:
+                    continue
+                if references[name] or os.path.getmtime(path) > cutoff:
+                    kept += 1
+                    continue
+
+                deleted += 1
+                self.stdout.write(f'Deleting {name}')
+                if options['dry_run']:
+                    continue
+                variants = glob.glob(os.path.join(
+                    dirpath, 'variants', f"{match.group('digest')}_*"
+                ))
+                for variant in variants:
+                    os.remove(variant)
+                os.remove(path)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{deleted} blobs deleted, {kept} kept'
+        ))
@@ -0,0 +1,53 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS
+from django.utils import timezone
+
+from core.models import ExpiringToken
+
+
+class Command(BaseCommand):
+    """
+    Django command deleting the expired API tokens.
+
+    Expired keys are read from the expires index and deleted by primary key
+    in batches, each in its own short transaction, so the table is never
+    locked for long and the replicas can keep up. The deletes send
+    post_delete, which drops the tokens from the authentication cache.
+    """
+    help = 'Delete the expired API tokens in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--sleep', type=float, default=0.0,
+                            help='Seconds to wait between batches')
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+
+    def handle(self, *args, **options):
+        """Handle the command"""
+        using = options['database']
+        batch_size = options['batch_size']
+        start = time.monotonic()
+        now = timezone.now()
+        expired = ExpiringToken.objects.using(using).filter(expires__lte=now)
+
+        purged = batches = 0
+        while True:
+            keys = list(expired.order_by().values_list('pk', flat=True)
+                        [:batch_size])
+            if not keys:
+                break
+            # Tokens refreshed since they were read are kept
+            deleted, _per_model = expired.filter(pk__in=keys).delete()
+            purged += deleted
+            batches += 1
+            if len(keys) < batch_size:
+                break
+            if options['sleep']:
+                time.sleep(options['sleep'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Purged {purged} expired tokens in {batches} batches '
+            f'({time.monotonic() - start:.1f}s)'
+        ))
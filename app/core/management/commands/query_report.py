@@ -0,0 +1,93 @@
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.queries import read_records, rotated_path
+
+
+SORT_KEYS = {
+    'time': lambda stats: stats['time'],
+    'count': lambda stats: stats['count'],
+    'n_plus_one': lambda stats: (stats['n_plus_one'], stats['count']),
+    'slow': lambda stats: (stats['slow'], stats['time']),
+}
+
+
+class Command(BaseCommand):
+    """Django command to summarize the query inspector log"""
+    help = 'Show the query shapes costing the most in the inspected requests'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--file',
+            default=settings.QUERY_INSPECTOR_LOG,
+            help='Query inspector log to read (QUERY_INSPECTOR_LOG)'
+        )
+        parser.add_argument(
+            '--top', type=int, default=10,
+            help='Number of query shapes to show'
+        )
+        parser.add_argument(
+            '--sort', choices=sorted(SORT_KEYS), default='time',
+            help='Rank the query shapes by total time, executions, requests '
+                 'with an N+1 pattern or slow executions'
+        )
+        parser.add_argument(
+            '--view',
+            help='Only consider the requests to this view name'
+        )
+
+    def handle(self, *args, **options):
+        """Handle the command"""
+        path = options['file']
+        if not path or not (os.path.exists(path) or
+                            os.path.exists(rotated_path(path))):
+            raise CommandError(f'No query inspector log at {path!r}')
+
+        requests = 0
+        offenders = {}
+        for record in read_records(path):
+            if options['view'] and record['view'] != options['view']:
+                continue
+            requests += 1
+            n_plus_one = set(record['n_plus_one'])
+            slow = {}
+            for query in record['slow']:
+                slow[query['fingerprint']] = \
+                    slow.get(query['fingerprint'], 0) + 1
+
+            for query in record['fingerprints']:
+                stats = offenders.setdefault(query['fingerprint'], {
+                    'sql': query['sql'],
+                    'origin': query['origin'],
+                    'views': set(),
+                    'requests': 0,
+                    'count': 0,
+                    'time': 0.0,
+                    'n_plus_one': 0,
+                    'slow': 0,
+                })
+                stats['views'].add(record['view'])
+                stats['requests'] += 1
+                stats['count'] += query['count']
+                stats['time'] += query['time']
+                stats['n_plus_one'] += query['fingerprint'] in n_plus_one
+                stats['slow'] += slow.get(query['fingerprint'], 0)
+
+        self.stdout.write(f'{requests} inspected request(s), '
+                          f'{len(offenders)} query shape(s)')
+        ranked = sorted(offenders.items(), key=lambda item:
+                        SORT_KEYS[options['sort']](item[1]), reverse=True)
+        for fingerprint, stats in ranked[:options['top']]:
+            self.stdout.write('')
+            self.stdout.write(self.style.WARNING(
+                f'{fingerprint}  {stats["time"] * 1000:.1f} ms total, '
+                f'{stats["count"]} executions in {stats["requests"]} '
+                f'request(s), {stats["count"] / stats["requests"]:.1f} per '
+                f'request, N+1 in {stats["n_plus_one"]}, '
+                f'{stats["slow"]} slow'
+            ))
+            self.stdout.write(f'  views:  {", ".join(sorted(stats["views"]))}')
+            self.stdout.write(f'  origin: {stats["origin"]}')
+            self.stdout.write(f'  sql:    {stats["sql"][:500]}')
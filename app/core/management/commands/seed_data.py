@@ -0,0 +1,422 @@
+import bisect
+import io
+import itertools
+import random
+import time
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.core.management.color import no_style
+from django.db import connections, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from core.models import ExpiringToken, ListVersion, User, Tag, Ingredient, \
+    Recipe
+from core.search import full_text_enabled, update_search_vectors
+
+
+SEED_EMAIL_DOMAIN = 'seed.example.com'
+
+TAG_NAMES = (
+    'Vegan', 'Vegetarian', 'Dessert', 'Breakfast', 'Dinner', 'Lunch',
+    'Quick', 'Healthy', 'Gluten Free', 'Spicy', 'Comfort Food', 'Baking',
+    'Italian', 'Mexican', 'Asian', 'Indian', 'French', 'Soup', 'Salad',
+    'Snack', 'Grill', 'Seafood', 'Low Carb', 'Party', 'Kids',
+)
+INGREDIENT_NAMES = (
+    'Salt', 'Pepper', 'Olive Oil', 'Garlic', 'Onion', 'Butter', 'Sugar',
+    'Flour', 'Egg', 'Milk', 'Tomato', 'Lemon', 'Rice', 'Chicken', 'Beef',
+    'Potato', 'Carrot', 'Cheese', 'Basil', 'Parsley', 'Ginger', 'Chili',
+    'Cream', 'Pasta', 'Mushroom', 'Spinach', 'Honey', 'Soy Sauce', 'Lime',
+    'Cinnamon', 'Yogurt', 'Bread', 'Salmon', 'Bean', 'Coconut Milk',
+)
+TITLE_ADJECTIVES = (
+    'Easy', 'Classic', 'Creamy', 'Crispy', 'Spicy', 'Homemade', 'Roasted',
+    'Grilled', 'Quick', 'Rustic', 'Lemony', 'Smoky', 'Sweet', 'Hearty',
+)
+TITLE_DISHES = (
+    'Pasta', 'Curry', 'Soup', 'Salad', 'Stew', 'Pie', 'Risotto', 'Tacos',
+    'Stir Fry', 'Cake', 'Pancakes', 'Omelette', 'Burger', 'Casserole',
+    'Noodles', 'Bread', 'Cookies', 'Chili', 'Sandwich', 'Bowl',
+)
+
+# Number of tags and ingredients of a recipe
+TAGS_PER_RECIPE = (0, 1, 1, 2, 2, 2, 3, 3, 4, 5)
+INGREDIENTS_PER_RECIPE = range(3, 13)
+
+
+def zipf_weights(count, exponent):
+    """Return the cumulative weights of a Zipf distribution over ranks"""
+    return list(itertools.accumulate(
+        1 / rank ** exponent for rank in range(1, count + 1)
+    ))
+
+
+def zipf_sample(rng, population, cum_weights, count):
+    """Pick up to count distinct items, the first ones are the most likely"""
+    total = cum_weights[-1]
+    return {population[bisect.bisect(cum_weights, rng.random() * total)]
+            for _ in range(count)}
+
+
+def name_for(names, index):
+    """Return a realistic name, numbered once the names run out"""
+    name = names[index % len(names)]
+    return name if index < len(names) else f'{name} {index // len(names)}'
+
+
+def _copy_value(value):
+    if value is None:
+        return '\\N'
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return str(value).replace('\\', '\\\\').replace('\t', '\\t') \
+        .replace('\n', '\\n').replace('\r', '\\r')
+
+
+class CopyWriter:
+    """Write rows with PostgreSQL COPY, the fastest way to load them"""
+
+    def __init__(self, using):
+        self.connection = connections[using]
+
+    def write(self, model, columns, rows):
+        if not rows:
+            return
+        buffer = io.StringIO()
+        for row in rows:
+            buffer.write('\t'.join(map(_copy_value, row)))
+            buffer.write('\n')
+        buffer.seek(0)
+        quote = self.connection.ops.quote_name
+        sql = 'COPY {} ({}) FROM STDIN'.format(
+            quote(model._meta.db_table),
+            ', '.join(map(quote, columns))
+        )
+        with self.connection.cursor() as cursor:
+            cursor.copy_expert(sql, buffer)
+
+
+class InsertWriter:
+    """Write rows with executemany INSERTs on the other databases"""
+
+    def __init__(self, using):
+        self.connection = connections[using]
+
+    def _adapters(self, model, columns):
+        """Return the function preparing the values of every column"""
+        ops = self.connection.ops
+        adapters = []
+        for column in columns:
+            field = next(field for field in model._meta.concrete_fields
+                         if field.attname == column)
+            internal_type = field.get_internal_type()
+            if internal_type == 'DateTimeField':
+                adapters.append(ops.adapt_datetimefield_value)
+            elif internal_type == 'DecimalField':
+                adapters.append(lambda value, field=field:
+                                ops.adapt_decimalfield_value(
+                                    value, field.max_digits,
+                                    field.decimal_places
+                                ))
+            else:
+                adapters.append(None)
+
+        return adapters
+
+    def write(self, model, columns, rows):
+        if not rows:
+            return
+        adapters = self._adapters(model, columns)
+        if any(adapters):
+            rows = [tuple(value if adapt is None else adapt(value)
+                          for adapt, value in zip(adapters, row))
+                    for row in rows]
+        quote = self.connection.ops.quote_name
+        sql = 'INSERT INTO {} ({}) VALUES ({})'.format(
+            quote(model._meta.db_table),
+            ', '.join(map(quote, columns)),
+            ', '.join(['%s'] * len(columns))
+        )
+        with self.connection.cursor() as cursor:
+            cursor.executemany(sql, rows)
+
+
+class Command(BaseCommand):
+    """
+    Django command filling the database with synthetic data at production
+    scale, to reproduce its query plans and benchmark against it.
+
+    Rows are generated with explicit ids and written in batches, with COPY
+    on PostgreSQL and executemany INSERTs elsewhere, skipping the model
+    instances, signals and password hashing per row. Recipes per user, and
+    the tags and ingredients of the recipes, follow Zipf distributions: a
+    few users own most recipes and a few tags and ingredients are used
+    everywhere.
+    """
+    help = 'Fill the database with synthetic users, tags, ingredients ' \
+           'and recipes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--recipes', type=int, default=100000,
+                            help='Total number of recipes')
+        parser.add_argument('--tags-per-user', type=int, default=30)
+        parser.add_argument('--ingredients-per-user', type=int, default=80)
+        parser.add_argument('--zipf', type=float, default=1.1,
+                            help='Exponent of the Zipf distributions')
+        parser.add_argument('--batch-size', type=int, default=10000)
+        parser.add_argument('--password', default='seed-password',
+                            help='Password of every seeded user')
+        parser.add_argument('--seed', type=int, default=0,
+                            help='Random seed, the same seed gives the '
+                                 'same data')
+        parser.add_argument('--reset', action='store_true',
+                            help='Delete the previously seeded data first')
+        parser.add_argument('--no-copy', action='store_true',
+                            help='Use INSERTs even on PostgreSQL')
+        parser.add_argument('--database', default='default')
+
+    def handle(self, *args, **options):
+        """Handle the command"""
+        self.using = options['database']
+        self.batch_size = options['batch_size']
+        self.rng = random.Random(options['seed'])
+        connection = connections[self.using]
+        if connection.vendor == 'postgresql' and not options['no_copy']:
+            self.writer = CopyWriter(self.using)
+        else:
+            self.writer = InsertWriter(self.using)
+        self.started = time.monotonic()
+
+        with transaction.atomic(using=self.using):
+            if options['reset']:
+                self._step('Deleted the seeded data', self.reset)
+            user_ids = self._step('Users', self.seed_users,
+                                  options['users'], options['password'])
+            tags = self._step('Tags', self.seed_named, Tag, TAG_NAMES,
+                              user_ids, options['tags_per_user'])
+            ingredients = self._step(
+                'Ingredients', self.seed_named, Ingredient,
+                INGREDIENT_NAMES, user_ids, options['ingredients_per_user']
+            )
+            first_recipe, last_recipe = self._step(
+                'Recipes', self.seed_recipes, user_ids, tags, ingredients,
+                options['recipes'], options['zipf']
+            )
+            self._step('Sequences reset', self.reset_sequences)
+
+        if full_text_enabled(self.using):
+            self._step('Search vectors', self.update_search_vectors,
+                       first_recipe, last_recipe)
+        if connection.vendor == 'postgresql':
+            self._step('Statistics', self.analyze)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Seeded {len(user_ids)} users and '
+            f'{last_recipe - first_recipe} recipes in '
+            f'{time.monotonic() - self.started:.1f}s'
+        ))
+
+    def _step(self, label, function, *args):
+        start = time.monotonic()
+        result = function(*args)
+        self.stdout.write(f'{label}: {time.monotonic() - start:.1f}s')
+        return result
+
+    def _next_id(self, model):
+        last = model.objects.using(self.using).aggregate(Max('id'))['id__max']
+        return (last or 0) + 1
+
+    def _write_batches(self, model, columns, rows):
+        """Write the rows of an iterable in batches, return their number"""
+        written = 0
+        rows = iter(rows)
+        while True:
+            batch = list(itertools.islice(rows, self.batch_size))
+            if not batch:
+                return written
+            self.writer.write(model, columns, batch)
+            written += len(batch)
+
+    def reset(self):
+        """
+        Delete the seeded rows, batch_size at a time so the collector never
+        loads all of them. Children go first, their deletes don't have to
+        cascade, and the signals run as for any other delete.
+        """
+        seeded = {'user__email__endswith': f'@{SEED_EMAIL_DOMAIN}'}
+        recipe_seeded = {f'recipe__{key}': value
+                         for key, value in seeded.items()}
+        for queryset in (
+            Recipe.tags.through.objects.filter(**recipe_seeded),
+            Recipe.ingredients.through.objects.filter(**recipe_seeded),
+            Recipe.objects.filter(**seeded),
+            Tag.objects.filter(**seeded),
+            Ingredient.objects.filter(**seeded),
+            ExpiringToken.objects.filter(**seeded),
+            ListVersion.objects.filter(**seeded),
+            User.objects.filter(email__endswith=f'@{SEED_EMAIL_DOMAIN}'),
+        ):
+            queryset = queryset.using(self.using)
+            while True:
+                pks = list(queryset.order_by()
+                           .values_list('pk', flat=True)[:self.batch_size])
+                if not pks:
+                    break
+                queryset.model.objects.using(self.using) \
+                    .filter(pk__in=pks).delete()
+
+    def seed_users(self, count, password):
+        """Create the users and their token, return their ids"""
+        first_id = self._next_id(User)
+        # Hashing is slow on purpose, every user shares one hash
+        password_hash = make_password(password)
+        user_ids = list(range(first_id, first_id + count))
+        now = timezone.now()
+
+        self._write_batches(
+            User,
+            ('id', 'email', 'name', 'password', 'is_active', 'is_staff',
+             'is_superuser', 'last_login'),
+            ((user_id, f'user{user_id}@{SEED_EMAIL_DOMAIN}',
+              f'Seed User {user_id}', password_hash, True, False, False,
+              None)
+             for user_id in user_ids)
+        )
+        expires = ExpiringToken.expiry()
+        self._write_batches(
+            ExpiringToken,
+            ('key', 'user_id', 'created', 'expires'),
+            ((ExpiringToken.generate_key(), user_id, now, expires)
+             for user_id in user_ids)
+        )
+
+        return user_ids
+
+    def seed_named(self, model, names, user_ids, per_user):
+        """
+        Create per_user tags or ingredients for every user, return the ids
+        of each user's in popularity order
+        """
+        first_id = self._next_id(model)
+        ids = {user_id: range(first_id + i * per_user,
+                              first_id + (i + 1) * per_user)
+               for i, user_id in enumerate(user_ids)}
+
+        self._write_batches(
+            model,
+            ('id', 'user_id', 'name'),
+            ((object_id, user_id, name_for(names, index))
+             for user_id, object_ids in ids.items()
+             for index, object_id in enumerate(object_ids))
+        )
+
+        return ids
+
+    def recipe_counts(self, user_ids, total, exponent):
+        """Split the recipes between the users following a Zipf law"""
+        weights = [1 / rank ** exponent
+                   for rank in range(1, len(user_ids) + 1)]
+        self.rng.shuffle(weights)
+        scale = total / sum(weights)
+        counts = [int(weight * scale) for weight in weights]
+        for i in range(total - sum(counts)):
+            counts[i % len(counts)] += 1
+
+        return dict(zip(user_ids, counts))
+
+    def seed_recipes(self, user_ids, tags, ingredients, total, exponent):
+        """Create the recipes with their tags and ingredients"""
+        first_id = self._next_id(Recipe)
+        counts = self.recipe_counts(user_ids, total, exponent)
+        tag_weights = ingredient_weights = None
+        now = timezone.now()
+        recipe_id = first_id
+        recipes, recipe_tags, recipe_ingredients = [], [], []
+
+        for user_id, count in counts.items():
+            user_tags = tags[user_id]
+            user_ingredients = ingredients[user_id]
+            if tag_weights is None:
+                tag_weights = zipf_weights(len(user_tags), exponent)
+                ingredient_weights = zipf_weights(len(user_ingredients),
+                                                  exponent)
+            for _ in range(count):
+                recipes.append((
+                    recipe_id, user_id,
+                    f'{self.rng.choice(TITLE_ADJECTIVES)} '
+                    f'{self.rng.choice(TITLE_DISHES)} with '
+                    f'{self.rng.choice(INGREDIENT_NAMES).lower()}',
+                    self.rng.choice((5, 10, 15, 20, 30, 45, 60, 90, 120)),
+                    Decimal(self.rng.randrange(100, 50000)) / 100,
+                    '', None, now,
+                ))
+                if user_tags:
+                    for tag_id in zipf_sample(
+                        self.rng, user_tags, tag_weights,
+                        self.rng.choice(TAGS_PER_RECIPE)
+                    ):
+                        recipe_tags.append((recipe_id, tag_id))
+                if user_ingredients:
+                    for ingredient_id in zipf_sample(
+                        self.rng, user_ingredients, ingredient_weights,
+                        self.rng.choice(INGREDIENTS_PER_RECIPE)
+                    ):
+                        recipe_ingredients.append((recipe_id, ingredient_id))
+                recipe_id += 1
+
+                if len(recipes) >= self.batch_size:
+                    self._flush(recipes, recipe_tags, recipe_ingredients)
+
+        self._flush(recipes, recipe_tags, recipe_ingredients)
+
+        return first_id, recipe_id
+
+    def _flush(self, recipes, recipe_tags, recipe_ingredients):
+        """Write the pending recipes, then their through rows"""
+        self.writer.write(
+            Recipe,
+            ('id', 'user_id', 'title', 'time_minutes', 'price', 'link',
+             'image', 'updated_at'),
+            recipes
+        )
+        self._write_batches(Recipe.tags.through, ('recipe_id', 'tag_id'),
+                            recipe_tags)
+        self._write_batches(Recipe.ingredients.through,
+                            ('recipe_id', 'ingredient_id'),
+                            recipe_ingredients)
+        recipes.clear()
+        recipe_tags.clear()
+        recipe_ingredients.clear()
+
+    def reset_sequences(self):
+        """Move the id sequences past the explicit ids"""
+        connection = connections[self.using]
+        statements = connection.ops.sequence_reset_sql(
+            no_style(), [User, Tag, Ingredient, Recipe]
+        )
+        with connection.cursor() as cursor:
+            for sql in statements:
+                cursor.execute(sql)
+
+    def update_search_vectors(self, first_id, last_id):
+        """Fill in the search vectors in batches of recipes"""
+        step = self.batch_size * 10
+        for start in range(first_id, last_id, step):
+            with transaction.atomic(using=self.using):
+                update_search_vectors(Recipe.objects.using(self.using).filter(
+                    id__gte=start, id__lt=min(start + step, last_id)
+                ))
+
+    def analyze(self):
+        """Refresh the planner statistics of the loaded tables"""
+        quote = connections[self.using].ops.quote_name
+        with connections[self.using].cursor() as cursor:
+            for model in (User, Tag, Ingredient, Recipe,
+                          Recipe.tags.through, Recipe.ingredients.through):
+                cursor.execute(f'ANALYZE {quote(model._meta.db_table)}')
@@ -1,22 +1,120 @@
+import random
+import threading
 import time
 
 from django.db import connections
 from django.db.utils import OperationalError
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
+
+
+# Seconds a probe still in flight at the deadline is waited for
+PROBE_GRACE = 5
+
+
+def probe(alias):
+    """Connect to the database and run a trivial query"""
+    connection = connections[alias]
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+    finally:
+        # Every probe runs in its own thread, don't leave it open
+        connection.close()
 
 
 class Command(BaseCommand):
     """Django command to pause execution until database is available"""
+    help = 'Wait until every database accepts queries'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--database', action='append', dest='databases',
+            help='Alias to wait for, repeatable, all of them by default'
+        )
+        parser.add_argument(
+            '--timeout', type=float, default=60,
+            help='Seconds to wait before giving up'
+        )
+        parser.add_argument(
+            '--initial-delay', type=float, default=0.1,
+            help='Seconds to wait after the first failed probe, doubled '
+                 'after every failure'
+        )
+        parser.add_argument(
+            '--max-delay', type=float, default=5,
+            help='Maximum seconds between two probes'
+        )
 
     def handle(self, *args, **options):
         """Handle the command"""
+        aliases = options['databases'] or list(connections)
         self.stdout.write('Waiting for database...')
-        db_conn = None
-        while not db_conn:
+        self._lock = threading.Lock()
+        self.ready = {}
+        self.errors = {}
+
+        start = time.monotonic()
+        deadline = start + options['timeout']
+        threads = [
+            threading.Thread(
+                target=self._wait,
+                args=(alias, start, deadline, options),
+                name=f'wait_for_db-{alias}',
+                daemon=True
+            )
+            for alias in aliases
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(max(0, deadline - time.monotonic()) + PROBE_GRACE)
+
+        not_ready = [alias for alias in aliases if alias not in self.ready]
+        if not_ready:
+            raise CommandError('Database unavailable after {:.2f}s: {}'.format(
+                time.monotonic() - start,
+                ', '.join(f'{alias} ({self.errors.get(alias, "timeout")})'
+                          for alias in not_ready)
+            ))
+
+        for alias in aliases:
+            elapsed, attempts = self.ready[alias]
+            self.stdout.write(f"Database '{alias}' ready in {elapsed:.2f}s "
+                              f"after {attempts} attempt(s)")
+        self.stdout.write(self.style.SUCCESS(
+            f'Database available! ({time.monotonic() - start:.2f}s)'
+        ))
+
+    def _write(self, message):
+        with self._lock:
+            self.stdout.write(message)
+
+    def _wait(self, alias, start, deadline, options):
+        """Probe a database with exponential backoff until the deadline"""
+        attempt = 0
+        while True:
+            attempt += 1
             try:
-                db_conn = connections['default']
-            except OperationalError:
-                self.stdout.write('Database unavailable, waiting 1 second...')
-                time.sleep(1)
+                probe(alias)
+            except OperationalError as error:
+                self.errors[alias] = ' '.join(str(error).split()) or \
+                    'unavailable'
+            except Exception as error:
+                # Misconfiguration, waiting won't help
+                self.errors[alias] = repr(error)
+                return
+            else:
+                self.ready[alias] = (time.monotonic() - start, attempt)
+                return
 
-        self.stdout.write(self.style.SUCCESS('Database available!'))
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            # Exponential backoff with jitter, so the containers started
+            # together don't all retry at the same time
+            delay = min(options['max_delay'],
+                        options['initial_delay'] * 2 ** (attempt - 1))
+            delay = min(remaining, delay / 2 + random.uniform(0, delay / 2))
+            self._write(f"Database '{alias}' unavailable, waiting "
+                        f"{delay:.2f} seconds...")
+            time.sleep(delay)
@@ -0,0 +1,197 @@
+import bisect
+import contextlib
+import contextvars
+import threading
+import time
+
+
+# Upper bounds of the histogram buckets
+DURATION_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                    1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+
+class Histogram:
+    """Cumulative histogram of observed values, per label values"""
+
+    def __init__(self, name, help_text, labels, buckets):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        # label values -> [bucket counts..., +Inf count, sum]
+        self._series = {}
+
+    def observe(self, value, *label_values):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = \
+                    [0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-1] += value
+
+    def samples(self):
+        """Yield the (suffix, labels, value) of the Prometheus samples"""
+        with self._lock:
+            series = {labels: list(values)
+                      for labels, values in self._series.items()}
+
+        for label_values, values in sorted(series.items()):
+            labels = dict(zip(self.labels, label_values))
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), values):
+                cumulative += count
+                yield '_bucket', {**labels, 'le': str(bound)}, cumulative
+            yield '_count', labels, cumulative
+            yield '_sum', labels, values[-1]
+
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+
+
+REQUEST_DURATION = Histogram(
+    'http_request_duration_seconds', 'Time spent handling the requests',
+    ('view', 'method', 'status'), DURATION_BUCKETS
+)
+DB_DURATION = Histogram(
+    'http_request_db_duration_seconds',
+    'Time spent in database queries per request',
+    ('view', 'method'), DURATION_BUCKETS
+)
+DB_QUERIES = Histogram(
+    'http_request_db_queries', 'Database queries per request',
+    ('view', 'method'), QUERY_BUCKETS
+)
+SERIALIZER_DURATION = Histogram(
+    'http_request_serializer_duration_seconds',
+    'Time spent serializing objects per request',
+    ('view', 'method'), DURATION_BUCKETS
+)
+RESPONSE_SIZE = Histogram(
+    'http_response_size_bytes', 'Size of the response bodies',
+    ('view', 'method'), SIZE_BUCKETS
+)
+
+HISTOGRAMS = (REQUEST_DURATION, DB_DURATION, DB_QUERIES,
+              SERIALIZER_DURATION, RESPONSE_SIZE)
+
+
+class RequestMetrics:
+    """What a request spent its time on"""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.serializer_time = 0.0
+
+
+# Metrics of the request being handled, a context variable follows the
+# request to the thread pool under ASGI
+_current = contextvars.ContextVar('request_metrics', default=None)
+_serializing = contextvars.ContextVar('serializing', default=False)
+
+
+def start_request():
+    metrics = RequestMetrics()
+    _current.set(metrics)
+    return metrics
+
+
+def end_request():
+    _current.set(None)
+
+
+@contextlib.contextmanager
+def recording(metrics):
+    """Add what runs in the block to the metrics of a finished request"""
+    token = _current.set(metrics)
+    try:
+        yield
+    finally:
+        _current.reset(token)
+
+
+def current_request():
+    return _current.get()
+
+
+def record_query(execute, sql, params, many, context):
+    """Execute wrapper adding the queries to the request metrics"""
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.queries += 1
+        metrics.db_time += time.perf_counter() - start
+
+
+def install_query_recorder(sender, connection, **kwargs):
+    """Add record_query to every new database connection"""
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+class TimedSerializerMixin:
+    """
+    Serializer mixin adding the time spent in to_representation to the
+    request metrics. Nested serializers are part of their parent's time,
+    the items of a list are timed one by one.
+    """
+
+    def to_representation(self, instance):
+        metrics = _current.get()
+        if metrics is None or _serializing.get():
+            return super().to_representation(instance)
+
+        token = _serializing.set(True)
+        start = time.perf_counter()
+        try:
+            return super().to_representation(instance)
+        finally:
+            metrics.serializer_time += time.perf_counter() - start
+            _serializing.reset(token)
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    pairs = ','.join('{}="{}"'.format(
+        key, str(value).replace('\\', '\\\\').replace('"', '\\"')
+    ) for key, value in labels.items())
+
+    return '{' + pairs + '}'
+
+
+def render_prometheus(extra=()):
+    """
+    Return the histograms, plus the extra (name, type, help, labels, value)
+    samples, in the Prometheus text format
+    """
+    lines = []
+    for histogram in HISTOGRAMS:
+        lines.append(f'# HELP {histogram.name} {histogram.help_text}')
+        lines.append(f'# TYPE {histogram.name} histogram')
+        for suffix, labels, value in histogram.samples():
+            lines.append(f'{histogram.name}{suffix}'
+                         f'{_format_labels(labels)} {value}')
+
+    seen = set()
+    for name, metric_type, help_text, labels, value in \
+            sorted(extra, key=lambda sample: sample[0]):
+        if name not in seen:
+            seen.add(name)
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {metric_type}')
+        lines.append(f'{name}{_format_labels(labels)} {value}')
+
+    return '\n'.join(lines) + '\n'
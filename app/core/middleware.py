@@ -0,0 +1,78 @@
+import time
+
+from django.utils.deprecation import MiddlewareMixin
+
+from core import metrics
+
+
+class PerformanceMiddleware(MiddlewareMixin):
+    """
+    Measure every request: total time, database queries and time,
+    serialization time and response size.
+
+    They are sent back in a Server-Timing header and added to the
+    histograms served by the metrics endpoint, labelled with the view name
+    (e.g. recipe:recipe-list). It should be first in MIDDLEWARE so the
+    other middlewares are part of the total. A streamed response is
+    observed once its body is sent, without a Server-Timing header.
+    """
+
+    def process_request(self, request):
+        request._metrics = metrics.start_request()
+
+    def process_response(self, request, response):
+        request_metrics = getattr(request, '_metrics', None)
+        if request_metrics is None:
+            return response
+        metrics.end_request()
+
+        match = getattr(request, 'resolver_match', None)
+        labels = (match.view_name if match else '<unresolved>',
+                  request.method, str(response.status_code))
+        if response.streaming:
+            # The body is produced after this returns, it's measured while
+            # it's sent and there's no header left to report it in
+            response.streaming_content = self._measure_stream(
+                response.streaming_content, request_metrics, labels
+            )
+            return response
+
+        duration = self._observe(request_metrics, labels,
+                                 len(response.content))
+        response['Server-Timing'] = ', '.join((
+            f'total;dur={duration * 1000:.2f}',
+            f'db;dur={request_metrics.db_time * 1000:.2f};'
+            f'desc="{request_metrics.queries} queries"',
+            f'serializer;dur={request_metrics.serializer_time * 1000:.2f}',
+        ))
+
+        return response
+
+    def _measure_stream(self, content, request_metrics, labels):
+        """Yield the chunks, observing the request once they are all sent"""
+        size = 0
+        try:
+            chunks = iter(content)
+            while True:
+                with metrics.recording(request_metrics):
+                    chunk = next(chunks, None)
+                if chunk is None:
+                    break
+                size += len(chunk)
+                yield chunk
+        finally:
+            # Also run when the client goes away and the server closes it
+            self._observe(request_metrics, labels, size)
+
+    def _observe(self, request_metrics, labels, size):
+        """Add the request to the histograms, return its duration"""
+        duration = time.perf_counter() - request_metrics.start
+        view, method, status = labels
+        metrics.REQUEST_DURATION.observe(duration, view, method, status)
+        metrics.DB_DURATION.observe(request_metrics.db_time, view, method)
+        metrics.DB_QUERIES.observe(request_metrics.queries, view, method)
+        metrics.SERIALIZER_DURATION.observe(request_metrics.serializer_time,
+                                            view, method)
+        metrics.RESPONSE_SIZE.observe(size, view, method)
+
+        return duration
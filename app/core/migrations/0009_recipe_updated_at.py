@@ -0,0 +1,21 @@
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_recipe_image'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='updated_at',
+            field=models.DateTimeField(
+                auto_now=True,
+                default=django.utils.timezone.now
+            ),
+            preserve_default=False,
+        ),
+    ]
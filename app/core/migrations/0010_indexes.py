@@ -0,0 +1,50 @@
+# Generated by Django 3.2.25 on 2026-10-18 18:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_recipe_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='ingredient',
+            index=models.Index(fields=['user', 'id'], name='core_ingredient_user_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ingredient',
+            index=models.Index(fields=['user', 'name'], name='core_ingredient_user_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['user', 'id'], name='core_recipe_user_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['user', 'updated_at'], name='core_recipe_user_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tag',
+            index=models.Index(fields=['user', 'id'], name='core_tag_user_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tag',
+            index=models.Index(fields=['user', 'name'], name='core_tag_user_name_idx'),
+        ),
+        # The auto created through tables already have a unique
+        # (recipe_id, <attr>_id) index, this one serves the reverse lookups
+        # (recipes of a tag/ingredient) without reading the table
+        migrations.RunSQL(
+            'CREATE INDEX core_recipe_tags_tag_recipe_idx '
+            'ON core_recipe_tags (tag_id, recipe_id)',
+            'DROP INDEX core_recipe_tags_tag_recipe_idx',
+        ),
+        migrations.RunSQL(
+            'CREATE INDEX core_recipe_ingr_ingr_recipe_idx '
+            'ON core_recipe_ingredients (ingredient_id, recipe_id)',
+            'DROP INDEX core_recipe_ingr_ingr_recipe_idx',
+        ),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 3.2.25 on 2026-10-18 18:58
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+
+# Configuration of the vectors built here, fixed as a later change of
+# settings.RECIPE_SEARCH_CONFIG must not change what this migration did
+SEARCH_CONFIG = 'english'
+
+# Same document as core.search.recipe_search_vector()
+FILL_SEARCH_VECTOR = """
+UPDATE core_recipe r SET search_vector =
+    setweight(to_tsvector(%(config)s::regconfig, coalesce(r.title, '')),
+              'A') ||
+    setweight(to_tsvector(%(config)s::regconfig, coalesce((
+        SELECT string_agg(t.name, ' ') FROM core_tag t
+        JOIN core_recipe_tags rt ON rt.tag_id = t.id
+        WHERE rt.recipe_id = r.id
+    ), '')), 'B') ||
+    setweight(to_tsvector(%(config)s::regconfig, coalesce((
+        SELECT string_agg(i.name, ' ') FROM core_ingredient i
+        JOIN core_recipe_ingredients ri ON ri.ingredient_id = i.id
+        WHERE ri.recipe_id = r.id
+    ), '')), 'C')
+"""
+
+
+def create_search_index(apps, schema_editor):
+    """The GIN index and the vectors only exist on PostgreSQL"""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        'CREATE INDEX core_recipe_search_gin '
+        'ON core_recipe USING gin (search_vector)'
+    )
+    schema_editor.execute(FILL_SEARCH_VECTOR, {'config': SEARCH_CONFIG})
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('DROP INDEX core_recipe_search_gin')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 3.2.25 on 2026-10-18 19:27
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+from django.utils import timezone
+
+
+def copy_auth_tokens(apps, schema_editor):
+    """Keep the clients logged in, their token expires TOKEN_TTL from now"""
+    connection = schema_editor.connection
+    expires = timezone.now() + timedelta(seconds=settings.TOKEN_TTL)
+    schema_editor.execute(
+        'INSERT INTO core_expiringtoken (key, user_id, created, expires) '
+        'SELECT key, user_id, created, %s FROM authtoken_token',
+        [connection.ops.adapt_datetimefield_value(expires)]
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authtoken', '0002_auto_20160226_1747'),
+        ('core', '0011_recipe_search_vector'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExpiringToken',
+            fields=[
+                ('key', models.CharField(max_length=40, primary_key=True, serialize=False)),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('expires', models.DateTimeField(db_index=True)),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='expiring_token', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.RunPython(copy_auth_tokens, migrations.RunPython.noop),
+    ]
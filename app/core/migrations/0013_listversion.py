@@ -0,0 +1,28 @@
+# Generated by Django 3.2.25 on 2026-10-18 19:39
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_expiringtoken'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ListVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model', models.CharField(max_length=100)),
+                ('changed_at', models.DateTimeField()),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='listversion',
+            constraint=models.UniqueConstraint(fields=('user', 'model'), name='core_listversion_user_model_uniq'),
+        ),
+    ]
@@ -1,17 +1,27 @@
 import os, uuid
+import binascii
+from datetime import timedelta
 
 from django.db import models
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, \
                                                         PermissionsMixin
 from django.conf import settings
+from django.contrib.postgres.search import SearchVectorField
+from django.utils import timezone
+
+
+RECIPE_IMAGE_DIR = 'uploads/recipe/'
 
 
 def recipe_image_file_path(instance, filename):
-    """Redefine the name and path of a file"""
+    """
+    Redefine the name and path of a file, the content addressed storage
+    then renames it after its content
+    """
     ext = filename.split('.')[-1]
     filename =f'{uuid.uuid4()}.{ext}'
     
-    return os.path.join('uploads/recipe/', filename)
+    return os.path.join(RECIPE_IMAGE_DIR, filename)
 
 
 class UserManager(BaseUserManager):
@@ -48,6 +58,60 @@ class User(AbstractBaseUser, PermissionsMixin):
     USERNAME_FIELD = 'email'
 
 
+class ExpiringToken(models.Model):
+    """
+    API token of a user, valid until expires. Using it pushes expires back
+    to TOKEN_TTL seconds later, the purge_tokens command deletes the rest.
+    """
+    key = models.CharField(max_length=40, primary_key=True)
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        related_name='expiring_token',
+        on_delete=models.CASCADE
+    )
+    created = models.DateTimeField(auto_now_add=True)
+    # Indexed for purge_tokens
+    expires = models.DateTimeField(db_index=True)
+
+    def save(self, *args, **kwargs):
+        if not self.key:
+            self.key = self.generate_key()
+        if not self.expires:
+            self.expires = self.expiry()
+
+        return super().save(*args, **kwargs)
+
+    @staticmethod
+    def generate_key():
+        return binascii.hexlify(os.urandom(20)).decode()
+
+    @staticmethod
+    def expiry():
+        """Return the expiry of a token used now"""
+        return timezone.now() + timedelta(seconds=settings.TOKEN_TTL)
+
+    @property
+    def is_expired(self):
+        return self.expires <= timezone.now()
+
+    def refresh(self):
+        """
+        Push the expiry back, at most every TOKEN_REFRESH_INTERVAL seconds
+        so that a busy client doesn't write on every request
+        """
+        expires = self.expiry()
+        interval = timedelta(seconds=settings.TOKEN_REFRESH_INTERVAL)
+        if expires - self.expires < interval:
+            return False
+
+        ExpiringToken.objects.filter(pk=self.pk).update(expires=expires)
+        self.expires = expires
+        return True
+
+    def __str__(self):
+        return self.key
+
+
 class Tag(models.Model):
     """Tag to be user for a recipe"""
     name = models.CharField(max_length=255)
@@ -56,6 +120,13 @@ class Tag(models.Model):
         on_delete=models.CASCADE
         )
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'id'], name='core_tag_user_id_idx'),
+            models.Index(fields=['user', 'name'],
+                         name='core_tag_user_name_idx'),
+        ]
+
     def __str__(self):
         return self.name
 
@@ -68,10 +139,41 @@ class Ingredient(models.Model):
         on_delete=models.CASCADE
         )
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'id'],
+                         name='core_ingredient_user_id_idx'),
+            models.Index(fields=['user', 'name'],
+                         name='core_ingredient_user_name_idx'),
+        ]
+
     def __str__(self):
         return self.name
 
 
+class ListVersion(models.Model):
+    """
+    Time of the last change to the objects of a model of a user, validator
+    of their cached list responses (see recipe.caching). Written in the
+    transaction of the change, so every process sees it with the data.
+    """
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE
+    )
+    model = models.CharField(max_length=100)
+    changed_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'model'],
+                                    name='core_listversion_user_model_uniq'),
+        ]
+
+    def __str__(self):
+        return f'{self.model} of {self.user_id} at {self.changed_at}'
+
+
 class Recipe(models.Model):
     title = models.CharField(max_length=255)
     user = models.ForeignKey(
@@ -84,6 +186,17 @@ class Recipe(models.Model):
     ingredients = models.ManyToManyField('Ingredient')
     tags = models.ManyToManyField('Tag')
     image = models.ImageField(null=True, upload_to=recipe_image_file_path)
+    updated_at = models.DateTimeField(auto_now=True)
+    # Kept up to date by core.signals, only filled in on PostgreSQL
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'id'],
+                         name='core_recipe_user_id_idx'),
+            models.Index(fields=['user', 'updated_at'],
+                         name='core_recipe_user_updated_idx'),
+        ]
 
     def __str__(self):
         return self.title
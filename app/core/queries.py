@@ -0,0 +1,237 @@
+import contextvars
+import functools
+import hashlib
+import json
+import logging
+import os
+import random
+import re
+import threading
+import time
+import traceback
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.deprecation import MiddlewareMixin
+
+
+logger = logging.getLogger(__name__)
+
+_current = contextvars.ContextVar('query_inspection', default=None)
+_write_lock = threading.Lock()
+
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r'\b\d+(?:\.\d+)?\b')
+_IN_LIST_RE = re.compile(r'\bIN\s*\((?:\s*(?:%s|\?)\s*,?)+\)', re.IGNORECASE)
+_VALUES_RE = re.compile(r'\bVALUES\s*(?:\((?:[^()]|%s)*\)\s*,?\s*)+',
+                        re.IGNORECASE)
+_SPACE_RE = re.compile(r'\s+')
+
+
+@functools.lru_cache(maxsize=2048)
+def normalize(sql):
+    """
+    Return the shape of a query: literals, IN lists and VALUES rows are
+    replaced so queries only differing by their values are the same
+    """
+    sql = _STRING_RE.sub('?', sql)
+    sql = _NUMBER_RE.sub('?', sql)
+    sql = _IN_LIST_RE.sub('IN (...)', sql)
+    sql = _VALUES_RE.sub('VALUES (...) ', sql)
+
+    return _SPACE_RE.sub(' ', sql).strip()
+
+
+def fingerprint(sql):
+    """Return a short hash identifying the shape of a query"""
+    return hashlib.md5(normalize(sql).encode()).hexdigest()[:12]
+
+
+def query_origin():
+    """Return the innermost frame of the project code running the query"""
+    base_dir = str(settings.BASE_DIR)
+    for frame in reversed(traceback.extract_stack()):
+        filename = frame.filename
+        if filename == __file__ or not filename.startswith(base_dir) or \
+                'site-packages' in filename:
+            continue
+        return '{}:{} in {}'.format(os.path.relpath(filename, base_dir),
+                                    frame.lineno, frame.name)
+
+    return None
+
+
+class QueryInspection:
+    """Queries run while handling one request, grouped by fingerprint"""
+
+    def __init__(self, view, method):
+        self.view = view
+        self.method = method
+        self.queries = {}
+        self.slow = []
+        self.total = 0
+        self.total_time = 0.0
+
+    def add(self, sql, duration):
+        key = fingerprint(sql)
+        stats = self.queries.get(key)
+        if stats is None:
+            stats = self.queries[key] = {
+                'fingerprint': key,
+                'sql': normalize(sql),
+                'count': 0,
+                'time': 0.0,
+                'origin': query_origin(),
+            }
+        stats['count'] += 1
+        stats['time'] += duration
+        self.total += 1
+        self.total_time += duration
+
+        if duration * 1000 >= settings.QUERY_INSPECTOR_SLOW_MS:
+            self.slow.append({
+                'fingerprint': key,
+                'sql': sql,
+                'duration': duration,
+                'origin': query_origin(),
+            })
+
+    def n_plus_one(self):
+        """The query shapes repeated enough to be an N+1 pattern"""
+        threshold = settings.QUERY_INSPECTOR_REPEAT_THRESHOLD
+        return [stats for stats in self.queries.values()
+                if stats['count'] >= threshold]
+
+    def record(self, status):
+        return {
+            'time': timezone.now().isoformat(),
+            'view': self.view,
+            'method': self.method,
+            'status': status,
+            'queries': self.total,
+            'db_time': self.total_time,
+            'fingerprints': list(self.queries.values()),
+            'n_plus_one': [stats['fingerprint']
+                           for stats in self.n_plus_one()],
+            'slow': self.slow,
+        }
+
+
+def inspect_query(execute, sql, params, many, context):
+    """Execute wrapper adding the queries to the request inspection"""
+    inspection = _current.get()
+    if inspection is None:
+        return execute(sql, params, many, context)
+
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        inspection.add(sql, time.perf_counter() - start)
+
+
+def install_query_inspector(sender, connection, **kwargs):
+    """Add inspect_query to every new database connection"""
+    if inspect_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(inspect_query)
+
+
+def rotated_path(path):
+    """Path the log is moved to when it reaches its maximum size"""
+    return f'{path}.1'
+
+
+def write_record(record):
+    """Append a request record to the QUERY_INSPECTOR_LOG file"""
+    path = settings.QUERY_INSPECTOR_LOG
+    if not path:
+        return
+    line = json.dumps(record, default=str) + '\n'
+    with _write_lock:
+        _rotate(path, settings.QUERY_INSPECTOR_LOG_MAX_BYTES)
+        with open(path, 'a') as log_file:
+            log_file.write(line)
+
+
+def _rotate(path, max_bytes):
+    """
+    Move the log to rotated_path once it reached max_bytes, replacing the
+    previous one, so it never takes more than twice that on disk
+    """
+    if not max_bytes:
+        return
+    try:
+        if os.path.getsize(path) >= max_bytes:
+            os.replace(path, rotated_path(path))
+    except FileNotFoundError:
+        # Not written yet or just rotated by another process
+        pass
+
+
+def read_records(path):
+    """Yield the request records of a QUERY_INSPECTOR_LOG file, oldest first"""
+    for name in (rotated_path(path), path):
+        try:
+            log_file = open(name)
+        except FileNotFoundError:
+            continue
+        with log_file:
+            for line in log_file:
+                line = line.strip()
+                if line:
+                    yield json.loads(line)
+
+
+class QueryInspectorMiddleware(MiddlewareMixin):
+    """
+    Inspect the queries of a sample of the requests to the views of
+    QUERY_INSPECTOR_APPS.
+
+    Every query shape repeated QUERY_INSPECTOR_REPEAT_THRESHOLD times in a
+    request (an N+1 pattern) and every query slower than
+    QUERY_INSPECTOR_SLOW_MS is logged with the code running it. The
+    requests are appended to QUERY_INSPECTOR_LOG (JSON lines), the
+    query_report command summarizes them.
+    """
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        _current.set(None)
+        if not settings.QUERY_INSPECTOR_ENABLED:
+            return None
+        match = request.resolver_match
+        if match is None or \
+                match.app_name not in settings.QUERY_INSPECTOR_APPS:
+            return None
+        if random.random() >= settings.QUERY_INSPECTOR_SAMPLE_RATE:
+            return None
+
+        request._query_inspection = QueryInspection(match.view_name,
+                                                    request.method)
+        _current.set(request._query_inspection)
+
+        return None
+
+    def process_response(self, request, response):
+        inspection = getattr(request, '_query_inspection', None)
+        if inspection is None:
+            return response
+        _current.set(None)
+
+        for stats in inspection.n_plus_one():
+            logger.warning(
+                'N+1 queries in %s %s: %d x %s (from %s)',
+                inspection.method, inspection.view, stats['count'],
+                stats['sql'], stats['origin']
+            )
+        for query in inspection.slow:
+            logger.warning(
+                'Slow query in %s %s: %.1f ms %s (from %s)',
+                inspection.method, inspection.view, query['duration'] * 1000,
+                query['sql'], query['origin']
+            )
+        try:
+            write_record(inspection.record(response.status_code))
+        except OSError:
+            logger.exception('Writing the query inspector log failed')
+
+        return response
@@ -0,0 +1,150 @@
+import contextvars
+import hashlib
+import random
+
+from django.conf import settings
+from django.core import checks
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.utils.deprecation import MiddlewareMixin
+
+from rest_framework.permissions import SAFE_METHODS
+
+from core.caches import PROCESS_LOCAL_CACHES
+
+
+# Models always read from the default database: a token is used right after
+# it is created, before the replicas may have it
+PRIMARY_MODELS = {'authtoken.token', 'core.expiringtoken'}
+
+# Replica the reads of the current request go to, None for the default
+# database. It's picked once per request so all its queries see the same
+# state, a context variable follows the request to the thread pool under
+# ASGI.
+_replica = contextvars.ContextVar('replica', default=None)
+
+
+def pick_replica():
+    """Return a random replica, None when there are none"""
+    replicas = settings.REPLICA_DATABASES
+    return random.choice(replicas) if replicas else None
+
+
+def replica_reads_enabled():
+    return _replica.get() is not None
+
+
+class use_replica:
+    """Send the reads inside the block to one of the replicas"""
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+
+    def __enter__(self):
+        self.token = _replica.set(pick_replica() if self.enabled else None)
+
+    def __exit__(self, *exc_info):
+        _replica.reset(self.token)
+
+
+class ReplicaRouter:
+    """
+    Send the reads of the replica enabled requests to the replica picked for
+    the request and everything else to the default database
+    """
+
+    def db_for_read(self, model, **hints):
+        replica = _replica.get()
+        if replica is None or replica not in settings.REPLICA_DATABASES or \
+                model._meta.label_lower in PRIMARY_MODELS:
+            return None
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db:
+            # Related objects are read where the instance comes from
+            return instance._state.db
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            # A transaction must see its own writes
+            return DEFAULT_DB_ALIAS
+
+        return replica
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replicas hold the same data as the default database
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db not in settings.REPLICA_DATABASES
+
+
+def _pin_key(request):
+    authorization = request.META.get('HTTP_AUTHORIZATION')
+    if not authorization:
+        return None
+    digest = hashlib.sha256(authorization.encode()).hexdigest()
+
+    return f'replica:pin:{digest}'
+
+
+class ReplicaRoutingMiddleware(MiddlewareMixin):
+    """
+    Enable the replica reads of a request.
+
+    Only the safe requests of the viewset actions listed in their
+    replica_actions are routed to the replicas. A client that changed
+    something is pinned to the default database for REPLICA_LAG_TOLERANCE
+    seconds so it reads its own writes, clients are told apart by their
+    Authorization header. The pins are kept in the default cache, it must
+    be shared by all the workers (see check_shared_cache).
+    """
+
+    def process_request(self, request):
+        _replica.set(None)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if not settings.REPLICA_DATABASES or \
+                request.method not in SAFE_METHODS:
+            return None
+        actions = getattr(view_func, 'actions', None) or {}
+        method = request.method.lower()
+        action = actions.get(method) or \
+            (actions.get('get') if method == 'head' else None)
+        replica_actions = getattr(getattr(view_func, 'cls', None),
+                                  'replica_actions', ())
+        if action not in replica_actions:
+            return None
+
+        key = _pin_key(request)
+        if key is None or not cache.get(key):
+            _replica.set(pick_replica())
+
+        return None
+
+    def process_response(self, request, response):
+        _replica.set(None)
+        if settings.REPLICA_DATABASES and \
+                request.method not in SAFE_METHODS and \
+                response.status_code < 400:
+            key = _pin_key(request)
+            if key is not None:
+                cache.set(key, True, settings.REPLICA_LAG_TOLERANCE)
+
+        return response
+
+
+@checks.register(checks.Tags.caches)
+def check_shared_cache(app_configs, **kwargs):
+    """The replica pins are lost between processes on a local cache"""
+    backend = settings.CACHES['default']['BACKEND']
+    if settings.REPLICA_DATABASES and backend in PROCESS_LOCAL_CACHES:
+        return [checks.Warning(
+            f'The replica pins are kept in the {backend} cache, a client '
+            f'handled by another process may not read its own writes.',
+            hint='Set CACHE_BACKEND and CACHE_LOCATION to a cache shared '
+                 'by every process, e.g. memcached.',
+            id='core.W001',
+        )]
+
+    return []
@@ -0,0 +1,85 @@
+from django.conf import settings
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import SearchQuery, SearchRank, \
+                                           SearchVector
+from django.db import connections
+from django.db.models import Exists, F, IntegerField, OuterRef, Q, \
+                             Subquery, Value, When, Case
+
+from core.models import Tag, Ingredient
+
+
+def full_text_enabled(using='default'):
+    """Full text search needs the tsvector support of PostgreSQL"""
+    return connections[using].vendor == 'postgresql'
+
+
+def _names(model):
+    """Subquery with the names of the related objects of the outer recipe"""
+    return Subquery(
+        model.objects.filter(recipe=OuterRef('pk'))
+        .values('recipe')
+        .annotate(names=StringAgg('name', ' '))
+        .values('names')
+    )
+
+
+def recipe_search_vector():
+    """
+    Expression computing the search document of a recipe, the title weighs
+    more than the tag names which weigh more than the ingredient names
+    """
+    config = settings.RECIPE_SEARCH_CONFIG
+
+    return SearchVector('title', weight='A', config=config) + \
+        SearchVector(_names(Tag), weight='B', config=config) + \
+        SearchVector(_names(Ingredient), weight='C', config=config)
+
+
+def search_vector_update(using='default'):
+    """
+    Return the update() kwargs refreshing the stored search vector, empty
+    when the database has no full text search
+    """
+    if not full_text_enabled(using):
+        return {}
+
+    return {'search_vector': recipe_search_vector()}
+
+
+def search_recipes(queryset, text):
+    """
+    Filter the recipes matching the text and annotate them with a rank,
+    best matches first. Without PostgreSQL it falls back to a substring
+    match ranked by the field matched.
+    """
+    if full_text_enabled(queryset.db):
+        query = SearchQuery(text, search_type='websearch',
+                            config=settings.RECIPE_SEARCH_CONFIG)
+        return queryset.filter(search_vector=query).annotate(
+            rank=SearchRank(F('search_vector'), query)
+        ).order_by('-rank', 'id')
+
+    in_title = Q(title__icontains=text)
+    in_tags = Exists(Tag.objects.filter(recipe=OuterRef('pk'),
+                                        name__icontains=text))
+    in_ingredients = Exists(Ingredient.objects.filter(recipe=OuterRef('pk'),
+                                                      name__icontains=text))
+
+    return queryset.filter(
+        in_title | Q(in_tags) | Q(in_ingredients)
+    ).annotate(
+        rank=Case(
+            When(in_title, then=Value(3)),
+            When(in_tags, then=Value(2)),
+            default=Value(1),
+            output_field=IntegerField()
+        )
+    ).order_by('-rank', 'id')
+
+
+def update_search_vectors(queryset):
+    """Refresh the stored search vector of the recipes"""
+    fields = search_vector_update(queryset.db)
+    if fields:
+        queryset.update(**fields)
@@ -0,0 +1,92 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save, \
+                                     pre_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from rest_framework.authtoken.models import Token
+
+from core.authentication import token_cache
+from core.models import ExpiringToken, User, Tag, Ingredient, Recipe
+from core.search import search_vector_update, update_search_vectors
+
+
+def touch_recipes(queryset):
+    """
+    Set updated_at and refresh the search vector of the recipes without
+    loading or saving them
+    """
+    queryset.update(updated_at=timezone.now(),
+                    **search_vector_update(queryset.db))
+
+
+@receiver(post_save, sender=Recipe)
+def update_recipe_search_vector(sender, instance, **kwargs):
+    """Keep the search vector in sync with the title"""
+    update_search_vectors(Recipe.objects.filter(pk=instance.pk))
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def touch_recipe_on_m2m_change(sender, instance, action, reverse, model,
+                               pk_set, **kwargs):
+    """Mark the recipes whose tags or ingredients changed as updated"""
+    related = 'tags' if isinstance(instance, Tag) else 'ingredients'
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            touch_recipes(Recipe.objects.filter(pk=instance.pk))
+    elif action == 'pre_clear':
+        # The related recipes are only known before the clear
+        instance._cleared_recipe_ids = list(
+            Recipe.objects.filter(**{related: instance})
+            .values_list('pk', flat=True)
+        )
+    elif action == 'post_clear':
+        touch_recipes(Recipe.objects.filter(
+            pk__in=instance.__dict__.pop('_cleared_recipe_ids', ())
+        ))
+    elif action in ('post_add', 'post_remove') and pk_set:
+        touch_recipes(Recipe.objects.filter(pk__in=pk_set))
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+def touch_recipes_on_attr_change(sender, instance, created, **kwargs):
+    """Mark the recipes showing a renamed tag/ingredient"""
+    if created:
+        return
+
+    related = 'tags' if sender is Tag else 'ingredients'
+    touch_recipes(Recipe.objects.filter(**{related: instance}))
+
+
+@receiver(pre_delete, sender=Tag)
+@receiver(pre_delete, sender=Ingredient)
+def remember_recipes_of_deleted_attr(sender, instance, **kwargs):
+    """The recipes of a deleted tag/ingredient are only known before"""
+    related = 'tags' if sender is Tag else 'ingredients'
+    instance._deleted_recipe_ids = list(
+        Recipe.objects.filter(**{related: instance})
+        .values_list('pk', flat=True)
+    )
+
+
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingredient)
+def touch_recipes_on_attr_delete(sender, instance, **kwargs):
+    """Mark the recipes that were showing a deleted tag/ingredient"""
+    recipe_ids = instance.__dict__.pop('_deleted_recipe_ids', ())
+    if recipe_ids:
+        touch_recipes(Recipe.objects.filter(pk__in=recipe_ids))
+
+
+@receiver(post_delete, sender=Token)
+@receiver(post_delete, sender=ExpiringToken)
+def forget_deleted_token(sender, instance, **kwargs):
+    """Stop authenticating with a revoked token"""
+    token_cache.invalidate(instance.key)
+
+
+@receiver(post_save, sender=User)
+def forget_user_tokens(sender, instance, **kwargs):
+    """Reload the user (e.g. is_active) on the next request"""
+    token_cache.invalidate_user(instance.pk)
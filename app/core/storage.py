@@ -0,0 +1,146 @@
+import hashlib
+import os
+import re
+import tempfile
+
+from django.conf import settings
+from django.core.files.move import file_move_safe
+from django.core.files.storage import FileSystemStorage
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+
+
+# Name of a stored blob: <dir>/ab/cd/<sha256>.<ext>
+BLOB_NAME_RE = re.compile(
+    r'(^|/)[0-9a-f]{2}/[0-9a-f]{2}/(?P<digest>[0-9a-f]{64})(\.\w+)?$'
+)
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    File system storage naming every file after the SHA-256 of its content.
+
+    The name given by upload_to only provides the directory and extension,
+    a file with the same content is stored once and reused, which also
+    means a name always holds the same bytes and can be cached forever.
+    Blobs no longer referenced are deleted by the gc_media command.
+    """
+
+    def get_available_name(self, name, max_length=None):
+        """The final name depends on the content, it never clashes"""
+        return name
+
+    def __init__(self, temp_dir=None, **kwargs):
+        super().__init__(**kwargs)
+        self._temp_dir = temp_dir
+
+    @property
+    def temp_dir(self):
+        """
+        Directory of the uploads being written, FILE_UPLOAD_TEMP_DIR by
+        default. Outside of the location so they are never served, on the
+        same file system they are renamed into place instead of copied.
+        """
+        return self._temp_dir or settings.FILE_UPLOAD_TEMP_DIR
+
+    def _save(self, name, content):
+        directory, filename = os.path.split(name)
+        ext = os.path.splitext(filename)[1].lower()
+
+        if hasattr(content, 'temporary_file_path'):
+            # Already on disk, move it instead of copying it. The digest is
+            # computed while streaming by HashingFileUploadHandler.
+            digest = getattr(content, 'sha256', None) or self._hash(content)
+            tmp_path = content.temporary_file_path()
+            owned = False
+        else:
+            digest, tmp_path = self._write_hashing(content)
+            owned = True
+
+        name = os.path.join(directory, digest[:2], digest[2:4],
+                            f'{digest}{ext}')
+        full_path = self.path(name)
+        if os.path.exists(full_path):
+            self._reuse(full_path, tmp_path, owned)
+        else:
+            os.makedirs(os.path.dirname(full_path), exist_ok=True,
+                        mode=self.directory_permissions_mode or 0o777)
+            try:
+                file_move_safe(tmp_path, full_path)
+            except FileExistsError:
+                # Stored by a concurrent upload of the same content
+                self._reuse(full_path, tmp_path, owned)
+            else:
+                if self.file_permissions_mode is not None:
+                    os.chmod(full_path, self.file_permissions_mode)
+
+        return name.replace('\\', '/')
+
+    def _reuse(self, full_path, tmp_path, owned):
+        """
+        Same content already stored, refresh its age so gc_media doesn't
+        collect it before the new reference is saved
+        """
+        os.utime(full_path)
+        if owned:
+            os.remove(tmp_path)
+
+    def _hash(self, content):
+        sha256 = hashlib.sha256()
+        content.seek(0)
+        for chunk in content.chunks():
+            sha256.update(chunk)
+
+        return sha256.hexdigest()
+
+    def _write_hashing(self, content):
+        """Write the content to a temporary file hashing it on the way"""
+        if self.temp_dir:
+            os.makedirs(self.temp_dir, mode=0o700, exist_ok=True)
+        sha256 = hashlib.sha256()
+        fd, tmp_path = tempfile.mkstemp(dir=self.temp_dir, suffix='.upload')
+        try:
+            with os.fdopen(fd, 'wb') as tmp_file:
+                if hasattr(content, 'seek'):
+                    content.seek(0)
+                for chunk in content.chunks():
+                    if isinstance(chunk, str):
+                        chunk = chunk.encode()
+                    sha256.update(chunk)
+                    tmp_file.write(chunk)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+
+        return sha256.hexdigest(), tmp_path
+
+
+class HashingFileUploadHandler(TemporaryFileUploadHandler):
+    """
+    Stream the uploads to a temporary file and hash them on the way, the
+    storage doesn't have to read them again
+    """
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.sha256 = hashlib.sha256()
+
+    def receive_data_chunk(self, raw_data, start):
+        self.sha256.update(raw_data)
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        file = super().file_complete(file_size)
+        file.sha256 = self.sha256.hexdigest()
+
+        return file
+
+
+def blob_digest(name):
+    """Return the digest of a content addressed blob, None for other files"""
+    match = BLOB_NAME_RE.search(name)
+    return match['digest'] if match else None
+
+
+def is_blob(name):
+    """Whether the name is the one of a content addressed blob"""
+    return blob_digest(name) is not None
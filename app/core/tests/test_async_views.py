@@ -0,0 +1,84 @@
+import asyncio
+import threading
+
+from asgiref.sync import async_to_sync
+
+from django.contrib.auth import get_user_model
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TransactionTestCase
+from django.urls import path
+
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from core.async_views import async_patterns, async_view
+from core.models import Tag
+from recipe.views import TagViewSet
+
+
+def thread_view(request):
+    return HttpResponse(str(threading.get_ident()))
+
+
+class AsyncViewTests(SimpleTestCase):
+    """Test running sync views from the ASGI handler"""
+
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.view = async_view(thread_view)
+
+    def test_wrapper_is_coroutine_function(self):
+        """Test that Django sees the wrapped view as async"""
+        self.assertTrue(asyncio.iscoroutinefunction(self.view))
+        self.assertEqual(self.view.__name__, 'thread_view')
+
+    def test_reads_run_on_thread_pool(self):
+        """Test that reads don't run on the shared sync thread"""
+        res = async_to_sync(self.view)(self.factory.get('/'))
+
+        self.assertNotEqual(int(res.content), threading.get_ident())
+
+    def test_writes_run_on_sync_thread(self):
+        """Test that writes keep running on the shared sync thread"""
+        res = async_to_sync(self.view)(self.factory.post('/'))
+
+        self.assertEqual(int(res.content), threading.get_ident())
+
+    def test_writes_forced_on_thread_pool(self):
+        """Test that thread_sensitive=False runs writes on the pool"""
+        view = async_view(thread_view, thread_sensitive=False)
+
+        res = async_to_sync(view)(self.factory.post('/'))
+
+        self.assertNotEqual(int(res.content), threading.get_ident())
+
+    def test_async_patterns_wraps_named_routes(self):
+        """Test that only the matching url patterns are wrapped"""
+        patterns = [
+            path('a/', thread_view, name='tag-list'),
+            path('a/<int:pk>/', thread_view, name='tag-detail'),
+            path('a/bulk/', thread_view, name='tag-bulk'),
+        ]
+
+        wrapped = async_patterns(patterns, names=('-list', '-detail'))
+
+        self.assertEqual(
+            [asyncio.iscoroutinefunction(p.callback) for p in wrapped],
+            [True, True, False]
+        )
+
+
+class AsyncViewSetTests(TransactionTestCase):
+    """Test the async variant of the viewsets"""
+
+    def test_list_rendered_off_thread(self):
+        """Test that the viewset response is rendered by the wrapper"""
+        user = get_user_model().objects.create_user('test@email.com', 'pass')
+        Tag.objects.create(user=user, name='Vegan')
+        request = APIRequestFactory().get('/api/recipe/tags/')
+        force_authenticate(request, user=user)
+        view = async_view(TagViewSet.as_view({'get': 'list'}))
+
+        res = async_to_sync(view)(request)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertIn(b'Vegan', res.content)
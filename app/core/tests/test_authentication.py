@@ -0,0 +1,151 @@
+from datetime import timedelta
+from unittest.mock import patch
+
+from django.conf import settings
+from django.test import TestCase, override_settings
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from django.utils import timezone
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.authentication import token_cache
+from core.models import ExpiringToken
+
+
+ME_URL = reverse('users:me')
+
+
+def sample_user(email='testuser@email.com', password='testCase'):
+    return get_user_model().objects.create_user(email=email, password=password)
+
+
+class CachedTokenAuthenticationTests(TestCase):
+    """Test the cached token authentication"""
+
+    def setUp(self):
+        token_cache.clear()
+        self.user = sample_user()
+        self.token = ExpiringToken.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def test_token_lookup_cached(self):
+        """Test that the token is only looked up on the first request"""
+        with self.assertNumQueries(1):
+            res = self.client.get(ME_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        with self.assertNumQueries(0):
+            res = self.client.get(ME_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['email'], self.user.email)
+
+    def test_deleted_token_rejected(self):
+        """Test that a revoked token stops authenticating"""
+        self.client.get(ME_URL)
+        self.token.delete()
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_inactive_user_rejected(self):
+        """Test that deactivating the user invalidates its tokens"""
+        self.client.get(ME_URL)
+        self.user.is_active = False
+        self.user.save()
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    @patch('core.authentication.time.monotonic')
+    def test_cached_token_expires(self, monotonic):
+        """Test that cached tokens are looked up again after the TTL"""
+        monotonic.return_value = 100
+        self.client.get(ME_URL)
+
+        monotonic.return_value = 100 + 61
+        with self.assertNumQueries(1):
+            self.client.get(ME_URL)
+
+    @override_settings(TOKEN_CACHE_MAX_SIZE=2)
+    def test_least_recently_used_evicted(self):
+        """Test that the cache is bounded by evicting the oldest token"""
+        tokens = [self.token] + [
+            ExpiringToken.objects.create(
+                user=sample_user(f'user{i}@email.com')
+            )
+            for i in range(2)
+        ]
+        for token in tokens:
+            token_cache.set(token.key, token.user, token)
+
+        self.assertEqual(len(token_cache), 2)
+        self.assertIsNone(token_cache.get(tokens[0].key))
+        self.assertIsNotNone(token_cache.get(tokens[2].key))
+
+
+class ExpiringTokenAuthenticationTests(TestCase):
+    """Test the expiry and sliding refresh of the tokens"""
+
+    def setUp(self):
+        token_cache.clear()
+        self.user = sample_user()
+        self.token = ExpiringToken.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def set_expires(self, **delta):
+        self.token.expires = timezone.now() + timedelta(**delta)
+        self.token.save()
+
+    def test_new_token_expires_after_ttl(self):
+        """Test that a token is valid TOKEN_TTL seconds"""
+        ttl = self.token.expires - self.token.created
+
+        self.assertAlmostEqual(ttl.total_seconds(), settings.TOKEN_TTL,
+                               delta=5)
+
+    def test_expired_token_rejected(self):
+        """Test that a token past its expiry doesn't authenticate"""
+        self.set_expires(seconds=-1)
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_cached_token_expires(self):
+        """Test that a cached token is rejected once expired"""
+        self.client.get(ME_URL)
+        later = self.token.expires + timedelta(seconds=1)
+
+        with patch('core.models.timezone.now', return_value=later):
+            res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertIsNone(token_cache.get(self.token.key))
+
+    def test_token_refreshed_on_use(self):
+        """Test that using a token pushes its expiry back"""
+        self.set_expires(seconds=settings.TOKEN_TTL -
+                         settings.TOKEN_REFRESH_INTERVAL - 10)
+        expires = self.token.expires
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.token.refresh_from_db()
+        self.assertGreater(self.token.expires, expires)
+
+    def test_token_not_refreshed_within_interval(self):
+        """Test that a recently refreshed token isn't written again"""
+        self.client.get(ME_URL)
+        token_cache.clear()
+
+        with self.assertNumQueries(1):
+            res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
@@ -1,25 +1,73 @@
+from io import StringIO
 from unittest.mock import patch
 
 from django.core.management import call_command
+from django.core.management.base import CommandError
 from django.db.utils import OperationalError
 from django.test import TestCase
 
 
+PROBE = 'core.management.commands.wait_for_db.probe'
+
+
 class CommandsTestCase(TestCase):
 
     def test_wait_for_db_ready(self):
         """Test waiting for db when db is available"""
 
-        with patch('django.db.utils.ConnectionHandler.__getitem__') as gi:
-            gi.return_value = True
-            call_command('wait_for_db')
-            self.assertEqual(gi.call_count, 1)
+        with patch(PROBE) as probe:
+            call_command('wait_for_db', stdout=StringIO())
+            probe.assert_called_once_with('default')
 
     @patch('time.sleep', return_value=None)
     def test_wait_for_db(self, ts):
         """Test waiting for db"""
 
-        with patch('django.db.utils.ConnectionHandler.__getitem__') as gi:
-            gi.side_effect = [OperationalError] * 5 + [True]
-            call_command('wait_for_db')
-            self.assertEqual(gi.call_count, 6)
+        with patch(PROBE) as probe:
+            probe.side_effect = [OperationalError] * 5 + [None]
+            out = StringIO()
+            call_command('wait_for_db', stdout=out)
+            self.assertEqual(probe.call_count, 6)
+            self.assertIn('after 6 attempt(s)', out.getvalue())
+
+    @patch('time.sleep', return_value=None)
+    def test_wait_for_db_backoff(self, ts):
+        """Test that the delay between the probes grows up to the max"""
+
+        with patch(PROBE) as probe:
+            probe.side_effect = [OperationalError] * 6 + [None]
+            call_command('wait_for_db', initial_delay=1, max_delay=8,
+                         stdout=StringIO())
+
+        delays = [call.args[0] for call in ts.call_args_list]
+        for delay, base in zip(delays, [1, 2, 4, 8, 8, 8]):
+            self.assertGreaterEqual(delay, base / 2)
+            self.assertLessEqual(delay, base)
+
+    def test_wait_for_db_deadline(self):
+        """Test giving up once the timeout is reached"""
+
+        with patch(PROBE) as probe:
+            probe.side_effect = OperationalError('connection refused')
+            with self.assertRaisesMessage(CommandError, 'default'):
+                call_command('wait_for_db', timeout=0, stdout=StringIO())
+
+    def test_wait_for_db_probes_every_alias(self):
+        """Test that every requested alias is probed"""
+
+        with patch(PROBE) as probe:
+            call_command('wait_for_db', databases=['default', 'replica1'],
+                         stdout=StringIO())
+
+        self.assertEqual(
+            sorted(call.args[0] for call in probe.call_args_list),
+            ['default', 'replica1']
+        )
+
+    def test_wait_for_db_real_probe(self):
+        """Test that the probe really queries the database"""
+        out = StringIO()
+
+        call_command('wait_for_db', timeout=5, stdout=out)
+
+        self.assertIn('Database available!', out.getvalue())
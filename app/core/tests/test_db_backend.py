@@ -0,0 +1,165 @@
+import os
+import tempfile
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.db.backends.sqlite3.base import \
+    DatabaseWrapper as SQLiteDatabaseWrapper
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.backends.metrics import ConnectionMetricsMixin, connection_stats
+
+
+DB_METRICS_URL = reverse('db-metrics')
+
+
+class MetricsDatabaseWrapper(ConnectionMetricsMixin, SQLiteDatabaseWrapper):
+    pass
+
+
+class ConnectionMetricsTests(SimpleTestCase):
+    """Test the connection health checks and metrics"""
+    alias = 'metrics_test'
+
+    def setUp(self):
+        fd, self.db_path = tempfile.mkstemp(suffix='.sqlite3')
+        os.close(fd)
+        self.stats = connection_stats(self.alias)
+        self.stats.reset()
+
+    def tearDown(self):
+        os.remove(self.db_path)
+
+    def make_connection(self, **settings):
+        settings_dict = {
+            **connection.settings_dict,
+            'NAME': self.db_path,
+            'CONN_MAX_AGE': 60,
+            'CONN_HEALTH_CHECKS': True,
+            **settings
+        }
+        conn = MetricsDatabaseWrapper(settings_dict, self.alias)
+        self.addCleanup(conn.close)
+        return conn
+
+    def request(self, conn):
+        """Use the connection like a request does"""
+        conn.close_if_unusable_or_obsolete()
+        with conn.cursor() as cursor:
+            cursor.execute('SELECT 1')
+        conn.close_if_unusable_or_obsolete()
+
+    def test_persistent_connection_reused(self):
+        """Test that the following requests reuse the connection"""
+        conn = self.make_connection()
+
+        for _ in range(3):
+            self.request(conn)
+
+        self.assertEqual(self.stats.connects, 1)
+        self.assertEqual(self.stats.checkouts, 3)
+        self.assertEqual(self.stats.reused, 2)
+        self.assertEqual(self.stats.open, 1)
+
+    def test_connection_closed_without_max_age(self):
+        """Test that the connection is closed after every request"""
+        conn = self.make_connection(CONN_MAX_AGE=0)
+
+        self.request(conn)
+        self.request(conn)
+
+        self.assertEqual(self.stats.connects, 2)
+        self.assertEqual(self.stats.closes, 2)
+        self.assertEqual(self.stats.open, 0)
+
+    def test_unusable_connection_replaced(self):
+        """Test that a connection failing the health check is replaced"""
+        conn = self.make_connection()
+        self.request(conn)
+
+        with patch.object(conn, 'is_usable', return_value=False):
+            self.request(conn)
+
+        self.assertEqual(self.stats.health_check_failures, 1)
+        self.assertEqual(self.stats.connects, 2)
+        self.assertEqual(self.stats.open, 1)
+
+    def test_health_checks_disabled(self):
+        """Test that no health check runs when disabled"""
+        conn = self.make_connection(CONN_HEALTH_CHECKS=False)
+        self.request(conn)
+
+        with patch.object(conn, 'is_usable') as is_usable:
+            self.request(conn)
+
+        is_usable.assert_not_called()
+        self.assertEqual(self.stats.reused, 1)
+
+    def test_saturation(self):
+        """Test the pool saturation is derived from the open connections"""
+        self.request(self.make_connection())
+
+        snapshot = self.stats.snapshot(pool_size=4)
+
+        self.assertEqual(snapshot['saturation'], 0.25)
+        self.assertGreater(snapshot['avg_connect_time'], 0)
+
+    def test_checkout_time(self):
+        """Test that the wait for a usable connection is measured"""
+        conn = self.make_connection()
+        self.request(conn)
+        connect_time = self.stats.checkout_time
+
+        with patch.object(conn, 'is_usable', return_value=True) as is_usable:
+            self.request(conn)
+
+        is_usable.assert_called_once()
+        self.assertEqual(self.stats.checkouts, 2)
+        self.assertGreaterEqual(connect_time, self.stats.connect_time)
+        self.assertGreater(self.stats.checkout_time, connect_time)
+        self.assertGreater(self.stats.max_checkout_time, 0)
+
+
+class DatabaseMetricsViewTests(TestCase):
+    """Test the database metrics endpoint"""
+
+    def setUp(self):
+        self.client = APIClient()
+        connection_stats('metrics_test').reset()
+
+    def test_metrics_require_staff(self):
+        """Test that only staff users can read the metrics"""
+        user = get_user_model().objects.create_user('test@email.com', 'pass')
+        self.client.force_authenticate(user)
+
+        res = self.client.get(DB_METRICS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_metrics_per_alias(self):
+        """Test that the metrics of every alias are returned"""
+        user = get_user_model().objects.create_superuser('admin@email.com',
+                                                         'pass')
+        self.client.force_authenticate(user)
+
+        res = self.client.get(DB_METRICS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIn('metrics_test', res.data)
+        self.assertIn('saturation', res.data['metrics_test'])
+
+    @override_settings(DB_POOL_SIZE=20, DB_PROCESS_POOL_SIZE=4)
+    def test_saturation_per_process(self):
+        """Test that the saturation is against the share of the process"""
+        user = get_user_model().objects.create_superuser('admin@email.com',
+                                                         'pass')
+        self.client.force_authenticate(user)
+
+        res = self.client.get(DB_METRICS_URL)
+
+        self.assertEqual(res.data['metrics_test']['pool_size'], 4)
@@ -0,0 +1,66 @@
+from unittest.mock import Mock
+
+from django.db import connection
+from django.test import SimpleTestCase
+
+from app import gunicorn_conf
+
+
+LOCMEM = 'django.core.cache.backends.locmem.LocMemCache'
+
+
+class GunicornConfTests(SimpleTestCase):
+    """Test the production server settings"""
+
+    def test_default_sizing_from_cpus(self):
+        """Test that the workers follow the CPU count"""
+        self.assertEqual(gunicorn_conf.compute_sizing(4, None), (9, 2))
+
+    def test_sizing_capped_by_db_pool(self):
+        """Test that workers * threads never exceeds the DB pool size"""
+        self.assertEqual(gunicorn_conf.compute_sizing(8, 10), (5, 2))
+        self.assertEqual(
+            gunicorn_conf.compute_sizing(8, 3, threads=4),
+            (1, 3)
+        )
+
+    def test_explicit_sizing(self):
+        """Test that the workers and threads can be set explicitly"""
+        self.assertEqual(
+            gunicorn_conf.compute_sizing(8, 100, workers=3, threads=8),
+            (3, 8)
+        )
+
+    def test_settings(self):
+        """Test the preload and recycling settings"""
+        self.assertTrue(gunicorn_conf.preload_app)
+        self.assertGreater(gunicorn_conf.max_requests, 0)
+        self.assertGreater(gunicorn_conf.max_requests_jitter, 0)
+
+    def test_single_worker_on_local_cache(self):
+        """Test that one worker may use the per process cache"""
+        caches = {'default': {'BACKEND': LOCMEM}}
+
+        gunicorn_conf.check_shared_cache(1, caches)
+
+    def test_workers_refused_on_local_cache(self):
+        """Test that several workers need a shared cache"""
+        with self.assertRaises(RuntimeError):
+            gunicorn_conf.check_shared_cache(
+                3, {'default': {'BACKEND': LOCMEM}}
+            )
+
+        gunicorn_conf.check_shared_cache(3, {'default': {
+            'BACKEND': 'django.core.cache.backends.memcached.PyMemcacheCache'
+        }})
+
+    def test_post_fork_drops_inherited_connections(self):
+        """Test that a worker doesn't reuse the connection of the master"""
+        inherited = connection.connection
+        try:
+            connection.connection = Mock()
+            gunicorn_conf.post_fork(Mock(), Mock())
+
+            self.assertIsNone(connection.connection)
+        finally:
+            connection.connection = inherited
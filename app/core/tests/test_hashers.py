@@ -0,0 +1,105 @@
+import importlib.util
+from unittest import skipUnless
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import identify_hasher
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+
+TOKEN_URL = reverse('users:token')
+
+PBKDF2 = 'core.hashers.PBKDF2PasswordHasher'
+ARGON2 = 'core.hashers.Argon2PasswordHasher'
+BCRYPT = 'core.hashers.BCryptSHA256PasswordHasher'
+
+
+def installed(module):
+    return importlib.util.find_spec(module) is not None
+
+
+class HasherTests(TestCase):
+    """Test the configurable password hashers"""
+
+    def setUp(self):
+        self.client = APIClient()
+        cache.clear()
+        self.payload = {'email': 'test@londonappdev.com',
+                        'password': 'testpass123'}
+
+    def create_user(self):
+        return get_user_model().objects.create_user(**self.payload)
+
+    def login(self):
+        return self.client.post(TOKEN_URL, self.payload)
+
+    def test_default_hashers(self):
+        """Test that PBKDF2 hashes new passwords, the others verify old ones"""
+        self.assertEqual(settings.PASSWORD_HASHERS, [PBKDF2, ARGON2, BCRYPT])
+
+    @override_settings(PASSWORD_PBKDF2_ITERATIONS=1000)
+    def test_pbkdf2_iterations_setting(self):
+        """Test that new passwords are hashed with the configured cost"""
+        user = self.create_user()
+
+        algorithm, iterations, _salt, _hash = user.password.split('$')
+        self.assertEqual(algorithm, 'pbkdf2_sha256')
+        self.assertEqual(int(iterations), 1000)
+
+    def test_rehash_on_login_when_cost_changes(self):
+        """Test that a login upgrades a password hashed with the old cost"""
+        with self.settings(PASSWORD_PBKDF2_ITERATIONS=1000):
+            user = self.create_user()
+
+        with self.settings(PASSWORD_PBKDF2_ITERATIONS=2000):
+            res = self.login()
+
+        self.assertIn('token', res.data)
+        user.refresh_from_db()
+        self.assertEqual(int(user.password.split('$')[1]), 2000)
+
+    @override_settings(PASSWORD_PBKDF2_ITERATIONS=1000)
+    def test_no_rehash_on_failed_login(self):
+        """Test that a wrong password leaves the hash untouched"""
+        user = self.create_user()
+        password = user.password
+        self.payload['password'] = 'wrong'
+
+        with self.settings(PASSWORD_PBKDF2_ITERATIONS=2000):
+            self.login()
+
+        user.refresh_from_db()
+        self.assertEqual(user.password, password)
+
+    @skipUnless(installed('argon2'), 'argon2-cffi is not installed')
+    @override_settings(PASSWORD_ARGON2_TIME_COST=1,
+                       PASSWORD_ARGON2_MEMORY_COST=1024,
+                       PASSWORD_ARGON2_PARALLELISM=1)
+    def test_rehash_on_login_when_hasher_changes(self):
+        """Test that a login moves a PBKDF2 password to Argon2"""
+        with self.settings(PASSWORD_PBKDF2_ITERATIONS=1000):
+            user = self.create_user()
+
+        with self.settings(PASSWORD_HASHERS=[ARGON2, PBKDF2, BCRYPT]):
+            res = self.login()
+            user.refresh_from_db()
+            hasher = identify_hasher(user.password)
+
+        self.assertIn('token', res.data)
+        self.assertEqual(hasher.algorithm, 'argon2')
+        self.assertTrue(user.password.startswith('argon2$argon2id$'))
+        self.assertIn('m=1024,t=1,p=1', user.password)
+
+    @skipUnless(installed('bcrypt'), 'bcrypt is not installed')
+    @override_settings(PASSWORD_HASHERS=[BCRYPT, PBKDF2, ARGON2],
+                       PASSWORD_BCRYPT_ROUNDS=4)
+    def test_bcrypt_rounds_setting(self):
+        """Test that bcrypt hashes with the configured rounds"""
+        user = self.create_user()
+
+        self.assertTrue(user.password.startswith('bcrypt_sha256$$2b$04$'))
+        self.assertTrue(user.check_password(self.payload['password']))
@@ -0,0 +1,116 @@
+from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.db import connection
+
+from core import models
+
+
+def explain(queryset):
+    """
+    Return the query plan of a queryset. Sequential scans are disabled on
+    PostgreSQL as the test tables are too small for the planner to bother
+    with an index otherwise.
+    """
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('SET enable_seqscan = off')
+        try:
+            return queryset.explain()
+        finally:
+            with connection.cursor() as cursor:
+                cursor.execute('RESET enable_seqscan')
+
+    return queryset.explain()
+
+
+class IndexPlanTestMixin:
+
+    def assertUsesIndex(self, queryset, index_name):
+        """Assert the query plan of the queryset uses the index"""
+        plan = explain(queryset)
+        self.assertIn(index_name, plan, msg=f'Index not used in:\n{plan}')
+
+
+class IndexTests(IndexPlanTestMixin, TestCase):
+    """Test that the per user access patterns are served by the indexes"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='testuser@email.com',
+            password='testCase'
+        )
+        self.tag = models.Tag.objects.create(user=self.user, name='Vegan')
+        self.ingredient = models.Ingredient.objects.create(
+            user=self.user,
+            name='Salt'
+        )
+        recipe = models.Recipe.objects.create(
+            user=self.user,
+            title='Salad',
+            time_minutes=5,
+            price=3.00
+        )
+        recipe.tags.add(self.tag)
+        recipe.ingredients.add(self.ingredient)
+
+    def test_tags_of_user_by_id(self):
+        """Test paginating the tags of a user uses the (user, id) index"""
+        self.assertUsesIndex(
+            models.Tag.objects.filter(user=self.user, id__gt=0)
+            .order_by('id'),
+            'core_tag_user_id_idx'
+        )
+
+    def test_tag_of_user_by_name(self):
+        """Test looking up a tag by name uses the (user, name) index"""
+        self.assertUsesIndex(
+            models.Tag.objects.filter(user=self.user, name='Vegan'),
+            'core_tag_user_name_idx'
+        )
+
+    def test_ingredients_of_user_by_id(self):
+        """Test paginating ingredients uses the (user, id) index"""
+        self.assertUsesIndex(
+            models.Ingredient.objects.filter(user=self.user, id__gt=0)
+            .order_by('id'),
+            'core_ingredient_user_id_idx'
+        )
+
+    def test_ingredient_of_user_by_name(self):
+        """Test looking up an ingredient by name uses the index"""
+        self.assertUsesIndex(
+            models.Ingredient.objects.filter(user=self.user, name='Salt'),
+            'core_ingredient_user_name_idx'
+        )
+
+    def test_recipes_of_user_by_id(self):
+        """Test paginating recipes uses the (user, id) index"""
+        self.assertUsesIndex(
+            models.Recipe.objects.filter(user=self.user, id__gt=0)
+            .order_by('id'),
+            'core_recipe_user_id_idx'
+        )
+
+    def test_last_recipe_update_of_user(self):
+        """Test the recipe list validators use the (user, updated) index"""
+        self.assertUsesIndex(
+            models.Recipe.objects.filter(user=self.user)
+            .order_by('-updated_at').values('updated_at')[:1],
+            'core_recipe_user_updated_idx'
+        )
+
+    def test_recipes_of_tag(self):
+        """Test finding the recipes of a tag uses the reverse index"""
+        self.assertUsesIndex(
+            models.Recipe.tags.through.objects.filter(tag=self.tag)
+            .values('recipe_id'),
+            'core_recipe_tags_tag_recipe_idx'
+        )
+
+    def test_recipes_of_ingredient(self):
+        """Test finding the recipes of an ingredient uses the index"""
+        self.assertUsesIndex(
+            models.Recipe.ingredients.through.objects
+            .filter(ingredient=self.ingredient).values('recipe_id'),
+            'core_recipe_ingr_ingr_recipe_idx'
+        )
@@ -0,0 +1,126 @@
+import re
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from core import metrics
+from core.models import Recipe
+
+
+RECIPES_URL = reverse('recipe:recipe-list')
+EXPORT_URL = reverse('recipe:recipe-export')
+METRICS_URL = reverse('metrics')
+
+
+class HistogramTests(TestCase):
+    """Test the histograms of the metrics"""
+
+    def test_cumulative_buckets(self):
+        """Test that the buckets count the values up to their bound"""
+        histogram = metrics.Histogram('test', 'Test', ('view',), (1, 5))
+        for value in (0.5, 1, 3, 10):
+            histogram.observe(value, 'a')
+
+        samples = {(suffix, labels.get('le')): value
+                   for suffix, labels, value in histogram.samples()}
+
+        self.assertEqual(samples[('_bucket', '1')], 2)
+        self.assertEqual(samples[('_bucket', '5')], 3)
+        self.assertEqual(samples[('_bucket', '+Inf')], 4)
+        self.assertEqual(samples[('_count', None)], 4)
+        self.assertEqual(samples[('_sum', None)], 14.5)
+
+
+class PerformanceMiddlewareTests(TestCase):
+    """Test the request instrumentation"""
+
+    def setUp(self):
+        cache.clear()
+        for histogram in metrics.HISTOGRAMS:
+            histogram.reset()
+        self.user = get_user_model().objects.create_user('test@email.com',
+                                                         'pass')
+        Recipe.objects.create(user=self.user, title='Cake', time_minutes=30,
+                              price=10.00)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_server_timing_header(self):
+        """Test that the timings and query count are sent back"""
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(RECIPES_URL)
+
+        timing = res['Server-Timing']
+        self.assertRegex(timing, r'total;dur=[\d.]+')
+        self.assertRegex(timing, r'serializer;dur=[\d.]+')
+        match = re.search(r'db;dur=[\d.]+;desc="(\d+) queries"', timing)
+        self.assertEqual(int(match.group(1)), len(queries))
+
+    def test_histograms_per_view(self):
+        """Test that the requests are observed under their view name"""
+        self.client.get(RECIPES_URL)
+        self.client.get(RECIPES_URL)
+
+        samples = list(metrics.REQUEST_DURATION.samples())
+        counts = [value for suffix, labels, value in samples
+                  if suffix == '_count']
+        labels = [labels for suffix, labels, value in samples
+                  if suffix == '_count']
+        self.assertEqual(counts, [2])
+        self.assertEqual(labels[0], {'view': 'recipe:recipe-list',
+                                     'method': 'GET', 'status': '200'})
+
+        sizes = [value for suffix, labels, value
+                 in metrics.RESPONSE_SIZE.samples() if suffix == '_sum']
+        self.assertGreater(sizes[0], 0)
+        serializer = [value for suffix, labels, value
+                      in metrics.SERIALIZER_DURATION.samples()
+                      if suffix == '_sum']
+        self.assertGreater(serializer[0], 0)
+
+    def test_streamed_response_measured(self):
+        """Test that a streamed body is observed once it has been sent"""
+        res = self.client.get(EXPORT_URL)
+        self.assertNotIn('Server-Timing', res)
+        self.assertEqual(list(metrics.DB_QUERIES.samples()), [])
+
+        with CaptureQueriesContext(connection) as queries:
+            body = b''.join(res.streaming_content)
+
+        def sums(histogram):
+            return {labels['view']: value for suffix, labels, value
+                    in histogram.samples() if suffix == '_sum'}
+
+        view = 'recipe:recipe-export'
+        self.assertGreater(len(queries), 0)
+        self.assertEqual(sums(metrics.DB_QUERIES)[view], len(queries))
+        self.assertEqual(sums(metrics.RESPONSE_SIZE)[view], len(body))
+        self.assertGreater(sums(metrics.SERIALIZER_DURATION)[view], 0)
+
+    def test_metrics_endpoint(self):
+        """Test that the histograms are exported for Prometheus"""
+        self.client.get(RECIPES_URL)
+
+        res = self.client.get(METRICS_URL)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertIn(
+            'http_request_duration_seconds_count{view="recipe:recipe-list",'
+            'method="GET",status="200"} 1',
+            res.content.decode()
+        )
+        self.assertIn('# TYPE http_request_db_queries histogram',
+                      res.content.decode())
+
+    @override_settings(METRICS_ALLOWED_IPS=['10.0.0.1'])
+    def test_metrics_endpoint_restricted(self):
+        """Test that only the allowed addresses can read the metrics"""
+        res = self.client.get(METRICS_URL)
+
+        self.assertEqual(res.status_code, 403)
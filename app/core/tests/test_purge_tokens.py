@@ -0,0 +1,88 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.authentication import token_cache
+from core.models import ExpiringToken
+
+
+ME_URL = reverse('users:me')
+
+
+def sample_token(number, **delta):
+    user = get_user_model().objects.create_user(f'user{number}@email.com',
+                                                'testpass')
+    return ExpiringToken.objects.create(
+        user=user, expires=timezone.now() + timedelta(**delta)
+    )
+
+
+class PurgeTokensTests(TestCase):
+    """Test deleting the expired tokens"""
+
+    def purge(self, **options):
+        out = StringIO()
+        call_command('purge_tokens', stdout=out, **options)
+        return out.getvalue()
+
+    def test_expired_tokens_purged(self):
+        """Test that only the expired tokens are deleted"""
+        expired = [sample_token(i, seconds=-60) for i in range(3)]
+        valid = sample_token(3, hours=1)
+
+        out = self.purge()
+
+        self.assertIn('Purged 3 expired tokens in 1 batches', out)
+        self.assertEqual(list(ExpiringToken.objects.all()), [valid])
+        # The users are kept
+        self.assertEqual(get_user_model().objects.filter(
+            pk__in=[token.user_id for token in expired]
+        ).count(), 3)
+
+    def test_purged_in_batches(self):
+        """Test that the tokens are deleted batch_size at a time"""
+        for i in range(5):
+            sample_token(i, seconds=-60)
+
+        # Per batch: the keys, the tokens for post_delete and the delete
+        with self.assertNumQueries(9):
+            out = self.purge(batch_size=2)
+
+        self.assertIn('Purged 5 expired tokens in 3 batches', out)
+        self.assertFalse(ExpiringToken.objects.exists())
+
+    def test_nothing_to_purge(self):
+        """Test that a table without expired tokens takes one query"""
+        sample_token(0, hours=1)
+
+        with self.assertNumQueries(1):
+            out = self.purge()
+
+        self.assertIn('Purged 0 expired tokens in 0 batches', out)
+        self.assertEqual(ExpiringToken.objects.count(), 1)
+
+    def test_purged_token_rejected(self):
+        """Test that a purged token is dropped from the cache right away"""
+        token_cache.clear()
+        self.addCleanup(token_cache.clear)
+        token = sample_token(0, hours=1)
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        self.assertEqual(client.get(ME_URL).status_code, status.HTTP_200_OK)
+        # Expired in the database, the cached copy still looks valid
+        ExpiringToken.objects.filter(pk=token.pk).update(
+            expires=timezone.now() - timedelta(seconds=60)
+        )
+
+        self.purge()
+
+        self.assertEqual(client.get(ME_URL).status_code,
+                         status.HTTP_401_UNAUTHORIZED)
@@ -0,0 +1,126 @@
+import os
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from core import queries
+from core.models import Tag
+
+
+TAGS_URL = reverse('recipe:tag-list')
+
+
+class FingerprintTests(SimpleTestCase):
+    """Test the normalization of the queries"""
+
+    def test_values_ignored(self):
+        """Test that queries only differing by their values match"""
+        self.assertEqual(
+            queries.fingerprint("SELECT * FROM a WHERE id = 1 AND n = 'x'"),
+            queries.fingerprint("SELECT * FROM a WHERE id = 22 AND n = 'y'")
+        )
+        self.assertEqual(
+            queries.fingerprint('SELECT * FROM a WHERE id IN (%s, %s)'),
+            queries.fingerprint('SELECT * FROM a WHERE id IN (%s, %s, %s)')
+        )
+
+    def test_shapes_differ(self):
+        """Test that different queries have different fingerprints"""
+        self.assertNotEqual(
+            queries.fingerprint('SELECT * FROM a WHERE id = %s'),
+            queries.fingerprint('SELECT * FROM b WHERE id = %s')
+        )
+
+
+class QueryInspectorTests(TestCase):
+    """Test the detection of N+1 and slow queries"""
+
+    def setUp(self):
+        cache.clear()
+        fd, self.log_path = tempfile.mkstemp(suffix='.jsonl')
+        os.close(fd)
+        self.settings_override = self.settings(
+            QUERY_INSPECTOR_ENABLED=True,
+            QUERY_INSPECTOR_SAMPLE_RATE=1.0,
+            QUERY_INSPECTOR_REPEAT_THRESHOLD=3,
+            QUERY_INSPECTOR_LOG=self.log_path,
+        )
+        self.settings_override.enable()
+        self.user = get_user_model().objects.create_user('test@email.com',
+                                                         'pass')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def tearDown(self):
+        self.settings_override.disable()
+        for path in (self.log_path, queries.rotated_path(self.log_path)):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def test_n_plus_one_detected(self):
+        """Test that a query repeated in a request is reported"""
+        inspection = queries.QueryInspection('recipe:tag-list', 'GET')
+        with self.settings(QUERY_INSPECTOR_SLOW_MS=10000):
+            for tag_id in range(4):
+                inspection.add(
+                    f'SELECT * FROM core_tag WHERE id = {tag_id}', 0.001
+                )
+            inspection.add('SELECT 1', 0.001)
+
+        n_plus_one = inspection.n_plus_one()
+
+        self.assertEqual(len(n_plus_one), 1)
+        self.assertEqual(n_plus_one[0]['count'], 4)
+        self.assertIn('test_queries.py', n_plus_one[0]['origin'])
+
+    @override_settings(QUERY_INSPECTOR_SLOW_MS=0)
+    def test_requests_logged(self):
+        """Test that the inspected requests are written to the log"""
+        Tag.objects.create(user=self.user, name='Vegan')
+
+        with self.assertLogs('core.queries', 'WARNING') as logs:
+            self.client.get(TAGS_URL)
+
+        records = list(queries.read_records(self.log_path))
+        self.assertEqual(len(records), 1)
+        self.assertEqual(records[0]['view'], 'recipe:tag-list')
+        self.assertGreater(records[0]['queries'], 0)
+        self.assertTrue(records[0]['slow'])
+        self.assertIn('Slow query', logs.output[0])
+
+    @override_settings(QUERY_INSPECTOR_SAMPLE_RATE=0)
+    def test_requests_sampled(self):
+        """Test that requests outside of the sample are not inspected"""
+        self.client.get(TAGS_URL)
+
+        self.assertEqual(list(queries.read_records(self.log_path)), [])
+
+    @override_settings(QUERY_INSPECTOR_LOG_MAX_BYTES=1)
+    def test_log_rotated(self):
+        """Test that the log is moved aside once it reaches its size"""
+        for _ in range(3):
+            self.client.get(TAGS_URL)
+
+        with open(self.log_path) as log_file:
+            self.assertEqual(len(log_file.readlines()), 1)
+        with open(queries.rotated_path(self.log_path)) as log_file:
+            self.assertEqual(len(log_file.readlines()), 1)
+        self.assertEqual(len(list(queries.read_records(self.log_path))), 2)
+
+    def test_query_report(self):
+        """Test that the report ranks the query shapes"""
+        self.client.get(TAGS_URL)
+        self.client.get(TAGS_URL)
+        out = StringIO()
+
+        call_command('query_report', file=self.log_path, stdout=out)
+
+        self.assertIn('2 inspected request(s)', out.getvalue())
+        self.assertIn('views:  recipe:tag-list', out.getvalue())
@@ -0,0 +1,146 @@
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.db import connection
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, \
+                        override_settings
+
+from rest_framework.authtoken.models import Token
+
+from core.models import ExpiringToken, Recipe
+from core.routers import ReplicaRouter, ReplicaRoutingMiddleware, \
+                         check_shared_cache, replica_reads_enabled, \
+                         use_replica
+from recipe.views import RecipeViewSet
+
+
+@override_settings(REPLICA_DATABASES=['replica1', 'replica2'])
+class ReplicaRouterTests(SimpleTestCase):
+    """Test the routing of the reads to the replicas"""
+
+    def setUp(self):
+        self.router = ReplicaRouter()
+
+    def test_reads_on_default_unless_enabled(self):
+        """Test that reads only go to the replicas when enabled"""
+        self.assertIsNone(self.router.db_for_read(Recipe))
+
+        with use_replica():
+            self.assertIn(self.router.db_for_read(Recipe),
+                          ('replica1', 'replica2'))
+
+    def test_one_replica_per_block(self):
+        """Test that all the reads of a request go to the same replica"""
+        with use_replica():
+            aliases = {self.router.db_for_read(Recipe) for _ in range(20)}
+
+        self.assertEqual(len(aliases), 1)
+
+    @override_settings(REPLICA_DATABASES=[])
+    def test_no_replica_configured(self):
+        """Test that everything goes to default without replicas"""
+        with use_replica():
+            self.assertIsNone(self.router.db_for_read(Recipe))
+
+    def test_tokens_read_from_default(self):
+        """Test that freshly created tokens are always found"""
+        with use_replica():
+            self.assertIsNone(self.router.db_for_read(Token))
+            self.assertIsNone(self.router.db_for_read(ExpiringToken))
+
+    def test_reads_in_transaction_on_default(self):
+        """Test that a transaction reads its own writes"""
+        with use_replica(), \
+                patch.object(connection, 'in_atomic_block', True):
+            self.assertEqual(self.router.db_for_read(Recipe), 'default')
+
+    def test_writes_and_migrations_on_default(self):
+        """Test that the replicas are never written to"""
+        with use_replica():
+            self.assertEqual(self.router.db_for_write(Recipe), 'default')
+        self.assertTrue(self.router.allow_migrate('default', 'core'))
+        self.assertFalse(self.router.allow_migrate('replica1', 'core'))
+
+    def test_local_cache_warning(self):
+        """Test that the pins need a cache shared by the processes"""
+        locmem = {'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }}
+        shared = {'default': {
+            'BACKEND': 'django.core.cache.backends.memcached.PyMemcacheCache',
+            'LOCATION': 'memcached:11211',
+        }}
+
+        with self.settings(CACHES=locmem):
+            self.assertEqual([w.id for w in check_shared_cache(None)],
+                             ['core.W001'])
+        with self.settings(CACHES=shared):
+            self.assertEqual(check_shared_cache(None), [])
+
+
+@override_settings(REPLICA_DATABASES=['replica1'], REPLICA_LAG_TOLERANCE=5)
+class ReplicaRoutingMiddlewareTests(TestCase):
+    """Test which requests read from the replicas"""
+
+    def setUp(self):
+        cache.clear()
+        self.factory = RequestFactory()
+        self.view = RecipeViewSet.as_view({'get': 'list', 'post': 'create'})
+        self.detail_view = RecipeViewSet.as_view({'get': 'retrieve'})
+        self.middleware = ReplicaRoutingMiddleware(lambda request: None)
+
+    def reads_from_replica(self, request, view, status=200):
+        """Run the request through the middleware"""
+        self.middleware.process_request(request)
+        self.middleware.process_view(request, view, (), {})
+        enabled = replica_reads_enabled()
+        self.middleware.process_response(request, HttpResponse(status=status))
+        self.assertFalse(replica_reads_enabled())
+
+        return enabled
+
+    def test_list_and_retrieve_read_from_replica(self):
+        """Test that the safe reads of the viewsets use the replicas"""
+        request = self.factory.get('/', HTTP_AUTHORIZATION='Token a')
+
+        self.assertTrue(self.reads_from_replica(request, self.view))
+        self.assertTrue(self.reads_from_replica(request, self.detail_view))
+
+    def test_other_views_read_from_default(self):
+        """Test that views not opting in read from default"""
+        request = self.factory.get('/')
+        view = RecipeViewSet.as_view({'get': 'export'})
+
+        self.assertFalse(self.reads_from_replica(request, view))
+        self.assertFalse(self.reads_from_replica(request, lambda r: None))
+
+    def test_reads_after_write_sticky(self):
+        """Test that a client reads from default after writing"""
+        self.reads_from_replica(
+            self.factory.post('/', HTTP_AUTHORIZATION='Token a'),
+            self.view,
+            status=201
+        )
+
+        self.assertFalse(self.reads_from_replica(
+            self.factory.get('/', HTTP_AUTHORIZATION='Token a'),
+            self.view
+        ))
+        self.assertTrue(self.reads_from_replica(
+            self.factory.get('/', HTTP_AUTHORIZATION='Token b'),
+            self.view
+        ))
+
+    def test_failed_write_not_sticky(self):
+        """Test that a rejected write doesn't pin the client"""
+        self.reads_from_replica(
+            self.factory.post('/', HTTP_AUTHORIZATION='Token a'),
+            self.view,
+            status=400
+        )
+
+        self.assertTrue(self.reads_from_replica(
+            self.factory.get('/', HTTP_AUTHORIZATION='Token a'),
+            self.view
+        ))
@@ -0,0 +1,80 @@
+from collections import Counter
+from io import StringIO
+
+from django.core.management import call_command
+from django.db.models import F
+from django.test import TestCase
+
+from core.management.commands.seed_data import SEED_EMAIL_DOMAIN
+from core.models import ExpiringToken, User, Tag, Ingredient, Recipe
+
+
+def seed(**options):
+    options = {'users': 5, 'recipes': 60, 'tags_per_user': 10,
+               'ingredients_per_user': 20, 'batch_size': 25, **options}
+    call_command('seed_data', stdout=StringIO(), **options)
+
+
+class SeedDataTests(TestCase):
+    """Test seeding the database with synthetic data"""
+
+    def test_seed_data(self):
+        """Test that the requested rows are created"""
+        seed()
+
+        users = User.objects.filter(email__endswith=f'@{SEED_EMAIL_DOMAIN}')
+        self.assertEqual(users.count(), 5)
+        self.assertEqual(
+            ExpiringToken.objects.filter(user__in=users).count(), 5
+        )
+        self.assertEqual(Tag.objects.count(), 50)
+        self.assertEqual(Ingredient.objects.count(), 100)
+        self.assertEqual(Recipe.objects.count(), 60)
+        self.assertFalse(Recipe.objects.filter(ingredients=None).exists())
+        self.assertFalse(
+            Recipe.tags.through.objects
+            .exclude(tag__user=F('recipe__user')).exists()
+        )
+
+    def test_seeded_users_can_log_in(self):
+        """Test that the users share a valid password hash"""
+        seed(password='secret-pass')
+
+        user = User.objects.filter(
+            email__endswith=f'@{SEED_EMAIL_DOMAIN}'
+        ).first()
+        self.assertTrue(user.check_password('secret-pass'))
+
+    def test_ids_and_sequences(self):
+        """Test that the ORM keeps working after the explicit ids"""
+        seed()
+
+        user = User.objects.create_user('new@email.com', 'pass')
+        recipe = Recipe.objects.create(user=user, title='Cake',
+                                       time_minutes=5, price=1)
+
+        self.assertEqual(recipe.id, 61)
+
+    def test_popular_tags(self):
+        """Test that a few tags are used much more than the others"""
+        seed(users=1, recipes=500)
+
+        uses = Counter(Recipe.tags.through.objects
+                       .values_list('tag_id', flat=True))
+        ranked = [count for _tag, count in uses.most_common()]
+        self.assertGreater(ranked[0], 3 * ranked[-1])
+
+    def test_same_seed_same_data(self):
+        """Test that a seed reproduces the data"""
+        seed(seed=7)
+        titles = list(Recipe.objects.order_by('id')
+                      .values_list('title', flat=True))
+
+        seed(seed=7, reset=True)
+
+        self.assertEqual(Recipe.objects.count(), 60)
+        self.assertEqual(
+            list(Recipe.objects.order_by('id')
+                 .values_list('title', flat=True)),
+            titles
+        )
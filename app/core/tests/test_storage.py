@@ -0,0 +1,286 @@
+import hashlib
+import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import TemporaryUploadedFile
+from django.core.management import call_command
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+
+from core import models
+from core.storage import ContentAddressedStorage, \
+                         HashingFileUploadHandler, is_blob
+
+
+class ContentAddressedStorageTests(TestCase):
+    """Test the content addressed storage of the uploads"""
+
+    def setUp(self):
+        self.location = tempfile.mkdtemp()
+        self.temp_dir = tempfile.mkdtemp()
+        self.storage = ContentAddressedStorage(location=self.location,
+                                               temp_dir=self.temp_dir)
+
+    def tearDown(self):
+        shutil.rmtree(self.location)
+        shutil.rmtree(self.temp_dir)
+
+    def test_file_named_after_content(self):
+        """Test that the stored name is the hash of the content"""
+        content = b'recipe image'
+        digest = hashlib.sha256(content).hexdigest()
+
+        name = self.storage.save('uploads/recipe/a.JPG',
+                                 ContentFile(content))
+
+        self.assertEqual(
+            name,
+            f'uploads/recipe/{digest[:2]}/{digest[2:4]}/{digest}.jpg'
+        )
+        self.assertTrue(is_blob(name))
+        with self.storage.open(name) as stored:
+            self.assertEqual(stored.read(), content)
+
+    def test_same_content_stored_once(self):
+        """Test that uploading the same bytes twice reuses the blob"""
+        name1 = self.storage.save('uploads/recipe/a.jpg',
+                                  ContentFile(b'same'))
+        name2 = self.storage.save('uploads/recipe/b.jpg',
+                                  ContentFile(b'same'))
+        name3 = self.storage.save('uploads/recipe/c.jpg',
+                                  ContentFile(b'other'))
+
+        self.assertEqual(name1, name2)
+        self.assertNotEqual(name1, name3)
+        files = [name for _dir, _dirs, names in os.walk(self.location)
+                 for name in names]
+        self.assertEqual(len(files), 2)
+
+    def test_temporary_upload_moved(self):
+        """Test that an upload already on disk is moved into place"""
+        upload = TemporaryUploadedFile('a.jpg', 'image/jpeg', 4, None)
+        upload.write(b'data')
+        upload.flush()
+        tmp_path = upload.temporary_file_path()
+
+        name = self.storage.save('uploads/recipe/a.jpg', upload)
+        upload.close()
+
+        self.assertFalse(os.path.exists(tmp_path))
+        with self.storage.open(name) as stored:
+            self.assertEqual(stored.read(), b'data')
+
+    def test_written_outside_location(self):
+        """Test that uploads are written to the temporary directory"""
+        with mock.patch('core.storage.tempfile.mkstemp',
+                        wraps=tempfile.mkstemp) as mkstemp:
+            name = self.storage.save('uploads/recipe/a.jpg',
+                                     ContentFile(b'data'))
+
+        self.assertEqual(mkstemp.call_args.kwargs['dir'], self.temp_dir)
+        self.assertEqual(os.listdir(self.temp_dir), [])
+        files = [os.path.relpath(os.path.join(path, filename), self.location)
+                 for path, _dirs, names in os.walk(self.location)
+                 for filename in names]
+        self.assertEqual(files, [name])
+
+    def test_upload_hashed_while_streamed(self):
+        """Test that a streamed upload isn't read again to be hashed"""
+        handler = HashingFileUploadHandler()
+        handler.new_file('image', 'a.jpg', 'image/jpeg', None)
+        handler.receive_data_chunk(b'da', 0)
+        handler.receive_data_chunk(b'ta', 2)
+        upload = handler.file_complete(4)
+        digest = hashlib.sha256(b'data').hexdigest()
+
+        with mock.patch.object(self.storage, '_hash') as hash_file:
+            name = self.storage.save('uploads/recipe/a.jpg', upload)
+        upload.close()
+
+        hash_file.assert_not_called()
+        self.assertEqual(upload.sha256, digest)
+        self.assertIn(digest, name)
+
+    def test_concurrent_same_upload(self):
+        """Test that losing the race to store the same content reuses it"""
+        name1 = self.storage.save('uploads/recipe/a.jpg',
+                                  ContentFile(b'data'))
+        upload = TemporaryUploadedFile('b.jpg', 'image/jpeg', 4, None)
+        upload.write(b'data')
+        upload.flush()
+
+        # Both uploads found no blob before storing theirs
+        with mock.patch('core.storage.os.path.exists', return_value=False):
+            name2 = self.storage.save('uploads/recipe/b.jpg', upload)
+        upload.close()
+
+        self.assertEqual(name1, name2)
+        with self.storage.open(name2) as stored:
+            self.assertEqual(stored.read(), b'data')
+
+
+class MediaTests(TestCase):
+    """Test serving and collecting the content addressed media"""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.settings_override = self.settings(MEDIA_ROOT=self.media_root)
+        self.settings_override.enable()
+        self.storage = ContentAddressedStorage()
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.media_root)
+
+    def test_blobs_served_immutable(self):
+        """Test that blobs are served with a far future Cache-Control"""
+        name = self.storage.save('uploads/recipe/a.jpg', ContentFile(b'a'))
+
+        res = self.client.get(f'/media/{name}')
+
+        self.assertEqual(res.status_code, 200)
+        self.assertIn('immutable', res['Cache-Control'])
+        self.assertIn('max-age=31536000', res['Cache-Control'])
+
+    def test_blob_etag_is_digest(self):
+        """Test that reusing a blob doesn't change its validators"""
+        name = self.storage.save('uploads/recipe/a.jpg', ContentFile(b'a'))
+        digest = hashlib.sha256(b'a').hexdigest()
+
+        res = self.client.get(f'/media/{name}')
+        self.storage.save('uploads/recipe/b.jpg', ContentFile(b'a'))
+        os.utime(self.storage.path(name), (0, 0))
+        cached = self.client.get(f'/media/{name}',
+                                 HTTP_IF_NONE_MATCH=res['ETag'])
+
+        self.assertEqual(res['ETag'], f'"{digest}"')
+        self.assertNotIn('Last-Modified', res)
+        self.assertEqual(cached.status_code, 304)
+
+    def test_gc_media_deletes_unreferenced_blobs(self):
+        """Test that only the blobs no recipe uses are deleted"""
+        used = self.storage.save('uploads/recipe/a.jpg', ContentFile(b'a'))
+        unused = self.storage.save('uploads/recipe/b.jpg', ContentFile(b'b'))
+        unused_path = self.storage.path(unused)
+        variant_path = os.path.join(
+            os.path.dirname(unused_path),
+            'variants',
+            os.path.basename(unused_path).replace('.jpg', '_thumbnail.jpg')
+        )
+        os.makedirs(os.path.dirname(variant_path))
+        open(variant_path, 'wb').close()
+        models.Recipe.objects.create(
+            user=get_user_model().objects.create_user('test@email.com'),
+            title='Cake',
+            time_minutes=30,
+            price=10.00,
+            image=used
+        )
+
+        call_command('gc_media', grace=0, stdout=StringIO())
+
+        self.assertTrue(os.path.exists(self.storage.path(used)))
+        self.assertFalse(os.path.exists(unused_path))
+        self.assertFalse(os.path.exists(variant_path))
+
+    def test_gc_media_keeps_recent_blobs(self):
+        """Test that blobs within the grace period are kept"""
+        name = self.storage.save('uploads/recipe/a.jpg', ContentFile(b'a'))
+
+        call_command('gc_media', stdout=StringIO())
+
+        self.assertTrue(os.path.exists(self.storage.path(name)))
+
+
+class ServeMediaTests(TestCase):
+    """Test serving the media files"""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.settings_override = self.settings(MEDIA_ROOT=self.media_root)
+        self.settings_override.enable()
+        os.makedirs(os.path.join(self.media_root, 'uploads'))
+        with open(os.path.join(self.media_root, 'uploads/a.txt'), 'wb') as f:
+            f.write(b'0123456789')
+        self.url = '/media/uploads/a.txt'
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.media_root)
+
+    def test_serve_whole_file(self):
+        """Test serving a file with its validators"""
+        res = self.client.get(self.url)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(b''.join(res.streaming_content), b'0123456789')
+        self.assertEqual(res['Content-Length'], '10')
+        self.assertEqual(res['Accept-Ranges'], 'bytes')
+        self.assertIn('ETag', res)
+        self.assertIn('Last-Modified', res)
+
+    def test_serve_byte_range(self):
+        """Test serving part of a file"""
+        res = self.client.get(self.url, HTTP_RANGE='bytes=2-5')
+
+        self.assertEqual(res.status_code, 206)
+        self.assertEqual(b''.join(res.streaming_content), b'2345')
+        self.assertEqual(res['Content-Length'], '4')
+        self.assertEqual(res['Content-Range'], 'bytes 2-5/10')
+
+        res = self.client.get(self.url, HTTP_RANGE='bytes=-3')
+        self.assertEqual(b''.join(res.streaming_content), b'789')
+
+    def test_unsatisfiable_range(self):
+        """Test a range past the end of the file is rejected"""
+        res = self.client.get(self.url, HTTP_RANGE='bytes=20-')
+
+        self.assertEqual(res.status_code, 416)
+        self.assertEqual(res['Content-Range'], 'bytes */10')
+
+    def test_stale_if_range_serves_whole_file(self):
+        """Test that a range of an older version is not served"""
+        res = self.client.get(self.url, HTTP_RANGE='bytes=2-5',
+                              HTTP_IF_RANGE='"stale"')
+
+        self.assertEqual(res.status_code, 200)
+
+    def test_not_modified(self):
+        """Test conditional requests are answered with a 304"""
+        etag = self.client.get(self.url)['ETag']
+
+        res = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, 304)
+
+    def test_outside_media_root_not_found(self):
+        """Test files outside of the media root can't be reached"""
+        res = self.client.get('/media/../../etc/passwd')
+        self.assertEqual(res.status_code, 404)
+
+        res = self.client.get('/media/uploads/missing.txt')
+        self.assertEqual(res.status_code, 404)
+
+    def test_offload_to_nginx(self):
+        """Test the transfer can be offloaded with X-Accel-Redirect"""
+        with self.settings(MEDIA_SERVE_MODE='x-accel'):
+            res = self.client.get(self.url)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res['X-Accel-Redirect'],
+                         '/protected-media/uploads/a.txt')
+        self.assertEqual(res.content, b'')
+
+    def test_offload_with_x_sendfile(self):
+        """Test the transfer can be offloaded with X-Sendfile"""
+        with self.settings(MEDIA_SERVE_MODE='x-sendfile'):
+            res = self.client.get(self.url)
+
+        self.assertEqual(
+            res['X-Sendfile'],
+            os.path.join(self.media_root, 'uploads/a.txt')
+        )
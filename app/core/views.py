@@ -0,0 +1,236 @@
+import mimetypes
+import os
+import posixpath
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse, \
+                        HttpResponseForbidden
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response, \
+                               patch_cache_control
+from django.utils.http import http_date, parse_etags, parse_http_date_safe, \
+                              quote_etag
+
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from core.authentication import ExpiringTokenAuthentication
+from core.backends.metrics import all_connection_stats
+from core.metrics import render_prometheus
+from core.storage import blob_digest
+
+
+RANGE_RE = re.compile(r'^bytes=(?P<start>\d*)-(?P<end>\d*)$')
+
+# Database connection stats exported by the metrics view: (stat, type, help)
+DB_CONNECTION_METRICS = (
+    ('connects', 'counter', 'Connections opened'),
+    ('connect_time', 'counter', 'Seconds spent opening connections'),
+    ('checkouts', 'counter', 'Connections used by a request'),
+    ('checkout_time', 'counter',
+     'Seconds requests waited for a usable connection (connect or health '
+     'check), the pool wait behind pgbouncer is in its own stats'),
+    ('reused', 'counter', 'Persistent connections reused by a request'),
+    ('health_check_failures', 'counter',
+     'Persistent connections found unusable'),
+    ('closes', 'counter', 'Connections closed'),
+    ('open', 'gauge', 'Connections open'),
+    ('max_open', 'gauge', 'Most connections open at once'),
+    ('saturation', 'gauge',
+     'Open connections of the process over its share of DB_POOL_SIZE'),
+)
+
+
+class RangeFile:
+    """
+    File like object reading length bytes of a file from start.
+
+    It keeps the file descriptor reachable through fileno(), so a WSGI
+    server with sendfile support (e.g. gunicorn) sends the range from the
+    current offset without reading it into Python.
+    """
+
+    def __init__(self, file, start, length):
+        file.seek(start)
+        self.file = file
+        self.remaining = length
+
+    def read(self, size=-1):
+        if self.remaining <= 0:
+            return b''
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+
+        return data
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def close(self):
+        self.file.close()
+
+
+def parse_range(header, size):
+    """
+    Return the (start, length) of a single byte range request, None when
+    the whole file must be sent and raise ValueError when unsatisfiable
+    """
+    match = RANGE_RE.match(header.strip()) if header else None
+    if not match or (not match['start'] and not match['end']):
+        # Missing, malformed or multiple ranges: send everything
+        return None
+
+    if not match['start']:
+        length = min(int(match['end']), size)
+        if length == 0:
+            raise ValueError(header)
+        return size - length, length
+
+    start = int(match['start'])
+    end = int(match['end']) if match['end'] else size - 1
+    if start >= size or end < start:
+        raise ValueError(header)
+
+    return start, min(end, size - 1) - start + 1
+
+
+def _if_range_matches(request, etag, last_modified):
+    """Whether the validator of If-Range still matches the file"""
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if not if_range:
+        return True
+    if if_range.startswith(('"', 'W/')):
+        return etag in parse_etags(if_range)
+
+    return last_modified is not None and \
+        parse_http_date_safe(if_range) == int(last_modified)
+
+
+def serve_media(request, path):
+    """
+    Serve an uploaded file.
+
+    Depending on MEDIA_SERVE_MODE the transfer is offloaded to the front
+    web server (X-Accel-Redirect for nginx, X-Sendfile for apache/lighttpd)
+    or done by Django with a FileResponse, which WSGI servers send with
+    sendfile. Byte ranges and conditional requests are supported, content
+    addressed blobs never change so they can be cached by the clients for
+    good.
+    """
+    path = posixpath.normpath(path).lstrip('/')
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404('File not found')
+    try:
+        stat = os.stat(full_path)
+    except (FileNotFoundError, NotADirectoryError):
+        raise Http404('File not found')
+    if not os.path.isfile(full_path):
+        raise Http404('File not found')
+
+    digest = blob_digest(path)
+    if digest:
+        # The name is the hash of the content, the mtime is only the age
+        # gc_media goes by and is refreshed whenever the blob is reused
+        etag = quote_etag(digest)
+        last_modified = None
+    else:
+        etag = quote_etag(f'{stat.st_mtime_ns:x}-{stat.st_size:x}')
+        last_modified = stat.st_mtime
+    response = get_conditional_response(
+        request,
+        etag=etag,
+        last_modified=None if last_modified is None else int(last_modified)
+    )
+    if response is None:
+        response = _file_response(request, path, full_path, stat.st_size,
+                                  etag, last_modified)
+
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified)
+    if digest:
+        patch_cache_control(response, public=True, immutable=True,
+                            max_age=settings.MEDIA_IMMUTABLE_MAX_AGE)
+
+    return response
+
+
+def _file_response(request, path, full_path, size, etag, last_modified):
+    """Return the response sending (part of) the file"""
+    content_type, encoding = mimetypes.guess_type(full_path)
+    content_type = content_type or 'application/octet-stream'
+
+    mode = settings.MEDIA_SERVE_MODE
+    if mode in ('x-accel', 'x-sendfile'):
+        # The front server handles the ranges and the transfer
+        response = HttpResponse(content_type=content_type)
+        if mode == 'x-accel':
+            response['X-Accel-Redirect'] = \
+                settings.MEDIA_ACCEL_PREFIX + quote(path)
+        else:
+            response['X-Sendfile'] = full_path
+        return response
+
+    try:
+        byte_range = parse_range(request.META.get('HTTP_RANGE'), size) \
+            if _if_range_matches(request, etag, last_modified) else None
+    except ValueError:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        return response
+
+    file = open(full_path, 'rb')
+    if byte_range is None:
+        response = FileResponse(file, content_type=content_type)
+    else:
+        start, length = byte_range
+        response = FileResponse(RangeFile(file, start, length),
+                                content_type=content_type, status=206)
+        response['Content-Length'] = str(length)
+        response['Content-Range'] = \
+            f'bytes {start}-{start + length - 1}/{size}'
+    if encoding:
+        response['Content-Encoding'] = encoding
+    response['Accept-Ranges'] = 'bytes'
+
+    return response
+
+
+class DatabaseMetricsView(APIView):
+    """
+    Return the database connection metrics of the process handling the
+    request, every worker keeps its own
+    """
+    authentication_classes = (ExpiringTokenAuthentication,)
+    permission_classes = (IsAdminUser,)
+
+    def get(self, request):
+        return Response(all_connection_stats(settings.DB_PROCESS_POOL_SIZE))
+
+
+def metrics(request):
+    """
+    Return the request histograms and the database connection stats of the
+    process in the Prometheus text format. Every worker process keeps its
+    own, scrape them through each worker or sum them up.
+    """
+    if request.META.get('REMOTE_ADDR') not in settings.METRICS_ALLOWED_IPS:
+        return HttpResponseForbidden()
+
+    extra = []
+    pool_size = settings.DB_PROCESS_POOL_SIZE
+    for alias, stats in all_connection_stats(pool_size).items():
+        for stat, metric_type, help_text in DB_CONNECTION_METRICS:
+            extra.append((f'db_connection_{stat}', metric_type, help_text,
+                          {'alias': alias}, stats.get(stat, 0)))
+
+    return HttpResponse(render_prometheus(extra),
+                        content_type='text/plain; version=0.0.4')
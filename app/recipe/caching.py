@@ -0,0 +1,198 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import Count, Max
+from django.utils import timezone
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.http import http_date, parse_etags, parse_http_date_safe, \
+                             quote_etag
+
+from rest_framework import status
+from rest_framework.response import Response
+
+from core.models import ListVersion
+
+
+def get_cache():
+    """Return the cache used for the recipe API responses"""
+    return caches[settings.RECIPE_CACHE_ALIAS]
+
+
+def get_version(model, user_id):
+    """
+    Return the time of the last change to the objects of a user, None when
+    they never changed since versions are tracked
+    """
+    try:
+        changed_at = ListVersion.objects.values_list(
+            'changed_at', flat=True
+        ).get(user_id=user_id, model=model._meta.label_lower)
+    except ListVersion.DoesNotExist:
+        return None
+
+    return changed_at.timestamp()
+
+
+def invalidate(model, user_id):
+    """
+    Bump the version of the objects of the user. It's written in the
+    transaction of the change, every process and database sees both or
+    neither, so no cached response for the old version is served again.
+    """
+    lookup = {'user_id': user_id, 'model': model._meta.label_lower}
+    now = timezone.now()
+    if not ListVersion.objects.filter(**lookup).update(changed_at=now):
+        _version, created = ListVersion.objects.get_or_create(
+            defaults={'changed_at': now}, **lookup
+        )
+        if not created:
+            # Created by a concurrent change
+            ListVersion.objects.filter(**lookup).update(changed_at=now)
+
+
+def make_etag(*parts):
+    """Return a quoted ETag built from the given parts"""
+    digest = hashlib.md5(
+        ':'.join(str(part) for part in parts).encode()
+    ).hexdigest()
+
+    return quote_etag(digest)
+
+
+def not_modified(request, etag, last_modified=None):
+    """Check the conditional headers of the request against the resource"""
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if if_none_match:
+        # If-None-Match takes precedence over If-Modified-Since
+        return etag in parse_etags(if_none_match) or if_none_match == '*'
+
+    if_modified_since = request.META.get('HTTP_IF_MODIFIED_SINCE')
+    if if_modified_since and last_modified is not None:
+        if_modified_since = parse_http_date_safe(if_modified_since)
+        return if_modified_since is not None and \
+            int(last_modified) <= if_modified_since
+
+    return False
+
+
+def set_validators(response, etag, last_modified=None):
+    """Add the validator and cache headers to a per user response"""
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified)
+    patch_cache_control(response, private=True, no_cache=True)
+    patch_vary_headers(response, ('Authorization',))
+
+    return response
+
+
+class CachedListMixin:
+    """
+    Cache the list responses of a viewset per user.
+
+    Responses are keyed by the version of the objects of the user, read
+    from the database and bumped by the signals in recipe.signals whenever
+    one of them changes, so there is never a stale entry to delete and a
+    per process cache is never served for an old version. The version is
+    also sent as ETag/Last-Modified so clients can revalidate and get a 304.
+    The cached data is also keyed by the database it was read from.
+    """
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.get_queryset()
+        model = queryset.model
+        last_modified = get_version(model, request.user.pk)
+        etag = make_etag(
+            model._meta.label,
+            request.user.pk,
+            last_modified or 0,
+            request.accepted_renderer.format,
+            request.get_full_path(),
+        )
+
+        if not_modified(request, etag, last_modified):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+            return set_validators(response, etag, last_modified)
+
+        cache = get_cache()
+        # A replica may be behind, what it returned isn't shared with the
+        # requests reading from another database
+        key = f'recipe:list:{queryset.db}:{etag}'
+        data = cache.get(key)
+        if data is None:
+            data = super().list(request, *args, **kwargs).data
+            cache.set(key, data, settings.RECIPE_CACHE_TIMEOUT)
+
+        return set_validators(Response(data), etag, last_modified)
+
+    def bulk_changed(self, objs):
+        super().bulk_changed(objs)
+        invalidate(self.get_queryset().model, self.request.user.pk)
+
+
+class ConditionalGetMixin:
+    """
+    Answer list and retrieve requests with 304 Not Modified before any
+    serialization when the objects didn't change.
+
+    The validators come from the updated_at field of the model, which is
+    also touched when the related objects change (see core.signals), plus
+    the number of objects so deletions are noticed on the list. The list
+    has no Last-Modified, a deletion doesn't move it.
+    """
+
+    def get_validator_queryset(self):
+        """Return the objects of the user without any prefetching"""
+        return self.queryset.filter(user=self.request.user)
+
+    def list(self, request, *args, **kwargs):
+        validators = self.get_validator_queryset().aggregate(
+            count=Count('id'),
+            last_modified=Max('updated_at')
+        )
+        last_modified = validators['last_modified'].timestamp() \
+            if validators['last_modified'] else None
+        # Only the ETag is sent: the latest updated_at stays the same when a
+        # recipe is deleted, the count doesn't
+        etag = make_etag(
+            request.user.pk,
+            validators['count'],
+            last_modified,
+            request.accepted_renderer.format,
+            request.get_full_path(),
+        )
+
+        if not_modified(request, etag):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = super().list(request, *args, **kwargs)
+
+        return set_validators(response, etag)
+
+    def retrieve(self, request, *args, **kwargs):
+        lookup = kwargs[self.lookup_url_kwarg or self.lookup_field]
+        try:
+            updated_at = self.get_validator_queryset().filter(
+                **{self.lookup_field: lookup}
+            ).values_list('updated_at', flat=True).first()
+        except (TypeError, ValueError):
+            updated_at = None
+        if updated_at is None:
+            # Let the default implementation answer the 404
+            return super().retrieve(request, *args, **kwargs)
+
+        last_modified = updated_at.timestamp()
+        etag = make_etag(
+            request.user.pk,
+            lookup,
+            last_modified,
+            request.accepted_renderer.format,
+        )
+
+        if not_modified(request, etag, last_modified):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = super().retrieve(request, *args, **kwargs)
+
+        return set_validators(response, etag, last_modified)
@@ -0,0 +1,60 @@
+from django.db.models import Exists, OuterRef
+from django.utils.translation import gettext_lazy as _
+
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+
+
+# The primary keys are bigints, the database rejects anything larger. Bound
+# fields need their own copy (copy.deepcopy).
+ID_FIELD = serializers.IntegerField(min_value=1, max_value=2 ** 63 - 1)
+
+
+def params_to_ints(request, name):
+    """Convert a comma separated list of ids in the query string to ints"""
+    value = request.query_params.get(name)
+    if not value:
+        return []
+    try:
+        return [ID_FIELD.run_validation(pk) for pk in value.split(',')]
+    except ValidationError:
+        raise ValidationError({name: [_('Expected a comma separated list of '
+                                        'ids.')]})
+
+
+def param_to_bool(request, name):
+    """Read a 0/1 flag from the query string"""
+    value = request.query_params.get(name, '0')
+    if value not in ('0', '1'):
+        raise ValidationError({name: [_('Expected 0 or 1.')]})
+
+    return value == '1'
+
+
+def filter_by_related(queryset, field, ids, match_all=False):
+    """
+    Filter objects related through the many to many field to any (or all)
+    of the ids. Each condition is an EXISTS subquery on the through table
+    so no join rows are multiplied and no distinct() is needed.
+    """
+    m2m = queryset.model._meta.get_field(field)
+    through = m2m.remote_field.through
+    source = m2m.m2m_field_name()
+    target = f'{m2m.m2m_reverse_field_name()}_id'
+
+    rows = through.objects.filter(**{source: OuterRef('pk')})
+    if not match_all:
+        return queryset.filter(Exists(rows.filter(**{f'{target}__in': ids})))
+    for pk in dict.fromkeys(ids):
+        queryset = queryset.filter(Exists(rows.filter(**{target: pk})))
+
+    return queryset
+
+
+def filter_assigned(queryset, m2m):
+    """Filter objects used by at least one object of the many to many field"""
+    rows = m2m.remote_field.through.objects.filter(
+        **{m2m.m2m_reverse_field_name(): OuterRef('pk')}
+    )
+
+    return queryset.filter(Exists(rows))
@@ -0,0 +1,112 @@
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+
+from PIL import Image
+
+
+logger = logging.getLogger(__name__)
+
+# Variants generated for every recipe image: (longest side, format, ext)
+VARIANTS = {
+    'thumbnail': (320, 'JPEG', 'jpg'),
+    'webp': (1600, 'WEBP', 'webp'),
+}
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def variant_name(image_name, variant):
+    """Return the storage name of a variant of an image"""
+    directory, filename = os.path.split(image_name)
+    stem = os.path.splitext(filename)[0]
+    ext = VARIANTS[variant][2]
+
+    return os.path.join(directory, 'variants', f'{stem}_{variant}.{ext}')
+
+
+def render_variants(source_path, targets):
+    """
+    Write the variants of the image at source_path to the target paths.
+
+    This runs in the worker processes, so it only deals with paths and
+    Pillow. Every variant is written to a temporary file and then moved in
+    place, a variant file that exists is always complete.
+    """
+    with Image.open(source_path) as image:
+        image.load()
+        if image.mode not in ('RGB', 'L'):
+            image = image.convert('RGB')
+        for variant, target in targets.items():
+            size, image_format, _ext = VARIANTS[variant]
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            resized = image.copy()
+            resized.thumbnail((size, size))
+            tmp_path = f'{target}.tmp'
+            resized.save(tmp_path, format=image_format, quality=85)
+            os.replace(tmp_path, target)
+
+
+def get_executor():
+    """Return the pool the variants are rendered in, created on first use"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            workers = settings.RECIPE_IMAGE_WORKERS
+            if settings.RECIPE_IMAGE_EXECUTOR == 'process':
+                # Don't fork the request worker, its threads and database
+                # connections are not safe to copy
+                _executor = ProcessPoolExecutor(
+                    max_workers=workers,
+                    mp_context=multiprocessing.get_context('spawn')
+                )
+            else:
+                _executor = ThreadPoolExecutor(
+                    max_workers=workers,
+                    thread_name_prefix='recipe-images'
+                )
+
+    return _executor
+
+
+def _log_failure(future):
+    error = future.exception()
+    if error is not None:
+        logger.error('Rendering recipe image variants failed',
+                     exc_info=error)
+
+
+def schedule_variants(image_name):
+    """Render the variants of an image without blocking the request"""
+    targets = {variant: default_storage.path(variant_name(image_name, variant))
+               for variant in VARIANTS}
+    # The same image uploaded again already has its variants
+    targets = {variant: path for variant, path in targets.items()
+               if not os.path.exists(path)}
+    if not targets:
+        return
+    source = default_storage.path(image_name)
+
+    if settings.RECIPE_IMAGE_EXECUTOR == 'sync':
+        render_variants(source, targets)
+        return
+
+    future = get_executor().submit(render_variants, source, targets)
+    future.add_done_callback(_log_failure)
+
+
+def variant_urls(image_name):
+    """Return the URL of every variant, None for the ones not ready yet"""
+    urls = {}
+    for variant in VARIANTS:
+        name = variant_name(image_name, variant)
+        urls[variant] = default_storage.url(name) \
+            if default_storage.exists(name) else None
+
+    return urls
@@ -0,0 +1,249 @@
+import copy
+from collections import Counter
+
+from django.conf import settings
+from django.db import connections, router, transaction
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+
+from rest_framework import serializers, status
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+from recipe.filters import ID_FIELD
+
+
+class BulkDestroySerializer(serializers.Serializer):
+    """Serializer for the ids of the objects to be deleted in bulk"""
+    ids = serializers.ListField(
+        child=copy.deepcopy(ID_FIELD),
+        allow_empty=False
+    )
+
+
+class BulkModelMixin:
+    """
+    Create, update and delete lists of objects through a single request.
+
+    Objects are validated one by one and the errors are reported per item,
+    in the same order as the payload, like DRF's ListSerializer does. The
+    writes only happen when every item is valid and they are done with
+    bulk_create/bulk_update and one insert per many to many through table.
+    """
+    # Serializer used to validate the items, defaults to serializer_class
+    bulk_serializer_class = None
+    # Many to many fields written through the bulk endpoint, mapped to the
+    # model the ids in the payload must belong to
+    bulk_m2m_fields = {}
+
+    invalid_pk_message = _('Invalid pk "{pk_value}" - object does not exist.')
+
+    def get_bulk_serializer(self, *args, **kwargs):
+        """Return the serializer instance used to validate one item"""
+        serializer_class = self.bulk_serializer_class or \
+            self.get_serializer_class()
+        kwargs.setdefault('context', self.get_serializer_context())
+        return serializer_class(*args, **kwargs)
+
+    @action(detail=False, methods=['post', 'patch', 'delete'])
+    def bulk(self, request):
+        """Create, update or delete a list of objects"""
+        if request.method == 'DELETE':
+            return self.bulk_destroy(request)
+
+        items = request.data
+        if not isinstance(items, list):
+            raise ValidationError({
+                api_settings.NON_FIELD_ERRORS_KEY: [
+                    _('Expected a list of items.')
+                ]
+            })
+        if len(items) > settings.BULK_MAX_ITEMS:
+            raise ValidationError({
+                api_settings.NON_FIELD_ERRORS_KEY: [
+                    _('Ensure this list has no more than {max} items.')
+                    .format(max=settings.BULK_MAX_ITEMS)
+                ]
+            })
+
+        if request.method == 'POST':
+            return self.bulk_create(items)
+        return self.bulk_update(items)
+
+    def bulk_create(self, items):
+        """Validate and insert every item of the payload"""
+        validated, errors = self._bulk_validate(items)
+        if any(errors):
+            return Response(errors, status=status.HTTP_400_BAD_REQUEST)
+
+        model = self.get_queryset().model
+        relations = [self._pop_m2m(data) for data in validated]
+        objs = [model(user=self.request.user, **data) for data in validated]
+        with transaction.atomic(using=router.db_for_write(model)):
+            self._bulk_insert(model, objs)
+            self._bulk_set_m2m(model, objs, relations)
+            self.bulk_changed(objs)
+
+        return Response(
+            self._bulk_response(objs),
+            status=status.HTTP_201_CREATED
+        )
+
+    def bulk_update(self, items):
+        """Validate and partially update every item of the payload"""
+        ids = []
+        for item in items:
+            try:
+                ids.append(ID_FIELD.run_validation(
+                    item.get('id') if isinstance(item, dict) else None
+                ))
+            except ValidationError:
+                ids.append(None)
+
+        queryset = self.get_queryset().prefetch_related(None)
+        found = queryset.in_bulk([pk for pk in ids if pk is not None])
+        # An object listed twice in the same payload is rejected
+        counts = Counter(ids)
+        instances = [found.get(pk) if counts[pk] == 1 else None
+                     for pk in ids]
+
+        validated, errors = self._bulk_validate(items, instances)
+        for index, instance in enumerate(instances):
+            if instance is None:
+                errors[index] = {'id': [
+                    self.invalid_pk_message.format(
+                        pk_value=items[index].get('id')
+                        if isinstance(items[index], dict) else None
+                    )
+                ]}
+        if any(errors):
+            return Response(errors, status=status.HTTP_400_BAD_REQUEST)
+
+        model = queryset.model
+        relations = [self._pop_m2m(data) for data in validated]
+        # bulk_update doesn't run pre_save, so auto_now fields are set here
+        touched = {field.attname: timezone.now()
+                   for field in model._meta.concrete_fields
+                   if getattr(field, 'auto_now', False)}
+        fields = set()
+        for instance, data in zip(instances, validated):
+            for field, value in {**data, **touched}.items():
+                setattr(instance, field, value)
+            fields.update(data)
+        if fields or any(relations):
+            fields.update(touched)
+        with transaction.atomic(using=router.db_for_write(model)):
+            if fields:
+                model.objects.bulk_update(instances, sorted(fields))
+            self._bulk_set_m2m(model, instances, relations, replace=True)
+            self.bulk_changed(instances)
+
+        return Response(self._bulk_response(instances))
+
+    def bulk_destroy(self, request):
+        """Delete the objects of the user with the given ids"""
+        serializer = BulkDestroySerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        queryset = self.get_queryset().prefetch_related(None)
+        _deleted, per_model = queryset.filter(
+            pk__in=serializer.validated_data['ids']
+        ).delete()
+        self.bulk_changed([])
+
+        return Response({'deleted': per_model.get(queryset.model._meta.label,
+                                                  0)})
+
+    def bulk_changed(self, objs):
+        """
+        Hook called with the objects written in bulk, bulk_create and
+        bulk_update don't send the model signals
+        """
+
+    def _bulk_validate(self, items, instances=None):
+        """
+        Validate every item, returning the validated data and a list of
+        errors with an empty dict for every valid item
+        """
+        validated, errors = [], []
+        for index, item in enumerate(items):
+            instance = instances[index] if instances else None
+            serializer = self.get_bulk_serializer(
+                instance,
+                data=item,
+                partial=instance is not None
+            )
+            if serializer.is_valid():
+                validated.append(dict(serializer.validated_data))
+                errors.append({})
+            else:
+                validated.append({})
+                errors.append(serializer.errors)
+
+        # Check the related ids of all the items with one query per field
+        for field, related_model in self.bulk_m2m_fields.items():
+            wanted = {pk for data in validated for pk in data.get(field, ())}
+            existing = set(related_model.objects.filter(
+                user=self.request.user,
+                pk__in=wanted
+            ).values_list('pk', flat=True)) if wanted else set()
+            for data, error in zip(validated, errors):
+                missing = [pk for pk in data.get(field, ())
+                           if pk not in existing]
+                if missing:
+                    error[field] = [
+                        self.invalid_pk_message.format(pk_value=pk)
+                        for pk in missing
+                    ]
+
+        return validated, errors
+
+    def _pop_m2m(self, data):
+        """Remove the many to many values from the validated data"""
+        return {field: data.pop(field) for field in self.bulk_m2m_fields
+                if field in data}
+
+    def _bulk_insert(self, model, objs):
+        """Insert the objects, making sure they get their primary keys"""
+        connection = connections[router.db_for_write(model)]
+        if connection.features.can_return_rows_from_bulk_insert:
+            model.objects.bulk_create(objs)
+        else:
+            # The backend can't report the ids of a bulk insert and they are
+            # needed for the through tables and for the response
+            for obj in objs:
+                obj.save(force_insert=True)
+
+    def _bulk_set_m2m(self, model, objs, relations, replace=False):
+        """Write the many to many values with one insert per through table"""
+        for field in self.bulk_m2m_fields:
+            m2m = model._meta.get_field(field)
+            through = m2m.remote_field.through
+            source = f'{m2m.m2m_field_name()}_id'
+            target = f'{m2m.m2m_reverse_field_name()}_id'
+
+            changed = [(obj, values[field]) for obj, values
+                       in zip(objs, relations) if field in values]
+            if not changed:
+                continue
+            if replace:
+                through.objects.filter(**{
+                    f'{source}__in': [obj.pk for obj, _pks in changed]
+                }).delete()
+            through.objects.bulk_create([
+                through(**{source: obj.pk, target: pk})
+                for obj, pks in changed
+                for pk in dict.fromkeys(pks)
+            ])
+
+    def _bulk_response(self, objs):
+        """Serialize the written objects, reading them back in one go"""
+        found = self.get_queryset().in_bulk([obj.pk for obj in objs])
+        serializer = self.get_serializer(
+            [found[obj.pk] for obj in objs],
+            many=True
+        )
+
+        return serializer.data
@@ -0,0 +1,20 @@
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+
+class IdCursorPagination(CursorPagination):
+    """
+    Keyset pagination over the primary key, so fetching a page costs the
+    same no matter how deep into the collection the client is
+    """
+    ordering = 'id'
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+
+
+class SearchPagination(PageNumberPagination):
+    """
+    Page number pagination for ranked results, which can't be paginated
+    by a cursor as they are not ordered by a column
+    """
+    page_size_query_param = 'page_size'
+    max_page_size = 100
@@ -1,9 +1,18 @@
+import copy
+
+from django.conf import settings
+from django.utils.translation import gettext_lazy as _
+
 from rest_framework import serializers
 
+from core.metrics import TimedSerializerMixin
 from core.models import Tag, Ingredient, Recipe
 
+from recipe.filters import ID_FIELD
+from recipe.images import variant_urls
+
 
-class TagSerializer(serializers.ModelSerializer):
+class TagSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """Serializer for Tag objects"""
 
     class Meta:
@@ -12,7 +21,7 @@ class TagSerializer(serializers.ModelSerializer):
         read_only_fields = ('id',)
 
 
-class IngredientSerializer(serializers.ModelSerializer):
+class IngredientSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """Serializer for Ingredient objects"""
 
     class Meta:
@@ -21,7 +30,7 @@ class IngredientSerializer(serializers.ModelSerializer):
         read_only_fields = ('id',)
 
 
-class RecipeSerializer(serializers.ModelSerializer):
+class RecipeSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """Serializer to manage recipees objects"""
     ingredients = serializers.PrimaryKeyRelatedField(
         many=True,
@@ -48,3 +57,55 @@ class RecipeDetailSerializer(RecipeSerializer):
     """Serialize a recipe detail"""
     ingredients = IngredientSerializer(many=True, read_only=True)
     tags = TagSerializer(many=True, read_only=True)
+
+
+class RecipeBulkSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    """
+    Serialize recipes written in bulk, the related ids are checked for the
+    whole payload at once by the view instead of one query per id
+    """
+    ingredients = serializers.ListField(
+        child=copy.deepcopy(ID_FIELD),
+        required=False
+    )
+    tags = serializers.ListField(
+        child=copy.deepcopy(ID_FIELD),
+        required=False
+    )
+
+    class Meta:
+        model = Recipe
+        fields = RecipeSerializer.Meta.fields
+        read_only_fields = ('id',)
+
+
+class RecipeImageSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    """Serializer for uploading images to recipes"""
+    variants = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Recipe
+        fields = ('id', 'image', 'variants')
+        read_only_fields = ('id',)
+        extra_kwargs = {'image': {'required': True}}
+
+    def validate_image(self, image):
+        if image.size > settings.RECIPE_IMAGE_MAX_SIZE:
+            raise serializers.ValidationError(
+                _('Ensure the image has at most {max} bytes.')
+                .format(max=settings.RECIPE_IMAGE_MAX_SIZE)
+            )
+
+        return image
+
+    def get_variants(self, recipe):
+        """Return the URLs of the resized variants that are ready"""
+        if not recipe.image:
+            return {}
+        urls = variant_urls(recipe.image.name)
+        request = self.context.get('request')
+        if request is None:
+            return urls
+
+        return {variant: url and request.build_absolute_uri(url)
+                for variant, url in urls.items()}
@@ -0,0 +1,34 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from core.models import Tag, Ingredient, Recipe
+
+from recipe.caching import invalidate
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def invalidate_attrs_cache(sender, instance, **kwargs):
+    """Invalidate the cached lists of the owner of a tag or ingredient"""
+    invalidate(sender, instance.user_id)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def invalidate_assigned_cache(sender, instance, action, model, **kwargs):
+    """
+    Invalidate the cached ?assigned_only=1 lists when recipes are attached
+    to or detached from tags or ingredients
+    """
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        attr_model = model if isinstance(instance, Recipe) else type(instance)
+        invalidate(attr_model, instance.user_id)
+
+
+@receiver(post_delete, sender=Recipe)
+def invalidate_recipe_attrs_cache(sender, instance, **kwargs):
+    """A deleted recipe may leave tags or ingredients unassigned"""
+    invalidate(Tag, instance.user_id)
+    invalidate(Ingredient, instance.user_id)
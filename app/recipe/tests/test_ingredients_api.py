@@ -4,8 +4,9 @@ from rest_framework.test import APIClient
 from django.test import TestCase
 from django.urls import reverse
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 
-from core.models import Ingredient
+from core.models import Ingredient, Recipe
 from recipe import serializers
 
 
@@ -38,6 +39,7 @@ class PublicIngredientApiTest(TestCase):
 class PrivateIngredientApiTest(TestCase):
     """Test requests for authenticated users"""
     def setUp(self):
+        cache.clear()
         self.client = APIClient()
         self.user = sample_user()
         self.client.force_authenticate(self.user)
@@ -52,7 +54,7 @@ class PrivateIngredientApiTest(TestCase):
         res = self.client.get(INGREDIENTS_URL)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(serializer.data, res.data)
+        self.assertEqual(serializer.data, res.data['results'])
 
     def test_retrive_ingredients_for_user(self):
         """Test retrive ingredients for user only"""
@@ -70,8 +72,8 @@ class PrivateIngredientApiTest(TestCase):
         res = self.client.get(INGREDIENTS_URL)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(res.data), 1)
-        self.assertEqual(res.data[0]['name'], ingredient.name)
+        self.assertEqual(len(res.data['results']), 1)
+        self.assertEqual(res.data['results'][0]['name'], ingredient.name)
 
     def test_create_ingredient_successful(self):
         """Test creating an ingredient"""
@@ -94,3 +96,42 @@ class PrivateIngredientApiTest(TestCase):
         res = self.client.post(INGREDIENTS_URL, payload)
 
         self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_ingredients_cache_invalidated_on_bulk_update(self):
+        """Test that a bulk update invalidates the cached list"""
+        ingredient = Ingredient.objects.create(name='Salt', user=self.user)
+        self.client.get(INGREDIENTS_URL)
+
+        self.client.patch(
+            reverse('recipe:ingredient-bulk'),
+            [{'id': ingredient.id, 'name': 'Pepper'}],
+            format='json'
+        )
+        res = self.client.get(INGREDIENTS_URL)
+
+        self.assertEqual(res.data['results'][0]['name'], 'Pepper')
+
+    def test_retrieve_ingredients_assigned_to_recipes(self):
+        """Test filtering ingredients by those assigned to recipes"""
+        ingredient1 = Ingredient.objects.create(user=self.user, name='Eggs')
+        Ingredient.objects.create(user=self.user, name='Milk')
+        recipe = Recipe.objects.create(
+            title='Omelette',
+            time_minutes=5,
+            price=3.00,
+            user=self.user
+        )
+        recipe.ingredients.add(ingredient1)
+        recipe2 = Recipe.objects.create(
+            title='Scrambled eggs',
+            time_minutes=5,
+            price=3.00,
+            user=self.user
+        )
+        recipe2.ingredients.add(ingredient1)
+
+        res = self.client.get(INGREDIENTS_URL, {'assigned_only': 1})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['results'],
+                         [serializers.IngredientSerializer(ingredient1).data])
@@ -0,0 +1,118 @@
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import models
+
+
+RECIPE_URL = reverse('recipe:recipe-list')
+EXPORT_URL = reverse('recipe:recipe-export')
+TAGS_URL = reverse('recipe:tag-list')
+INGREDIENTS_URL = reverse('recipe:ingredient-list')
+
+
+def recipe_detail_url(recipe_id):
+    """Create an return a recipe detail url"""
+    return reverse('recipe:recipe-detail', args=[recipe_id])
+
+
+def create_recipes(user, count):
+    """Create recipes with a couple of tags and ingredients each"""
+    recipes = []
+    for i in range(count):
+        recipe = models.Recipe.objects.create(
+            user=user,
+            title=f'Recipe {i}',
+            time_minutes=10,
+            price=5.00
+        )
+        recipe.tags.add(
+            models.Tag.objects.create(user=user, name=f'Tag {i}'),
+            models.Tag.objects.create(user=user, name=f'Other Tag {i}'),
+        )
+        recipe.ingredients.add(
+            models.Ingredient.objects.create(user=user, name=f'Salt {i}'),
+        )
+        recipes.append(recipe)
+
+    return recipes
+
+
+class QueryCountTestMixin:
+    """
+    Pin the number of queries an endpoint runs so N+1 regressions fail
+    """
+
+    def assertEndpointQueries(self, num, url, method='get', **kwargs):
+        """Assert the request runs exactly num queries and succeeds"""
+        with self.assertNumQueries(num):
+            res = getattr(self.client, method)(url, **kwargs)
+        self.assertLess(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+        return res
+
+
+class RecipeQueryCountTests(QueryCountTestMixin, TestCase):
+    """Test the number of queries run by the recipe endpoints"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email='testcase@email.com',
+            password='testCase'
+        )
+        self.client.force_authenticate(self.user)
+
+    def test_list_recipes_queries_constant(self):
+        """Test listing recipes does not run a query per recipe"""
+        create_recipes(self.user, 2)
+        # ETag validators, recipes, tags and ingredients
+        self.assertEndpointQueries(4, RECIPE_URL)
+
+        create_recipes(self.user, 10)
+        self.assertEndpointQueries(4, RECIPE_URL)
+
+    def test_retrieve_recipe_queries(self):
+        """Test retrieving a recipe prefetches its tags and ingredients"""
+        recipe = create_recipes(self.user, 1)[0]
+
+        res = self.assertEndpointQueries(4, recipe_detail_url(recipe.id))
+        self.assertEqual(len(res.data['tags']), 2)
+        self.assertEqual(len(res.data['ingredients']), 1)
+
+    @override_settings(RECIPE_EXPORT_CHUNK_SIZE=2)
+    def test_export_recipes_queries_per_chunk(self):
+        """Test exporting runs a fixed number of queries per chunk"""
+        create_recipes(self.user, 3)
+
+        res = self.client.get(EXPORT_URL)
+        # Two chunks of three queries each, the short one is the last
+        with self.assertNumQueries(6):
+            lines = list(res.streaming_content)
+        self.assertEqual(len(lines), 3)
+
+    def test_not_modified_recipe_queries(self):
+        """Test a 304 only runs the query for the validators"""
+        recipe = create_recipes(self.user, 1)[0]
+        url = recipe_detail_url(recipe.id)
+        res = self.client.get(url)
+
+        res = self.assertEndpointQueries(
+            1, url, HTTP_IF_NONE_MATCH=res['ETag']
+        )
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_list_tags_queries(self):
+        """Test listing tags runs the version and a single tags query"""
+        create_recipes(self.user, 5)
+        self.assertEndpointQueries(2, TAGS_URL)
+
+    def test_list_ingredients_queries(self):
+        """Test listing ingredients runs the version and a single query"""
+        create_recipes(self.user, 5)
+        self.assertEndpointQueries(2, INGREDIENTS_URL)
@@ -1,5 +1,16 @@
-from django.test import TestCase
+import json
+import os
+import shutil
+import tempfile
+from unittest import skipUnless
+from unittest.mock import patch
+
+from PIL import Image
+
+from django.db import connection
+from django.test import TestCase, override_settings
 from django.urls import reverse
+from django.utils.http import http_date
 from django.contrib.auth import get_user_model
 
 from rest_framework import status
@@ -11,6 +22,9 @@ from core import models
 
 
 RECIPE_URL = reverse('recipe:recipe-list')
+EXPORT_URL = reverse('recipe:recipe-export')
+BULK_URL = reverse('recipe:recipe-bulk')
+SEARCH_URL = reverse('recipe:recipe-search')
 
 
 def recipe_detail_url(recipe_id):
@@ -19,6 +33,11 @@ def recipe_detail_url(recipe_id):
     return url
 
 
+def image_upload_url(recipe_id):
+    """Return the url to upload an image to a recipe"""
+    return reverse('recipe:recipe-upload-image', args=[recipe_id])
+
+
 def sample_ingredient(user, name='Salt'):
     """Create and return a saample ingredient"""
     return models.Ingredient.objects.create(user=user, name=name)
@@ -75,7 +94,7 @@ class PrivateRecipeApiTests(TestCase):
         serializer = serializers.RecipeSerializer(recipes, many=True)
 
         res = self.client.get(RECIPE_URL)
-        self.assertEqual(serializer.data, res.data)
+        self.assertEqual(serializer.data, res.data['results'])
         self.assertEqual(res.status_code, status.HTTP_200_OK)
 
     def test_retrive_retrive_recipes_for_user(self):
@@ -101,8 +120,8 @@ class PrivateRecipeApiTests(TestCase):
         res = self.client.get(RECIPE_URL)
 
         self.assertEqual(res.status_code,  status.HTTP_200_OK)
-        self.assertEqual(len(res.data), 1)
-        self.assertEqual(res.data[0]['title'], recipe.title)
+        self.assertEqual(len(res.data['results']), 1)
+        self.assertEqual(res.data['results'][0]['title'], recipe.title)
 
     def test_get_recipe_detail(self):
         """Test geting the detail for an especifc recipe"""
@@ -189,3 +208,414 @@ class PrivateRecipeApiTests(TestCase):
         self.assertEqual(recipe.link, payload['link'])
         self.assertEqual(len(ingredients), 1)
         self.assertIn(ingredient, ingredients)
+
+    def test_recipes_paginated_by_cursor(self):
+        """Test that the recipes list is paginated with a cursor"""
+        recipes = [sample_recipe(user=self.user) for _ in range(3)]
+
+        res = self.client.get(RECIPE_URL, {'page_size': 2})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [recipe['id'] for recipe in res.data['results']],
+            [recipes[0].id, recipes[1].id]
+        )
+        self.assertIsNone(res.data['previous'])
+
+        res = self.client.get(res.data['next'])
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data['results']), 1)
+        self.assertEqual(res.data['results'][0]['id'], recipes[2].id)
+        self.assertIsNone(res.data['next'])
+
+    @override_settings(RECIPE_EXPORT_CHUNK_SIZE=2)
+    def test_export_recipes_streams_ndjson(self):
+        """Test exporting the recipes of the user as NDJSON"""
+        user2 = get_user_model().objects.create_user(
+            email='user2@testcase.com',
+            password='password'
+        )
+        sample_recipe(user=user2)
+        recipes = [sample_recipe(user=self.user) for _ in range(3)]
+        recipes[0].tags.add(sample_tag(user=self.user))
+
+        res = self.client.get(EXPORT_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(res.streaming)
+        self.assertEqual(res['Content-Type'], 'application/x-ndjson')
+        lines = b''.join(res.streaming_content).decode().splitlines()
+        exported = [json.loads(line) for line in lines]
+        self.assertEqual(
+            [recipe['id'] for recipe in exported],
+            [recipe.id for recipe in recipes]
+        )
+        self.assertEqual(
+            exported[0],
+            json.loads(json.dumps(
+                serializers.RecipeDetailSerializer(recipes[0]).data
+            ))
+        )
+
+    def test_bulk_create_recipes(self):
+        """Test creating a list of recipes with tags and ingredients"""
+        tag = sample_tag(user=self.user)
+        ingredient = sample_ingredient(user=self.user)
+        payload = [
+            {
+                'title': 'Salad',
+                'time_minutes': 5,
+                'price': '3.00',
+                'tags': [tag.id],
+                'ingredients': [ingredient.id],
+            },
+            {'title': 'Soup', 'time_minutes': 20, 'price': '4.50'},
+        ]
+        res = self.client.post(BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual([recipe['title'] for recipe in res.data],
+                         ['Salad', 'Soup'])
+        salad = models.Recipe.objects.get(id=res.data[0]['id'])
+        self.assertEqual(salad.user, self.user)
+        self.assertEqual(list(salad.tags.all()), [tag])
+        self.assertEqual(list(salad.ingredients.all()), [ingredient])
+        self.assertEqual(res.data[1]['tags'], [])
+
+    def test_bulk_create_recipes_rejects_tags_of_other_user(self):
+        """Test that related ids must belong to the user"""
+        user2 = get_user_model().objects.create_user(
+            email='user2@testcase.com',
+            password='password'
+        )
+        tag = sample_tag(user=user2)
+        payload = [
+            {'title': 'Soup', 'time_minutes': 20, 'price': '4.50'},
+            {
+                'title': 'Salad',
+                'time_minutes': 5,
+                'price': '3.00',
+                'tags': [tag.id],
+            },
+        ]
+        res = self.client.post(BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.data[0], {})
+        self.assertIn('tags', res.data[1])
+        self.assertFalse(models.Recipe.objects.exists())
+
+    def test_bulk_create_recipes_tag_id_out_of_range(self):
+        """Test that a related id no primary key can hold is rejected"""
+        payload = [{
+            'title': 'Salad',
+            'time_minutes': 5,
+            'price': '3.00',
+            'tags': [2 ** 64],
+        }]
+        res = self.client.post(BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('tags', res.data[0])
+        self.assertFalse(models.Recipe.objects.exists())
+
+    def test_bulk_create_requires_a_list(self):
+        """Test that the bulk endpoint rejects a single object"""
+        payload = {'title': 'Soup', 'time_minutes': 20, 'price': '4.50'}
+        res = self.client.post(BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_bulk_update_recipes(self):
+        """Test updating fields and relations of a list of recipes"""
+        recipe1 = sample_recipe(user=self.user)
+        recipe2 = sample_recipe(user=self.user)
+        recipe1.tags.add(sample_tag(user=self.user, name='Old'))
+        tag = sample_tag(user=self.user, name='New')
+        payload = [
+            {'id': recipe1.id, 'tags': [tag.id]},
+            {'id': recipe2.id, 'title': 'Renamed'},
+        ]
+        res = self.client.patch(BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        recipe1.refresh_from_db()
+        recipe2.refresh_from_db()
+        self.assertEqual(list(recipe1.tags.all()), [tag])
+        self.assertEqual(recipe2.title, 'Renamed')
+        self.assertEqual(res.data[0]['tags'], [tag.id])
+
+    def test_bulk_delete_recipes(self):
+        """Test deleting a list of recipes"""
+        recipe1 = sample_recipe(user=self.user)
+        recipe2 = sample_recipe(user=self.user)
+        recipe1.tags.add(sample_tag(user=self.user))
+        res = self.client.delete(
+            BULK_URL,
+            {'ids': [recipe1.id, recipe2.id]},
+            format='json'
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['deleted'], 2)
+        self.assertFalse(models.Recipe.objects.exists())
+
+    def test_recipe_detail_not_modified(self):
+        """Test that an unchanged recipe is answered with a 304"""
+        recipe = sample_recipe(user=self.user)
+        url = recipe_detail_url(recipe.id)
+        res = self.client.get(url)
+
+        res2 = self.client.get(url, HTTP_IF_NONE_MATCH=res['ETag'])
+
+        self.assertEqual(res2.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(res2['ETag'], res['ETag'])
+
+    def test_recipe_detail_etag_changes_with_relations(self):
+        """Test that changing tags or their names changes the ETag"""
+        recipe = sample_recipe(user=self.user)
+        tag = sample_tag(user=self.user)
+        url = recipe_detail_url(recipe.id)
+        etags = [self.client.get(url)['ETag']]
+
+        recipe.tags.add(tag)
+        etags.append(self.client.get(url)['ETag'])
+        tag.name = 'Renamed'
+        tag.save()
+        etags.append(self.client.get(url)['ETag'])
+        tag.delete()
+        etags.append(self.client.get(url)['ETag'])
+
+        self.assertEqual(len(set(etags)), 4)
+
+    def test_recipe_list_not_modified(self):
+        """Test the recipe list revalidation and its invalidation"""
+        recipe = sample_recipe(user=self.user)
+        sample_recipe(user=self.user)
+        etag = self.client.get(RECIPE_URL)['ETag']
+
+        res = self.client.get(RECIPE_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        recipe.delete()
+        res = self.client.get(RECIPE_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data['results']), 1)
+
+    def test_recipe_list_if_modified_since_after_delete(self):
+        """Test that a deletion isn't hidden by an If-Modified-Since 304"""
+        recipe = sample_recipe(user=self.user)
+        sample_recipe(user=self.user)
+        res = self.client.get(RECIPE_URL)
+        self.assertNotIn('Last-Modified', res)
+
+        recipe.delete()
+        res = self.client.get(RECIPE_URL,
+                              HTTP_IF_MODIFIED_SINCE=http_date())
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data['results']), 1)
+
+    def test_recipe_detail_not_found(self):
+        """Test that a missing recipe still returns a 404"""
+        res = self.client.get(recipe_detail_url(999))
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_filter_recipes_by_tags(self):
+        """Test returning recipes with any of the given tags"""
+        recipe1 = sample_recipe(user=self.user)
+        recipe2 = sample_recipe(user=self.user)
+        recipe3 = sample_recipe(user=self.user)
+        tag1 = sample_tag(user=self.user, name='Vegan')
+        tag2 = sample_tag(user=self.user, name='Vegetarian')
+        recipe1.tags.add(tag1, tag2)
+        recipe2.tags.add(tag2)
+
+        res = self.client.get(RECIPE_URL, {'tags': f'{tag1.id},{tag2.id}'})
+
+        ids = [recipe['id'] for recipe in res.data['results']]
+        self.assertEqual(ids, [recipe1.id, recipe2.id])
+        self.assertNotIn(recipe3.id, ids)
+
+    def test_filter_recipes_by_all_tags_and_ingredients(self):
+        """Test returning recipes with all the given tags and ingredients"""
+        recipe1 = sample_recipe(user=self.user)
+        recipe2 = sample_recipe(user=self.user)
+        tag1 = sample_tag(user=self.user, name='Vegan')
+        tag2 = sample_tag(user=self.user, name='Vegetarian')
+        ingredient = sample_ingredient(user=self.user)
+        recipe1.tags.add(tag1, tag2)
+        recipe1.ingredients.add(ingredient)
+        recipe2.tags.add(tag2)
+        recipe2.ingredients.add(ingredient)
+
+        res = self.client.get(RECIPE_URL, {
+            'tags': f'{tag1.id},{tag2.id}',
+            'ingredients': str(ingredient.id),
+            'match': 'all',
+        })
+
+        ids = [recipe['id'] for recipe in res.data['results']]
+        self.assertEqual(ids, [recipe1.id])
+
+    def test_filter_recipes_invalid_params(self):
+        """Test that invalid filters are rejected"""
+        res = self.client.get(RECIPE_URL, {'tags': 'vegan'})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+        res = self.client.get(RECIPE_URL, {'tags': '1', 'match': 'some'})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_filter_recipes_ids_out_of_range(self):
+        """Test that ids no primary key can hold are rejected"""
+        for value in (str(2 ** 63), '1,-1', '0'):
+            res = self.client.get(RECIPE_URL, {'ingredients': value})
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIn('ingredients', res.data)
+
+    def test_search_recipes_ranked(self):
+        """Test searching recipes by title, tag and ingredient names"""
+        by_ingredient = models.Recipe.objects.create(
+            title='Green salad',
+            user=self.user,
+            time_minutes=5,
+            price=3.00
+        )
+        by_ingredient.ingredients.add(
+            sample_ingredient(user=self.user, name='Tomato')
+        )
+        by_title = models.Recipe.objects.create(
+            title='Tomato soup',
+            user=self.user,
+            time_minutes=20,
+            price=4.00
+        )
+        models.Recipe.objects.create(
+            title='Chocolate cake',
+            user=self.user,
+            time_minutes=30,
+            price=25.00
+        )
+
+        res = self.client.get(SEARCH_URL, {'q': 'tomato'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['count'], 2)
+        self.assertEqual(
+            [recipe['id'] for recipe in res.data['results']],
+            [by_title.id, by_ingredient.id]
+        )
+
+    def test_search_recipes_limited_to_user(self):
+        """Test searching only returns the recipes of the user"""
+        user2 = get_user_model().objects.create_user(
+            email='user2@testcase.com',
+            password='password'
+        )
+        models.Recipe.objects.create(
+            title='Tomato soup',
+            user=user2,
+            time_minutes=20,
+            price=4.00
+        )
+
+        res = self.client.get(SEARCH_URL, {'q': 'tomato'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['results'], [])
+
+    def test_search_recipes_requires_query(self):
+        """Test that the search text is required"""
+        res = self.client.get(SEARCH_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @skipUnless(connection.vendor == 'postgresql', 'Requires PostgreSQL')
+    def test_search_vector_follows_tags(self):
+        """Test the stored search vector is updated with the tags"""
+        recipe = sample_recipe(user=self.user)
+        tag = sample_tag(user=self.user, name='Breakfast')
+
+        recipe.tags.add(tag)
+        res = self.client.get(SEARCH_URL, {'q': 'breakfast'})
+        self.assertEqual(res.data['count'], 1)
+
+        tag.name = 'Dinner'
+        tag.save()
+        res = self.client.get(SEARCH_URL, {'q': 'breakfast'})
+        self.assertEqual(res.data['count'], 0)
+
+
+@override_settings(RECIPE_IMAGE_EXECUTOR='sync')
+class RecipeImageUploadTests(TestCase):
+    """Test uploading images to recipes"""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        self.settings_override.enable()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email='testcase@email.com',
+            password='testCase'
+        )
+        self.client.force_authenticate(self.user)
+        self.recipe = sample_recipe(user=self.user)
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.media_root)
+
+    def test_upload_image_to_recipe(self):
+        """Test uploading a valid image renders its variants"""
+        url = image_upload_url(self.recipe.id)
+        with tempfile.NamedTemporaryFile(suffix='.png') as image_file:
+            Image.new('RGBA', (800, 600), (255, 0, 0, 128)).save(image_file)
+            image_file.seek(0)
+            res = self.client.post(url, {'image': image_file},
+                                   format='multipart')
+
+        self.recipe.refresh_from_db()
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(os.path.exists(self.recipe.image.path))
+        self.assertIn('image', res.data)
+        self.assertTrue(res.data['variants']['thumbnail'].endswith('.jpg'))
+        self.assertTrue(res.data['variants']['webp'].endswith('.webp'))
+
+        thumbnail = os.path.join(
+            os.path.dirname(self.recipe.image.path),
+            'variants',
+            os.path.basename(res.data['variants']['thumbnail'])
+        )
+        with Image.open(thumbnail) as image:
+            self.assertEqual(image.size, (320, 240))
+
+    def test_upload_image_bad_request(self):
+        """Test uploading an invalid image"""
+        url = image_upload_url(self.recipe.id)
+        res = self.client.post(url, {'image': 'notimage'},
+                               format='multipart')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(RECIPE_IMAGE_EXECUTOR='thread')
+    def test_variants_pending_until_rendered(self):
+        """Test the variants are reported as missing until rendered"""
+        url = image_upload_url(self.recipe.id)
+        with tempfile.NamedTemporaryFile(suffix='.jpg') as image_file:
+            Image.new('RGB', (10, 10)).save(image_file)
+            image_file.seek(0)
+            with patch('recipe.views.schedule_variants') as schedule:
+                res = self.client.post(url, {'image': image_file},
+                                       format='multipart')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        schedule.assert_called_once()
+        self.assertEqual(res.data['variants'],
+                         {'thumbnail': None, 'webp': None})
+
+        res = self.client.get(url)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIsNotNone(res.data['image'])
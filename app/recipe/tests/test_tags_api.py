@@ -1,16 +1,18 @@
 from django.test import TestCase
 from django.urls import reverse
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 
 from rest_framework.test import APIClient
 from rest_framework import status
 
-from core.models import Tag
+from core.models import Tag, Recipe
 
 from recipe.serializers import TagSerializer
 
 
 TAGS_URL = reverse('recipe:tag-list')
+TAGS_BULK_URL = reverse('recipe:tag-bulk')
 
 
 def user_sample(email='testcase@email.com', password='testCasse'):
@@ -33,6 +35,7 @@ class PrivateTagsApiTests(TestCase):
     Test for requests from authenticated users
     """
     def setUp(self):
+        cache.clear()
         self.client = APIClient()
         self.user = user_sample()
         self.client.force_authenticate(self.user)
@@ -48,7 +51,7 @@ class PrivateTagsApiTests(TestCase):
         serializer = TagSerializer(tags, many=True)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(serializer.data, res.data)
+        self.assertEqual(serializer.data, res.data['results'])
 
     def test_tags_limited_to_user(self):
         """Test that the tags returned are for the authenticated user"""
@@ -64,8 +67,8 @@ class PrivateTagsApiTests(TestCase):
         res = self.client.get(TAGS_URL)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(res.data), 1)
-        self.assertEqual(res.data[0]['name'], tag.name)
+        self.assertEqual(len(res.data['results']), 1)
+        self.assertEqual(res.data['results'][0]['name'], tag.name)
 
     def test_tags_created_successful(self):
         """Test that the tag was created succcessful"""
@@ -86,3 +89,183 @@ class PrivateTagsApiTests(TestCase):
         res = self.client.post(TAGS_URL, {'name': ''})
 
         self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_bulk_create_tags(self):
+        """Test creating a list of tags in one request"""
+        payload = [{'name': 'Vegan'}, {'name': 'Dessert'}]
+        res = self.client.post(TAGS_BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual([tag['name'] for tag in res.data],
+                         ['Vegan', 'Dessert'])
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 2)
+
+    def test_bulk_create_tags_reports_errors_per_item(self):
+        """Test that nothing is created when an item is invalid"""
+        payload = [{'name': 'Vegan'}, {'name': ''}]
+        res = self.client.post(TAGS_BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.data[0], {})
+        self.assertIn('name', res.data[1])
+        self.assertFalse(Tag.objects.exists())
+
+    def test_bulk_update_tags(self):
+        """Test renaming a list of tags in one request"""
+        tag1 = Tag.objects.create(user=self.user, name='Vegan')
+        tag2 = Tag.objects.create(user=self.user, name='Dessert')
+        payload = [
+            {'id': tag2.id, 'name': 'Desserts'},
+            {'id': tag1.id, 'name': 'Vegetarian'},
+        ]
+        res = self.client.patch(TAGS_BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([tag['id'] for tag in res.data], [tag2.id, tag1.id])
+        tag1.refresh_from_db()
+        tag2.refresh_from_db()
+        self.assertEqual(tag1.name, 'Vegetarian')
+        self.assertEqual(tag2.name, 'Desserts')
+
+    def test_bulk_update_tags_of_other_user_fails(self):
+        """Test that tags of another user can't be updated in bulk"""
+        user2 = user_sample(email='altuser@email.com')
+        tag = Tag.objects.create(user=user2, name='Juices')
+        payload = [{'id': tag.id, 'name': 'Changed'}]
+        res = self.client.patch(TAGS_BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('id', res.data[0])
+        tag.refresh_from_db()
+        self.assertEqual(tag.name, 'Juices')
+
+    def test_bulk_delete_tags(self):
+        """Test deleting a list of tags limited to the user"""
+        user2 = user_sample(email='altuser@email.com')
+        other = Tag.objects.create(user=user2, name='Juices')
+        tag1 = Tag.objects.create(user=self.user, name='Vegan')
+        tag2 = Tag.objects.create(user=self.user, name='Dessert')
+        payload = {'ids': [tag1.id, tag2.id, other.id]}
+        res = self.client.delete(TAGS_BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['deleted'], 2)
+        self.assertEqual(list(Tag.objects.all()), [other])
+
+    def test_bulk_delete_tags_id_out_of_range(self):
+        """Test that an id no primary key can hold is rejected"""
+        payload = {'ids': [2 ** 64]}
+        res = self.client.delete(TAGS_BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('ids', res.data)
+
+    def test_bulk_update_tags_id_out_of_range(self):
+        """Test that updating an id no primary key can hold fails"""
+        payload = [{'id': 2 ** 64, 'name': 'Juices'}]
+        res = self.client.patch(TAGS_BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('id', res.data[0])
+
+    def test_tags_list_cached(self):
+        """Test that the tags list is served from the cache"""
+        Tag.objects.create(user=self.user, name='Vegan')
+        self.client.get(TAGS_URL)
+
+        # Only the version
+        with self.assertNumQueries(1):
+            res = self.client.get(TAGS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['results'][0]['name'], 'Vegan')
+
+    def test_tags_cache_invalidated_on_create(self):
+        """Test that creating a tag invalidates the cached list"""
+        res = self.client.get(TAGS_URL)
+        self.client.post(TAGS_URL, {'name': 'Vegan'})
+
+        res2 = self.client.get(TAGS_URL)
+
+        self.assertNotEqual(res['ETag'], res2['ETag'])
+        self.assertEqual(len(res2.data['results']), 1)
+
+    def test_tags_not_modified(self):
+        """Test that a matching ETag gets a 304 from the version alone"""
+        Tag.objects.create(user=self.user, name='Vegan')
+        res = self.client.get(TAGS_URL)
+        self.assertIn('Last-Modified', res)
+
+        with self.assertNumQueries(1):
+            res2 = self.client.get(TAGS_URL, HTTP_IF_NONE_MATCH=res['ETag'])
+
+        self.assertEqual(res2.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(res2['ETag'], res['ETag'])
+
+    def test_tags_version_shared_by_processes(self):
+        """Test that the version doesn't depend on the local cache"""
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        etag = self.client.get(TAGS_URL)['ETag']
+
+        # Another process, with nothing cached, agrees on the version
+        cache.clear()
+        res = self.client.get(TAGS_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        # A change is seen despite the cached list
+        self.client.get(TAGS_URL)
+        tag.name = 'Vegetarian'
+        tag.save()
+        res = self.client.get(TAGS_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['results'][0]['name'], 'Vegetarian')
+
+    def test_tags_cache_is_per_user(self):
+        """Test that a cached list is never served to another user"""
+        Tag.objects.create(user=self.user, name='Vegan')
+        res = self.client.get(TAGS_URL)
+        user2 = user_sample(email='altuser@email.com')
+        self.client.force_authenticate(user2)
+
+        res2 = self.client.get(TAGS_URL, HTTP_IF_NONE_MATCH=res['ETag'])
+
+        self.assertEqual(res2.status_code, status.HTTP_200_OK)
+        self.assertEqual(res2.data['results'], [])
+
+    def test_retrieve_tags_assigned_to_recipes(self):
+        """Test filtering tags by those assigned to recipes"""
+        tag1 = Tag.objects.create(user=self.user, name='Breakfast')
+        Tag.objects.create(user=self.user, name='Lunch')
+        recipe = Recipe.objects.create(
+            title='Coriander eggs on toast',
+            time_minutes=10,
+            price=5.00,
+            user=self.user
+        )
+        recipe.tags.add(tag1)
+
+        res = self.client.get(TAGS_URL, {'assigned_only': 1})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['results'],
+                         [TagSerializer(tag1).data])
+
+    def test_assigned_tags_cache_invalidated(self):
+        """Test assigning a tag to a recipe invalidates the cached list"""
+        tag = Tag.objects.create(user=self.user, name='Breakfast')
+        recipe = Recipe.objects.create(
+            title='Pancakes',
+            time_minutes=10,
+            price=5.00,
+            user=self.user
+        )
+        res = self.client.get(TAGS_URL, {'assigned_only': 1})
+        self.assertEqual(res.data['results'], [])
+
+        recipe.tags.add(tag)
+        res = self.client.get(TAGS_URL, {'assigned_only': 1})
+        self.assertEqual(len(res.data['results']), 1)
+
+        recipe.delete()
+        res = self.client.get(TAGS_URL, {'assigned_only': 1})
+        self.assertEqual(res.data['results'], [])
@@ -1,6 +1,8 @@
+from django.conf import settings
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 
+from core.async_views import async_patterns
 from recipe import views
 
 router = DefaultRouter()
@@ -10,6 +12,10 @@ router.register('recipes', views.RecipeViewSet)
 
 app_name = 'recipe'
 
+router_urls = router.urls
+if settings.ASYNC_VIEWS:
+    router_urls = async_patterns(router_urls, names=('-list', '-detail'))
+
 urlpatterns = [
-    path('', include(router.urls))
+    path('', include(router_urls))
 ]
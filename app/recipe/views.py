@@ -1,22 +1,61 @@
-from rest_framework import viewsets, mixins
-from rest_framework.authentication import TokenAuthentication
+import json
+
+from django.conf import settings
+from django.db.models import Prefetch
+from django.http import StreamingHttpResponse
+from django.utils.translation import gettext_lazy as _
+
+from rest_framework import viewsets, mixins, status
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
 
+from core.authentication import ExpiringTokenAuthentication
 from core.models import Tag, Ingredient, Recipe
+from core.search import search_recipes, update_search_vectors
+from core.storage import HashingFileUploadHandler
 
 from recipe import serializers
+from recipe.caching import CachedListMixin, ConditionalGetMixin, invalidate
+from recipe.filters import filter_assigned, filter_by_related, \
+                           param_to_bool, params_to_ints
+from recipe.images import schedule_variants
+from recipe.mixins import BulkModelMixin
+from recipe.pagination import SearchPagination
+
+
+# Columns read by RecipeSerializer/RecipeDetailSerializer, everything else
+# (e.g. the image path) is deferred on read-only actions.
+RECIPE_READ_FIELDS = ('id', 'title', 'time_minutes', 'link', 'price')
 
 
-class BaseRecipeAttrsViewSet(viewsets.GenericViewSet,
+class BaseRecipeAttrsViewSet(CachedListMixin,
+                             BulkModelMixin,
+                             viewsets.GenericViewSet,
                              mixins.ListModelMixin,
                              mixins.CreateModelMixin):
     """Manage Obbjects in the database"""
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (ExpiringTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
+    # Actions whose reads may be served by the replicas (core.routers)
+    replica_actions = ('list', 'retrieve')
+
+    # Many to many field of Recipe pointing to the model of the viewset
+    recipe_field = None
 
     def get_queryset(self):
         """Retrive objects for the user authenticated only"""
-        return self.queryset.filter(user=self.request.user)
+        queryset = self.queryset.filter(user=self.request.user)
+        if self.action == 'list' and \
+                param_to_bool(self.request, 'assigned_only'):
+            queryset = filter_assigned(
+                queryset,
+                Recipe._meta.get_field(self.recipe_field)
+            )
+
+        return queryset
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
@@ -26,32 +65,163 @@ class TagViewSet(BaseRecipeAttrsViewSet):
     """Manage Tags in the database"""
     queryset = Tag.objects.all()
     serializer_class = serializers.TagSerializer
+    recipe_field = 'tags'
 
 
 class IngredientViewSet(BaseRecipeAttrsViewSet):
     """Manage Ingredients in the database"""
     queryset = Ingredient.objects.all()
     serializer_class = serializers.IngredientSerializer
+    recipe_field = 'ingredients'
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(ConditionalGetMixin,
+                    BulkModelMixin,
+                    viewsets.ModelViewSet):
     """Manage Recipes in the database"""
     serializer_class = serializers.RecipeSerializer
+    bulk_serializer_class = serializers.RecipeBulkSerializer
+    bulk_m2m_fields = {'tags': Tag, 'ingredients': Ingredient}
     queryset = Recipe.objects.all()
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (ExpiringTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
+    replica_actions = ('list', 'retrieve')
 
     def get_queryset(self):
         """Retrive recipes for the authenticated user"""
-        return self.queryset.filter(user=self.request.user)
+        queryset = self.queryset.filter(user=self.request.user)
+        if self.action in ('list', 'export'):
+            queryset = self._filter_queryset_by_params(queryset)
+
+        if self.action in ('retrieve', 'export'):
+            # Nested serializers need the name of every related object
+            return queryset.only(*RECIPE_READ_FIELDS).prefetch_related(
+                Prefetch('tags', queryset=Tag.objects.only('id', 'name')),
+                Prefetch('ingredients',
+                         queryset=Ingredient.objects.only('id', 'name')),
+            )
+        if self.action in ('list', 'search'):
+            queryset = queryset.only(*RECIPE_READ_FIELDS)
+        if self.action in ('list', 'search', 'update', 'partial_update',
+                           'bulk'):
+            # PrimaryKeyRelatedField only needs the related ids
+            queryset = queryset.prefetch_related(
+                Prefetch('tags', queryset=Tag.objects.only('id')),
+                Prefetch('ingredients',
+                         queryset=Ingredient.objects.only('id')),
+            )
+
+        return queryset
+
+    def _filter_queryset_by_params(self, queryset):
+        """
+        Filter by ?tags=1,2&ingredients=3, matching any of the ids unless
+        ?match=all is given
+        """
+        match = self.request.query_params.get('match', 'any')
+        if match not in ('any', 'all'):
+            raise ValidationError({'match': [_('Expected any or all.')]})
+
+        for field in ('tags', 'ingredients'):
+            ids = params_to_ints(self.request, field)
+            if ids:
+                queryset = filter_by_related(queryset, field, ids,
+                                             match_all=match == 'all')
+
+        return queryset
 
     def get_serializer_class(self):
         """Return aproprieted serializer"""
-        if self.action == 'retrieve':
+        if self.action in ('retrieve', 'export'):
             return serializers.RecipeDetailSerializer
+        if self.action == 'upload_image':
+            return serializers.RecipeImageSerializer
 
         return self.serializer_class
 
     def perform_create(self, serializer):
         """Create a new recipe"""
         return serializer.save(user=self.request.user)
+
+    def bulk_changed(self, objs):
+        """
+        Refresh the search vectors, the assigned_only tag/ingredient lists
+        depend on the recipes too
+        """
+        super().bulk_changed(objs)
+        if objs:
+            update_search_vectors(
+                Recipe.objects.filter(pk__in=[obj.pk for obj in objs])
+            )
+        invalidate(Tag, self.request.user.pk)
+        invalidate(Ingredient, self.request.user.pk)
+
+    @action(methods=['get', 'post'], detail=True, url_path='upload-image')
+    def upload_image(self, request, pk=None):
+        """
+        Upload an image to a recipe, its resized variants are rendered in
+        the background and show up in the response once they are ready
+        """
+        recipe = self.get_object()
+        if request.method == 'GET':
+            return Response(self.get_serializer(recipe).data)
+
+        # Stream the upload to a temporary file whatever its size, hashed
+        # as it arrives, the storage then moves it in place
+        request._request.upload_handlers = [
+            HashingFileUploadHandler(request._request)
+        ]
+        serializer = self.get_serializer(recipe, data=request.data)
+        serializer.is_valid(raise_exception=True)
+        recipe = serializer.save()
+        schedule_variants(recipe.image.name)
+
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=['get'])
+    def search(self, request):
+        """Return the recipes matching ?q= ranked by relevance"""
+        text = request.query_params.get('q', '').strip()
+        if not text:
+            raise ValidationError({'q': [_('This field is required.')]})
+
+        queryset = search_recipes(self.get_queryset(), text)
+        paginator = SearchPagination()
+        page = paginator.paginate_queryset(queryset, request, view=self)
+        serializer = self.get_serializer(page, many=True)
+
+        return paginator.get_paginated_response(serializer.data)
+
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """Stream all the recipes of the user as newline delimited JSON"""
+        response = StreamingHttpResponse(
+            self._export_lines(settings.RECIPE_EXPORT_CHUNK_SIZE),
+            content_type='application/x-ndjson'
+        )
+        response['Content-Disposition'] = \
+            'attachment; filename="recipes.ndjson"'
+
+        return response
+
+    def _export_lines(self, chunk_size):
+        """
+        Yield one JSON line per recipe, reading the recipes in keyset
+        batches so only one chunk (and its prefetched relations) is held
+        in memory at a time
+        """
+        queryset = self.get_queryset().order_by('id')
+        serializer_class = self.get_serializer_class()
+        context = self.get_serializer_context()
+        last_id = 0
+        while True:
+            chunk = list(queryset.filter(id__gt=last_id)[:chunk_size])
+            if not chunk:
+                return
+            serializer = serializer_class(chunk, many=True, context=context)
+            for item in serializer.data:
+                yield json.dumps(item, cls=JSONEncoder) + '\n'
+            if len(chunk) < chunk_size:
+                # A short chunk is the last one, no need to ask again
+                return
+            last_id = chunk[-1].id
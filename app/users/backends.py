@@ -0,0 +1,29 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+
+
+class TokenModelBackend(ModelBackend):
+    """
+    Model backend loading the token of the user in the same query, so the
+    token view returns an existing token without querying it
+    """
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        UserModel = get_user_model()
+        if username is None:
+            username = kwargs.get(UserModel.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+        try:
+            user = UserModel._default_manager.select_related(
+                'expiring_token'
+            ).get(**{UserModel.USERNAME_FIELD: username})
+        except UserModel.DoesNotExist:
+            # Run the hasher anyway, unknown emails take as long as the
+            # others
+            UserModel().set_password(password)
+            return None
+
+        if user.check_password(password) and self.user_can_authenticate(user):
+            return user
+        return None
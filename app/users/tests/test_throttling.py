@@ -0,0 +1,156 @@
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import ExpiringToken
+from users.throttling import SlidingWindowThrottle
+
+
+TOKEN_URL = reverse('users:token')
+
+# Start of a throttle window of one minute
+NOW = 60 * 1000000.0
+
+
+def throttle_rates(**rates):
+    return override_settings(REST_FRAMEWORK={
+        **settings.REST_FRAMEWORK,
+        'DEFAULT_THROTTLE_RATES': {'login_ip': None, 'login_email': None,
+                                   **rates},
+    })
+
+
+class LoginThrottleTests(TestCase):
+    """Test the throttles of the token endpoint"""
+
+    def setUp(self):
+        self.client = APIClient()
+        cache.clear()
+        self.payload = {'email': 'test@londonappdev.com',
+                        'password': 'testpass123'}
+        self.user = get_user_model().objects.create_user(**self.payload)
+        timer = mock.patch.object(SlidingWindowThrottle, 'timer',
+                                  return_value=NOW)
+        self.timer = timer.start()
+        self.addCleanup(timer.stop)
+
+    def login(self, email=None, address='10.0.0.1'):
+        return self.client.post(TOKEN_URL, {
+            'email': email or self.payload['email'],
+            'password': self.payload['password'],
+        }, REMOTE_ADDR=address)
+
+    @throttle_rates(login_email='3/min')
+    def test_email_throttled_before_hashing(self):
+        """Test that throttled logins never reach the password check"""
+        for _ in range(3):
+            self.assertEqual(self.login().status_code, status.HTTP_200_OK)
+
+        with mock.patch('users.serializers.authenticate') as authenticate:
+            res = self.login()
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        authenticate.assert_not_called()
+
+    @throttle_rates(login_email='2/min')
+    def test_email_throttled_across_addresses(self):
+        """Test that the email throttle ignores the client address"""
+        self.login(address='10.0.0.1')
+        self.login(address='10.0.0.2')
+
+        res = self.login(email=' TEST@londonappdev.com', address='10.0.0.3')
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    @throttle_rates(login_ip='2/min')
+    def test_address_throttled_across_emails(self):
+        """Test that one address can't try many emails"""
+        self.login(email='a@londonappdev.com')
+        self.login(email='b@londonappdev.com')
+
+        res = self.login(email='c@londonappdev.com')
+        other = self.login(email='c@londonappdev.com', address='10.0.0.2')
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(other.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @throttle_rates(login_email='4/min')
+    def test_sliding_window(self):
+        """Test that the previous window counts for its remaining overlap"""
+        for _ in range(4):
+            self.login()
+        res = self.login()
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(res['Retry-After'], '60')
+
+        # Halfway through the next window: 4 * 0.5 requests are left
+        self.timer.return_value = NOW + 90
+        codes = [self.login().status_code for _ in range(3)]
+
+        self.assertEqual(codes, [status.HTTP_200_OK, status.HTTP_200_OK,
+                                 status.HTTP_429_TOO_MANY_REQUESTS])
+
+    @throttle_rates(login_email='2/min')
+    def test_window_expires(self):
+        """Test that the logins are allowed again two windows later"""
+        self.login()
+        self.login()
+
+        self.timer.return_value = NOW + 120
+
+        self.assertEqual(self.login().status_code, status.HTTP_200_OK)
+
+    @throttle_rates()
+    def test_disabled_throttle(self):
+        """Test that an empty rate disables the throttle"""
+        codes = {self.login().status_code for _ in range(5)}
+
+        self.assertEqual(codes, {status.HTTP_200_OK})
+
+    @throttle_rates()
+    def test_existing_token_read_with_user(self):
+        """Test that an existing token is returned without another query"""
+        token = ExpiringToken.objects.create(user=self.user)
+
+        with self.assertNumQueries(1):
+            res = self.login()
+
+        self.assertEqual(res.data, {'token': token.key})
+
+    @throttle_rates()
+    def test_token_created_on_first_login(self):
+        """Test that the first login creates the token"""
+        res = self.login()
+
+        token = ExpiringToken.objects.get(user=self.user)
+        self.assertEqual(res.data, {'token': token.key})
+        self.assertEqual(self.login().data, {'token': token.key})
+
+    @throttle_rates()
+    def test_expired_token_replaced(self):
+        """Test that logging in with an expired token issues a new one"""
+        token = ExpiringToken.objects.create(user=self.user)
+        ExpiringToken.objects.filter(pk=token.pk).update(
+            expires=token.created
+        )
+
+        res = self.login()
+
+        new_token = ExpiringToken.objects.get(user=self.user)
+        self.assertNotEqual(new_token.key, token.key)
+        self.assertEqual(res.data, {'token': new_token.key})
+        self.assertFalse(new_token.is_expired)
+
+    @throttle_rates(login_email='2/min', login_ip='2/min')
+    def test_body_not_an_object(self):
+        """Test that a JSON body that isn't an object is a bad request"""
+        res = self.client.post(TOKEN_URL, [], format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
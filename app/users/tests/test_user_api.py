@@ -1,5 +1,6 @@
 from django.test import TestCase
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.urls import reverse
 
 from rest_framework.test import APIClient
@@ -18,6 +19,8 @@ class PublicUserApiTests(TestCase):
 
     def setUp(self):
         self.client = APIClient()
+        # Login throttle counters
+        cache.clear()
 
     def test_create_valid_user_success(self):
         """Test creating a user with valid payload is ssuccessful"""
@@ -0,0 +1,98 @@
+import hashlib
+from collections.abc import Mapping
+
+from django.core.exceptions import ImproperlyConfigured
+
+from rest_framework.settings import api_settings
+from rest_framework.throttling import SimpleRateThrottle
+
+
+class SlidingWindowThrottle(SimpleRateThrottle):
+    """
+    Rate throttle with a sliding window counter.
+
+    The requests of the current fixed window are added to those of the
+    previous one, weighted by how much of it the sliding window still
+    covers. That's two counters per client in the cache whatever the rate,
+    where SimpleRateThrottle keeps the timestamp of every request.
+    """
+
+    def get_rate(self):
+        # Read on every instantiation, not once at import
+        try:
+            return api_settings.DEFAULT_THROTTLE_RATES[self.scope]
+        except KeyError:
+            raise ImproperlyConfigured(
+                f'No default throttle rate set for {self.scope!r} scope'
+            )
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+        key = self.get_cache_key(request, view)
+        if key is None:
+            return True
+
+        position = self.timer() / self.duration
+        window = int(position)
+        self.elapsed = position - window
+        current_key = f'{key}_{window}'
+        previous_key = f'{key}_{window - 1}'
+        counts = self.cache.get_many([previous_key, current_key])
+        self.previous = counts.get(previous_key, 0)
+        self.current = counts.get(current_key, 0)
+
+        estimate = self.previous * (1 - self.elapsed) + self.current
+        if estimate >= self.num_requests:
+            return False
+
+        # Both windows are needed while the next one is current
+        if not self.cache.add(current_key, 1, 2 * self.duration):
+            try:
+                self.cache.incr(current_key)
+            except ValueError:
+                # Expired between add and incr
+                self.cache.set(current_key, 1, 2 * self.duration)
+
+        return True
+
+    def wait(self):
+        """Return the seconds until the estimate gets below the rate"""
+        if self.current < self.num_requests:
+            # The weight of the previous window decreases with time
+            allowed_at = 1 - (self.num_requests - self.current) / \
+                self.previous
+        else:
+            # The current window becomes the previous one
+            allowed_at = 2 - self.num_requests / self.current
+
+        return max(allowed_at - self.elapsed, 0) * self.duration
+
+
+class LoginIPThrottle(SlidingWindowThrottle):
+    """Throttle the logins by client address"""
+    scope = 'login_ip'
+
+    def get_cache_key(self, request, view):
+        return self.cache_format % {
+            'scope': self.scope,
+            'ident': self.get_ident(request),
+        }
+
+
+class LoginEmailThrottle(SlidingWindowThrottle):
+    """Throttle the logins by email, whatever the address they come from"""
+    scope = 'login_email'
+
+    def get_cache_key(self, request, view):
+        # The serializer rejects a body that isn't an object, the address
+        # throttle still counts it
+        if not isinstance(request.data, Mapping):
+            return None
+        email = request.data.get('email')
+        if not isinstance(email, str) or not email.strip():
+            return None
+        # Fixed size and safe for memcached whatever the client sent
+        ident = hashlib.sha256(email.strip().lower().encode()).hexdigest()
+
+        return self.cache_format % {'scope': self.scope, 'ident': ident}
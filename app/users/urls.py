@@ -1,12 +1,24 @@
+from django.conf import settings
 from django.urls import path
 
+from core.async_views import async_view
+
 from . import views
 
 
 app_name = "users"
 
+create_view = views.CreateUserAPIView.as_view()
+token_view = views.CreateTokenView.as_view()
+if settings.ASYNC_VIEWS:
+    # Password hashing is CPU bound and releases the GIL, run the signups
+    # and logins in parallel on the thread pool rather than queued on the
+    # sync thread
+    create_view = async_view(create_view, thread_sensitive=False)
+    token_view = async_view(token_view, thread_sensitive=False)
+
 urlpatterns = [
-    path('create/', views.CreateUserAPIView.as_view(), name="create"),
-    path('token/', views.CreateTokenView.as_view(), name='token'),
+    path('create/', create_view, name="create"),
+    path('token/', token_view, name='token'),
     path('me/', views.ManagerUserView.as_view(), name='me'),
 ]
@@ -1,8 +1,13 @@
-from rest_framework import generics, authentication, permissions
+from rest_framework import generics, permissions
 from rest_framework.authtoken.views import ObtainAuthToken
+from rest_framework.response import Response
 from rest_framework.settings import api_settings
 
+from core.authentication import ExpiringTokenAuthentication
+from core.models import ExpiringToken
+
 from .serializers import UserSerializer, AuthTokenSerializer
+from .throttling import LoginEmailThrottle, LoginIPThrottle
 
 
 class CreateUserAPIView(generics.CreateAPIView):
@@ -14,12 +19,38 @@ class CreateTokenView(ObtainAuthToken):
     """Create a token for user"""
     serializer_class = AuthTokenSerializer
     renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES
+    # Checked before the serializer, abusive clients never reach the hasher
+    throttle_classes = (LoginIPThrottle, LoginEmailThrottle)
+
+    def post(self, request, *args, **kwargs):
+        """
+        Return the token of the user, creating it on the first login and
+        replacing it once expired
+        """
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        user = serializer.validated_data['user']
+
+        try:
+            # Loaded with the user by users.backends.TokenModelBackend
+            token = user.expiring_token
+        except ExpiringToken.DoesNotExist:
+            token = None
+        if token is not None and token.is_expired:
+            ExpiringToken.objects.filter(pk=token.pk).delete()
+            token = None
+        if token is None:
+            token, _created = ExpiringToken.objects.get_or_create(user=user)
+        else:
+            token.refresh()
+
+        return Response({'token': token.key})
 
 
 class ManagerUserView(generics.RetrieveUpdateAPIView):
     """Retrive and update the user authenticated"""
     serializer_class = UserSerializer
-    authentication_classes = (authentication.TokenAuthentication,)
+    authentication_classes = (ExpiringTokenAuthentication,)
     permission_classes = (permissions.IsAuthenticated,)
 
     def get_object(self):
@@ -0,0 +1,166 @@
+"""
+HTTP client helpers shared by the benchmark scripts, standard library only.
+"""
+import http.client
+import json
+import re
+import statistics
+import threading
+import time
+from urllib.parse import urlsplit
+
+
+# Query count sent by core.middleware.PerformanceMiddleware
+SERVER_TIMING_QUERIES_RE = re.compile(r'db;dur=[\d.]+;desc="(\d+) queries"')
+
+
+def percentile(values, percent):
+    """Return the nearest rank percentile of sorted values"""
+    if not values:
+        return 0.0
+    index = max(0, int(round(percent / 100 * len(values))) - 1)
+
+    return values[index]
+
+
+class Client:
+    """Persistent HTTP connection to the server under test"""
+
+    def __init__(self, base_url, timeout=30):
+        url = urlsplit(base_url)
+        self.connection_class = http.client.HTTPSConnection \
+            if url.scheme == 'https' else http.client.HTTPConnection
+        self.host = url.hostname
+        self.port = url.port
+        self.timeout = timeout
+        self.connection = None
+
+    def request(self, method, path, data=None, headers=None, read_delay=0):
+        """
+        Send a request, return (status, seconds, queries, body). queries
+        is None when the server doesn't send them in Server-Timing.
+        """
+        if self.connection is None:
+            self.connection = self.connection_class(
+                self.host, self.port, timeout=self.timeout
+            )
+        headers = {'Accept': 'application/json', **(headers or {})}
+        body = None
+        if data is not None:
+            body = json.dumps(data)
+            headers['Content-Type'] = 'application/json'
+
+        start = time.perf_counter()
+        try:
+            self.connection.request(method, path, body=body, headers=headers)
+            response = self.connection.getresponse()
+            if read_delay:
+                # Slow client: the server has to keep the response around
+                time.sleep(read_delay)
+            content = response.read()
+        except (OSError, http.client.HTTPException):
+            self.close()
+            raise
+        duration = time.perf_counter() - start
+
+        match = SERVER_TIMING_QUERIES_RE.search(
+            response.getheader('Server-Timing') or ''
+        )
+        queries = int(match.group(1)) if match else None
+
+        return response.status, duration, queries, content
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+
+class Results:
+    """Outcome of the requests of all the workers of a run"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = []
+        self.queries = []
+        self.errors = 0
+
+    def add(self, latencies, queries, errors):
+        with self._lock:
+            self.latencies.extend(latencies)
+            self.queries.extend(queries)
+            self.errors += errors
+
+    def stats(self, elapsed):
+        latencies = sorted(self.latencies)
+        return {
+            'requests': len(latencies),
+            'errors': self.errors,
+            'rps': len(latencies) / elapsed if elapsed else 0.0,
+            'mean': statistics.mean(latencies) if latencies else 0.0,
+            'p50': percentile(latencies, 50),
+            'p95': percentile(latencies, 95),
+            'p99': percentile(latencies, 99),
+            'queries': statistics.mean(self.queries)
+            if self.queries else None,
+        }
+
+
+def run_workers(base_url, concurrency, duration, next_request,
+                read_delay=0):
+    """
+    Run concurrency clients for duration seconds, each sending the
+    (method, path, data, headers) returned by next_request(worker, i),
+    and return the statistics of the run
+    """
+    results = Results()
+    deadline = time.monotonic() + duration
+
+    def worker(number):
+        client = Client(base_url)
+        latencies, queries, errors = [], [], 0
+        i = 0
+        while time.monotonic() < deadline:
+            method, path, data, headers = next_request(number, i)
+            i += 1
+            try:
+                status, latency, count, _content = client.request(
+                    method, path, data, headers, read_delay
+                )
+            except (OSError, http.client.HTTPException):
+                errors += 1
+                continue
+            if status >= 400:
+                errors += 1
+                continue
+            latencies.append(latency)
+            if count is not None:
+                queries.append(count)
+        client.close()
+        results.add(latencies, queries, errors)
+
+    threads = [threading.Thread(target=worker, args=(number,))
+               for number in range(concurrency)]
+    start = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    return results.stats(time.monotonic() - start)
+
+
+def format_table(rows):
+    """Return the (name, stats) rows as a table"""
+    lines = [f'{"":<12}{"requests":>10}{"errors":>8}{"req/s":>10}'
+             f'{"p50 ms":>10}{"p95 ms":>10}{"p99 ms":>10}{"queries":>9}']
+    for name, stats in rows:
+        queries = stats['queries']
+        lines.append(
+            f'{name:<12}{stats["requests"]:>10}{stats["errors"]:>8}'
+            f'{stats["rps"]:>10.1f}{stats["p50"] * 1000:>10.1f}'
+            f'{stats["p95"] * 1000:>10.1f}{stats["p99"] * 1000:>10.1f}'
+            f'{"-" if queries is None else format(queries, ".1f"):>9}'
+        )
+
+    return '\n'.join(lines)
@@ -0,0 +1,93 @@
+"""
+Generate the benchmark data set in the database of the app settings.
+
+    python benchmarks/datagen.py --users 50 --recipes-per-user 200
+
+Runs the seed_data command (users all with the same password, their token,
+tags, ingredients and recipes) and writes what the scenarios need
+(credentials, tokens and object ids) of the first --fixture-users users to
+benchmarks/data/fixture.json. Run it with the same DB_* env vars as the
+server under test.
+"""
+import argparse
+import json
+import os
+import sys
+
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_DIR = os.path.join(os.path.dirname(BENCHMARKS_DIR), 'app')
+FIXTURE_PATH = os.path.join(BENCHMARKS_DIR, 'data', 'fixture.json')
+
+PASSWORD = 'benchmark-password'
+
+
+def setup_django():
+    sys.path.insert(0, APP_DIR)
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings')
+    import django
+    django.setup()
+
+
+def generate(users, recipes_per_user, tags_per_user, ingredients_per_user,
+             fixture_users, seed):
+    """Seed the data set and return the fixture of the scenarios"""
+    from django.contrib.auth import get_user_model
+    from django.core.management import call_command
+    from core.management.commands.seed_data import SEED_EMAIL_DOMAIN
+    from core.models import ExpiringToken, Ingredient, Recipe, Tag
+
+    call_command('seed_data', users=users,
+                 recipes=users * recipes_per_user,
+                 tags_per_user=tags_per_user,
+                 ingredients_per_user=ingredients_per_user,
+                 password=PASSWORD, seed=seed, reset=True)
+
+    tokens = dict(ExpiringToken.objects.filter(
+        user__email__endswith=f'@{SEED_EMAIL_DOMAIN}'
+    ).values_list('user_id', 'key'))
+    seeded = get_user_model().objects.filter(
+        email__endswith=f'@{SEED_EMAIL_DOMAIN}', recipe__isnull=False
+    ).distinct().order_by('id')[:fixture_users]
+
+    fixture = []
+    for user in seeded:
+        fixture.append({
+            'email': user.email,
+            'password': PASSWORD,
+            'token': tokens[user.id],
+            'recipes': list(Recipe.objects.filter(user=user).order_by('id')
+                            .values_list('id', flat=True)[:1000]),
+            'tags': list(Tag.objects.filter(user=user)
+                         .values_list('id', flat=True)),
+            'ingredients': list(Ingredient.objects.filter(user=user)
+                                .values_list('id', flat=True)),
+        })
+
+    return fixture
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--recipes-per-user', type=int, default=100)
+    parser.add_argument('--tags-per-user', type=int, default=20)
+    parser.add_argument('--ingredients-per-user', type=int, default=50)
+    parser.add_argument('--fixture-users', type=int, default=100,
+                        help='seeded users written to the fixture')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    setup_django()
+    fixture = generate(args.users, args.recipes_per_user,
+                       args.tags_per_user, args.ingredients_per_user,
+                       args.fixture_users, args.seed)
+
+    os.makedirs(os.path.dirname(FIXTURE_PATH), exist_ok=True)
+    with open(FIXTURE_PATH, 'w') as fixture_file:
+        json.dump({'users': fixture}, fixture_file)
+    print(f'{len(fixture)} users written to {FIXTURE_PATH}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+"""
+Measure the login throughput per core of the password hashers.
+
+    python benchmarks/hashers.py
+    PASSWORD_PBKDF2_ITERATIONS=100000 python benchmarks/hashers.py \\
+        --hasher pbkdf2
+
+Every hasher of the app settings, with the cost of the PASSWORD_* settings
+(env vars), verifies a password in a loop for --duration seconds, first on
+one thread and then on --threads threads. Hashing releases the GIL, so the
+threaded run shows what a worker process with that many threads, or the
+async token view, can sustain. Hashers whose library isn't installed are
+skipped.
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_DIR = os.path.join(os.path.dirname(BENCHMARKS_DIR), 'app')
+
+PASSWORD = 'benchmark-password'
+
+
+def setup_django():
+    sys.path.insert(0, APP_DIR)
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings')
+    import django
+    django.setup()
+
+
+def throughput(hasher, encoded, threads, duration):
+    """Return the password verifications per second of the threads"""
+    counts = [0] * threads
+    deadline = time.monotonic() + duration
+
+    def worker(number):
+        while time.monotonic() < deadline:
+            hasher.verify(PASSWORD, encoded)
+            counts[number] += 1
+
+    workers = [threading.Thread(target=worker, args=(number,))
+               for number in range(threads)]
+    start = time.monotonic()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+
+    return sum(counts) / (time.monotonic() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--hasher', action='append', dest='hashers',
+                        choices=('pbkdf2', 'argon2', 'bcrypt'),
+                        help='hasher to measure, repeatable, all by default')
+    parser.add_argument('--threads', type=int, default=os.cpu_count(),
+                        help='threads of the parallel run')
+    parser.add_argument('--duration', type=float, default=5.0)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.conf import settings
+    from django.utils.module_loading import import_string
+
+    hashers = {path.rsplit('.', 1)[1]: import_string(path)()
+               for path in settings.PASSWORD_HASHERS}
+    cores = os.cpu_count()
+
+    print(f'{"":<28}{"cost":>24}{"verify ms":>11}{"1 thread/s":>12}'
+          f'{f"{args.threads} threads/s":>14}{"per core/s":>12}')
+    for hasher in hashers.values():
+        if args.hashers and \
+                not hasher.algorithm.startswith(tuple(args.hashers)):
+            continue
+        try:
+            encoded = hasher.encode(PASSWORD, hasher.salt())
+        except ValueError as error:
+            print(f'{type(hasher).__name__:<28}skipped: {error}')
+            continue
+        summary = hasher.safe_summary(encoded)
+        cost = ', '.join(
+            f'{key}={value}' for key, value in summary.items()
+            if key not in ('algorithm', 'salt', 'hash', 'checksum',
+                           'variety', 'version')
+        )
+
+        single = throughput(hasher, encoded, 1, args.duration)
+        parallel = throughput(hasher, encoded, args.threads, args.duration)
+        print(f'{type(hasher).__name__:<28}{cost:>24}{1000 / single:>11.1f}'
+              f'{single:>12.1f}{parallel:>14.1f}'
+              f'{parallel / min(args.threads, cores):>12.1f}')
+
+
+if __name__ == '__main__':
+    main()
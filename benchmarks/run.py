@@ -0,0 +1,167 @@
+"""
+Run the benchmark scenarios against a running server.
+
+    python benchmarks/datagen.py
+    python benchmarks/run.py --url http://localhost:8000 --save main
+    python benchmarks/run.py --url http://localhost:8000 --compare main
+
+Every scenario is run for --duration seconds with --concurrency clients
+using the users of benchmarks/data/fixture.json. Requests/s, latency
+percentiles and queries per request (read from the Server-Timing header)
+are reported. --save stores the results as benchmarks/baselines/NAME.json,
+--compare diffs a run against such a baseline and exits with 1 when a
+scenario regressed by more than --threshold percent.
+
+The token scenario logs the same users in over and over, start the server
+with LOGIN_IP_THROTTLE_RATE= LOGIN_EMAIL_THROTTLE_RATE= to disable the login
+throttles or it measures 429 responses.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+
+from client import format_table, run_workers
+
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+FIXTURE_PATH = os.path.join(BENCHMARKS_DIR, 'data', 'fixture.json')
+BASELINES_DIR = os.path.join(BENCHMARKS_DIR, 'baselines')
+
+RECIPES_PATH = '/api/recipe/recipes/'
+TOKEN_PATH = '/api/user/token/'
+
+
+def auth(user):
+    return {'Authorization': f'Token {user["token"]}'}
+
+
+def scenario_list(user, i, rng):
+    return 'GET', RECIPES_PATH, None, auth(user)
+
+
+def scenario_detail(user, i, rng):
+    recipe_id = rng.choice(user['recipes'])
+    return 'GET', f'{RECIPES_PATH}{recipe_id}/', None, auth(user)
+
+
+def scenario_create(user, i, rng):
+    data = {
+        'title': f'Benchmark recipe {i}',
+        'time_minutes': rng.randint(5, 180),
+        'price': '12.50',
+        'tags': rng.sample(user['tags'], min(3, len(user['tags']))),
+        'ingredients': rng.sample(user['ingredients'],
+                                  min(5, len(user['ingredients']))),
+    }
+    return 'POST', RECIPES_PATH, data, auth(user)
+
+
+def scenario_token(user, i, rng):
+    data = {'email': user['email'], 'password': user['password']}
+    return 'POST', TOKEN_PATH, data, None
+
+
+SCENARIOS = {
+    'list': scenario_list,
+    'detail': scenario_detail,
+    'create': scenario_create,
+    'token': scenario_token,
+}
+
+# Stats compared with the baselines: (name, higher is better)
+COMPARED = (('rps', True), ('p50', False), ('p95', False), ('p99', False),
+            ('queries', False))
+
+
+def run_scenario(scenario, users, args):
+    make_request = SCENARIOS[scenario]
+    rngs = [random.Random(number) for number in range(args.concurrency)]
+
+    def next_request(worker, i):
+        user = users[(worker + i) % len(users)]
+        return make_request(user, i, rngs[worker])
+
+    return run_workers(args.url, args.concurrency, args.duration,
+                       next_request)
+
+
+def compare(results, baseline, threshold):
+    """Print the difference with the baseline, return the regressions"""
+    regressions = []
+    print(f'\n{"":<12}{"stat":>8}{"baseline":>12}{"current":>12}'
+          f'{"change":>10}')
+    for scenario, stats in results.items():
+        base = baseline.get(scenario)
+        if base is None:
+            continue
+        for stat, higher_is_better in COMPARED:
+            before, after = base.get(stat), stats.get(stat)
+            if not before or after is None:
+                continue
+            change = (after - before) / before * 100
+            worse = -change if higher_is_better else change
+            flag = ''
+            if worse > threshold:
+                flag = '  REGRESSION'
+                regressions.append((scenario, stat, change))
+            scale = 1 if stat in ('rps', 'queries') else 1000
+            print(f'{scenario:<12}{stat:>8}{before * scale:>12.1f}'
+                  f'{after * scale:>12.1f}{change:>+9.1f}%{flag}')
+
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--url', default='http://localhost:8000')
+    parser.add_argument('--scenario', action='append', dest='scenarios',
+                        choices=sorted(SCENARIOS),
+                        help='scenario to run, repeatable, all by default')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=15.0)
+    parser.add_argument('--fixture', default=FIXTURE_PATH)
+    parser.add_argument('--save', metavar='NAME',
+                        help='store the results as a baseline')
+    parser.add_argument('--compare', metavar='NAME',
+                        help='diff the results with a baseline')
+    parser.add_argument('--threshold', type=float, default=10.0,
+                        help='percent a stat may get worse before it is '
+                             'reported as a regression')
+    args = parser.parse_args()
+
+    with open(args.fixture) as fixture_file:
+        users = json.load(fixture_file)['users']
+    if not users:
+        sys.exit('The fixture has no users, run datagen.py first')
+
+    results = {}
+    for scenario in args.scenarios or SCENARIOS:
+        results[scenario] = run_scenario(scenario, users, args)
+    print(format_table(results.items()))
+
+    if args.save:
+        os.makedirs(BASELINES_DIR, exist_ok=True)
+        path = os.path.join(BASELINES_DIR, f'{args.save}.json')
+        with open(path, 'w') as baseline_file:
+            json.dump({
+                'concurrency': args.concurrency,
+                'duration': args.duration,
+                'results': results,
+            }, baseline_file, indent=2, sort_keys=True)
+        print(f'\nBaseline saved to {path}')
+
+    if args.compare:
+        path = os.path.join(BASELINES_DIR, f'{args.compare}.json')
+        with open(path) as baseline_file:
+            baseline = json.load(baseline_file)
+        if baseline['concurrency'] != args.concurrency:
+            print(f'Warning: the baseline ran with concurrency '
+                  f'{baseline["concurrency"]}')
+        if compare(results, baseline['results'], args.threshold):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()